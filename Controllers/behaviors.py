@@ -8,6 +8,7 @@ class AgentBehavior(Behaviour):
     def __init__(self, name, agent):
         super().__init__(name)
         self.agent = agent # move agent to blackboard as well
+        self.cfg = agent.cfg # the simulation settings, shared with the agent
         # self.blackboard = self.attach_blackboard_client() # TODO: figure out blackboard
 
     def setup(self, **kwargs) -> None:
@@ -32,14 +33,14 @@ class Flock(AgentBehavior):
     
     def initialise(self) -> None:
         if self.agent.timer == 0:
-            self.agent.timer = AGENT_BORED_THRESHOLD
+            self.agent.timer = self.cfg.AGENT_BORED_THRESHOLD
         return super().initialise()
     
     def update(self) -> Status:
         while self.agent.timer > 0: # essentially "IsBored"
             if len(self.agent.neighbors) <= 0:
                 return Status.FAILURE
-            if USE_BOID_MOVE:
+            if self.cfg.USE_BOID_MOVE:
                 self.agent.move(self.agent.neighbors, None)
             else:
                 self.agent.repulse_move(self.agent.neighbors, None, attr_factor=self.attr_factor, diff_factor = self.diff_factor)
@@ -65,7 +66,7 @@ class GoToSite(AgentBehavior):
         
         dx += (self.agent.site.pos - self.agent.pos) * 1
 
-        self.agent.pos += (dx * DT * AGENT_SITE_ATTRACTION)
+        self.agent.pos += (dx * self.cfg.DT * self.cfg.AGENT_SITE_ATTRACTION)
         return Status.SUCCESS
     
 class QueryForSites(AgentBehavior):
@@ -82,11 +83,12 @@ class QueryForSites(AgentBehavior):
         # query neighbors (if any) for sites
         if len(self.agent.group_neighbors) > 0:
             for neighbor in self.agent.group_neighbors:
-                if self.agent.sim.agents[neighbor].site != None:
+                neighbor_site = self.agent.sim.get_agent_site(neighbor)
+                if neighbor_site != None:
                     # accept or reject site
-                    if self.agent.sim.agents[neighbor].site.is_available():
+                    if neighbor_site.is_available():
                         if np.random.random() > 0.2:
-                            self.agent.site = self.agent.sim.agents[neighbor].site
+                            self.agent.site = neighbor_site
                             self.agent.add_site(self.agent.site)
                             self.agent.following = neighbor
                             return Status.SUCCESS
@@ -114,10 +116,10 @@ class Graze(AgentBehavior):
     
     def update(self) -> Status:
         self.agent.hunger += 2
-        self.agent.site.resource_count -= 1
+        self.agent.site.consume()
         self.agent.timer -= 1
         dx = self.agent.site.pos - self.agent.pos
-        self.agent.pos += dx * DT
+        self.agent.pos += dx * self.cfg.DT
         return Status.SUCCESS
     
 class Explore(AgentBehavior):
@@ -243,7 +245,7 @@ class IsHungry(AgentBehavior):
         return super().setup(**kwargs)
     
     def update(self) -> Status:
-        if self.agent.hunger < MAX_HUNGER // 2:
+        if self.agent.hunger < self.cfg.MAX_HUNGER // 2:
             return Status.SUCCESS
         return Status.FAILURE
     
@@ -258,6 +260,6 @@ class IsSatisfied(AgentBehavior):
         return super().setup(**kwargs)
     
     def update(self) -> Status:
-        if self.agent.hunger > floor(MAX_HUNGER * 0.75):
+        if self.agent.hunger > floor(self.cfg.MAX_HUNGER * 0.75):
             return Status.SUCCESS
         return Status.FAILURE
@@ -0,0 +1,319 @@
+import numpy as np
+import py_trees
+from py_trees.common import Status
+from py_trees.behaviour import Behaviour
+from Controllers.behaviors import AgentBehavior
+
+"""
+compile_bt() flattens a py_trees behavior tree (built from Selector, Sequence, Repeat, and leaf behaviors,
+like the trees in bt_construction.py) into a CompiledBT: a table of nodes in preorder plus the status of
+every node, kept as small ints. CompiledBT.tick() walks the table directly, so a tick costs a few list
+lookups per node instead of py_trees' generators, logging, and visitors. It follows py_trees' (2.2.3)
+rules for RUNNING children, memory, and invalidation exactly, so an agent ticked with a CompiledBT does
+the same thing as one ticked with the original tree: the same leaves' update() are called in the same
+order, and initialise() is called at the same times.
+The leaves are the original behavior objects; only their update(), and their initialise() and terminate()
+if a class overrides them, are called.
+One BTProgram can be shared by every agent. The per-agent part of the tree (each node's status, each
+composite's current child, and each Repeat's success count) is kept in the rows of a BTStore, and a
+CompiledBT is a thin view of one row, like Agent is of AgentStore. A shared program's leaves are bound
+to the agent being ticked before each tick.
+"""
+
+# node kinds
+LEAF = 0
+SEQUENCE = 1
+SELECTOR = 2
+REPEAT = 3
+
+# node statuses
+INVALID = 0
+RUNNING = 1
+SUCCESS = 2
+FAILURE = 3
+
+STATUS_CODES = {Status.INVALID: INVALID, Status.RUNNING: RUNNING, Status.SUCCESS: SUCCESS, Status.FAILURE: FAILURE}
+STATUSES = (Status.INVALID, Status.RUNNING, Status.SUCCESS, Status.FAILURE) # indexed by status code
+
+"""
+Returns the method if cls overrides it with something that does more than py_trees' default
+"""
+def _hook(behaviour, name):
+    method = getattr(type(behaviour), name)
+    if method is getattr(Behaviour, name) or method is getattr(AgentBehavior, name, None):
+        return None
+    return getattr(behaviour, name)
+
+"""
+The structure of a compiled tree: one entry per node, in preorder, so node 0 is the root
+"""
+class BTProgram:
+    def __init__(self, root):
+        self.kinds = [] # the kind of each node (LEAF, SEQUENCE, SELECTOR, or REPEAT)
+        self.names = [] # the name of each node
+        self.children = [] # the indices of each node's children, as a tuple
+        self.memory = [] # the memory flag of each Sequence and Selector
+        self.num_success = [] # the number of successes each Repeat waits for
+        self.leaves = [] # the behavior object of each leaf; None for the other nodes
+        self.updates = [] # each leaf's update()
+        self.initialises = [] # each node's initialise() if it does anything, else None
+        self.terminates = [] # each node's terminate() if it does anything, else None
+        self.repeat_slots = [] # the column of each Repeat's success count in BTStore.success; -1 for the other nodes
+        self.num_repeats = 0
+        self._add(root)
+        self.num_nodes = len(self.kinds)
+        self.agent_leaves = [leaf for leaf in self.leaves if isinstance(leaf, AgentBehavior)]
+
+    def _add(self, behaviour):
+        index = len(self.kinds)
+        self.names.append(behaviour.name)
+        self.memory.append(getattr(behaviour, "memory", False))
+        self.num_success.append(getattr(behaviour, "num_success", 0))
+        self.children.append(())
+        self.initialises.append(None)
+        self.terminates.append(_hook(behaviour, "terminate"))
+        self.repeat_slots.append(-1)
+        if isinstance(behaviour, py_trees.decorators.Repeat):
+            self.kinds.append(REPEAT)
+            self.repeat_slots[index] = self.num_repeats
+            self.num_repeats += 1
+            self.leaves.append(None)
+            self.updates.append(None)
+            self.children[index] = (self._add(behaviour.decorated),)
+        elif isinstance(behaviour, (py_trees.composites.Sequence, py_trees.composites.Selector)):
+            self.kinds.append(SEQUENCE if isinstance(behaviour, py_trees.composites.Sequence) else SELECTOR)
+            self.leaves.append(None)
+            self.updates.append(None)
+            self.initialises[index] = _hook(behaviour, "initialise")
+            self.children[index] = tuple(self._add(child) for child in behaviour.children)
+        elif isinstance(behaviour, (py_trees.composites.Composite, py_trees.decorators.Decorator)):
+            raise ValueError(f"can't compile {type(behaviour).__name__} node '{behaviour.name}'")
+        else:
+            self.kinds.append(LEAF)
+            self.leaves.append(behaviour)
+            self.updates.append(behaviour.update)
+            self.initialises[index] = _hook(behaviour, "initialise")
+        return index
+
+    """
+    Makes every agent behavior leaf act on the given agent
+    """
+    def bind(self, agent):
+        for leaf in self.agent_leaves:
+            leaf.agent = agent
+
+"""
+BTStore keeps the runtime state of many agents' trees that share one BTProgram, one row per agent
+"""
+class BTStore:
+    def __init__(self, program, num_agents):
+        node_type = np.int8 if program.num_nodes < 128 else np.int32
+        self.program = program
+        self.status = np.full((num_agents, program.num_nodes), INVALID, dtype=np.int8) # the status code of each node
+        self.current_child = np.full((num_agents, program.num_nodes), -1, dtype=node_type) # the current child of each Sequence and Selector; -1 = none
+        self.success = np.zeros((num_agents, program.num_repeats), dtype=np.int32) # the success count of each Repeat (see BTProgram.repeat_slots)
+        self.count = np.zeros(num_agents, dtype=np.int64) # the number of ticks so far, like BehaviourTree.count
+
+"""
+A compiled behavior tree; a drop-in replacement for py_trees.trees.BehaviourTree in BT_Simulation.
+Its runtime state is row `row` of store; without a store it gets a private one-row store. If agent is
+given, the program's leaves are bound to it before every tick, so the program can be shared.
+"""
+class CompiledBT:
+    def __init__(self, program, store=None, row=0, agent=None):
+        self.program = program
+        self.store = store if store is not None else BTStore(program, 1)
+        self.row = row
+        self.agent = agent
+        self.status = None # while ticking, the row's node statuses as a list (lists are faster to index than arrays)
+        self.current_child = None
+        self.success = None
+
+    # the number of ticks so far, like BehaviourTree.count
+    @property
+    def count(self):
+        return int(self.store.count[self.row])
+
+    """
+    Ticks the tree once, like BehaviourTree.tick()
+    """
+    def tick(self):
+        store = self.store
+        row = self.row
+        if self.agent is not None:
+            self.program.bind(self.agent)
+        self.status = store.status[row].tolist()
+        self.current_child = store.current_child[row].tolist()
+        self.success = store.success[row].tolist()
+        try:
+            self._tick(0)
+        finally:
+            store.status[row] = self.status
+            store.current_child[row] = self.current_child
+            store.success[row] = self.success
+            self.status = self.current_child = self.success = None
+        store.count[row] += 1
+
+    """
+    Returns the py_trees status of a node, by index or by name
+    """
+    def node_status(self, node):
+        if isinstance(node, str):
+            node = self.program.names.index(node)
+        return STATUSES[int(self.store.status[self.row, node])]
+
+    """
+    Ticks node n and returns its new status, like Behaviour.tick() and the composites' tick()
+    """
+    def _tick(self, n):
+        program = self.program
+        status = self.status
+        kind = program.kinds[n]
+
+        if kind == LEAF:
+            if status[n] != RUNNING and program.initialises[n] is not None:
+                program.initialises[n]()
+            new_status = STATUS_CODES[program.updates[n]()]
+            if new_status != RUNNING:
+                self._stop(n, new_status)
+            status[n] = new_status
+            return new_status
+
+        children = program.children[n]
+        if kind == SEQUENCE:
+            index = 0
+            if status[n] != RUNNING:
+                self.current_child[n] = children[0]
+                for child in children:
+                    if status[child] != INVALID:
+                        self._stop(child, INVALID)
+                if program.initialises[n] is not None:
+                    program.initialises[n]()
+            elif program.memory[n]:
+                index = children.index(self.current_child[n])
+            else:
+                self.current_child[n] = children[0]
+            for i in range(index, len(children)):
+                new_status = self._tick(children[i])
+                if new_status != SUCCESS:
+                    status[n] = new_status
+                    if not program.memory[n]:
+                        for child in children[i + 1:]: # kill dangling runners
+                            if status[child] != INVALID:
+                                self._stop(child, INVALID)
+                    return new_status
+                if i + 1 < len(children):
+                    self.current_child[n] = children[i + 1]
+            self._stop(n, SUCCESS)
+            return SUCCESS
+
+        if kind == SELECTOR:
+            if status[n] != RUNNING:
+                self.current_child[n] = children[0]
+                if program.initialises[n] is not None:
+                    program.initialises[n]()
+            index = 0
+            if program.memory[n]:
+                index = children.index(self.current_child[n])
+                for child in children[:index]:
+                    self._stop(child, INVALID)
+            previous = self.current_child[n]
+            for i in range(index, len(children)):
+                child = children[i]
+                new_status = self._tick(child)
+                if new_status == RUNNING or new_status == SUCCESS:
+                    self.current_child[n] = child
+                    status[n] = new_status
+                    if previous != child: # interrupted: invalidate everything at a lower priority
+                        for lower in children[i + 1:]:
+                            if status[lower] != INVALID:
+                                self._stop(lower, INVALID)
+                    return new_status
+            status[n] = FAILURE
+            self.current_child[n] = children[-1]
+            return FAILURE
+
+        # REPEAT
+        slot = program.repeat_slots[n]
+        if status[n] != RUNNING:
+            self.success[slot] = 0
+        child_status = self._tick(children[0])
+        if child_status == FAILURE:
+            new_status = FAILURE
+        elif child_status == SUCCESS:
+            self.success[slot] += 1
+            new_status = SUCCESS if self.success[slot] == program.num_success[n] else RUNNING
+        else:
+            new_status = RUNNING
+        if new_status != RUNNING:
+            self._stop(n, new_status)
+        status[n] = new_status
+        return new_status
+
+    """
+    Stops node n with a new status, like the stop() of Behaviour, Composite, and Decorator
+    """
+    def _stop(self, n, new_status):
+        program = self.program
+        kind = program.kinds[n]
+        if kind == SEQUENCE or kind == SELECTOR:
+            if new_status == INVALID:
+                self.current_child[n] = -1
+                for child in program.children[n]:
+                    if self.status[child] != INVALID:
+                        self._stop(child, INVALID)
+        elif kind == REPEAT:
+            if program.terminates[n] is not None:
+                program.terminates[n](STATUSES[new_status])
+            child = program.children[n][0]
+            if new_status == INVALID:
+                self._stop(child, INVALID)
+            if self.status[child] == RUNNING:
+                self._stop(child, INVALID)
+            self.status[n] = new_status
+            return
+        if program.terminates[n] is not None:
+            program.terminates[n](STATUSES[new_status])
+        self.status[n] = new_status
+
+"""
+Returns a CompiledBT of a py_trees tree (a BehaviourTree or its root behavior)
+"""
+def compile_bt(tree):
+    root = tree.root if isinstance(tree, py_trees.trees.BehaviourTree) else tree
+    return CompiledBT(BTProgram(root))
+
+"""
+Returns the behaviors of a py_trees tree in preorder, the node order of BTProgram
+"""
+def tree_nodes(root):
+    nodes = [root]
+    for child in root.children:
+        nodes.extend(tree_nodes(child))
+    return nodes
+
+"""
+Copies the runtime state of a py_trees BehaviourTree (each node's status, each composite's current child,
+each Repeat's success count, and the tick count) into row `row` of a BTStore whose program has the same shape
+"""
+def save_tree_state(tree, store, row):
+    nodes = tree_nodes(tree.root)
+    index = {id(node): n for n, node in enumerate(nodes)}
+    current = [getattr(node, "current_child", None) for node in nodes]
+    store.status[row] = [STATUS_CODES[node.status] for node in nodes]
+    store.current_child[row] = [-1 if child is None else index[id(child)] for child in current]
+    store.success[row] = [node.success for node, slot in zip(nodes, store.program.repeat_slots) if slot >= 0]
+    store.count[row] = tree.count
+
+"""
+Sets the runtime state of a py_trees BehaviourTree from row `row` of a BTStore; the inverse of save_tree_state()
+"""
+def load_tree_state(tree, store, row):
+    nodes = tree_nodes(tree.root)
+    for node, code, child, slot in zip(nodes, store.status[row].tolist(), store.current_child[row].tolist(), store.program.repeat_slots):
+        node.status = STATUSES[code]
+        if isinstance(node, py_trees.composites.Composite):
+            node.current_child = None if child < 0 else nodes[child]
+        if slot >= 0:
+            node.success = int(store.success[row, slot])
+    tree.count = int(store.count[row])
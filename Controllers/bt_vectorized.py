@@ -0,0 +1,332 @@
+import numpy as np
+from math import floor
+from Controllers.behaviors import *
+from Controllers.bt_compiler import LEAF, SEQUENCE, SELECTOR, REPEAT, INVALID, RUNNING, SUCCESS, FAILURE
+from Model.movement import boid_step, laplacian_terms, csr_rows
+
+"""
+VectorizedBT ticks a shared compiled behavior tree (see bt_compiler.py) for a whole population at once.
+Instead of walking the tree once per agent, it walks it once per tick with the set of agents that reach
+each node: a condition leaf returns its status for all of them as an array (in effect a boolean mask),
+an action leaf is applied to all of them with array operations, and the composites split the set by
+the statuses their children return. The composites follow the same rules as CompiledBT, and the
+per-agent runtime state (statuses, current children, Repeat counts) is the same BTStore, so the two
+can be swapped between ticks.
+Leaves are run through the kernels in LEAF_KERNELS. Like a synchronous tick, the leaves read other
+agents only from the AgentStore's prev_* arrays, and grazing is recorded with SiteField.consume_many(),
+so the order agents are ticked in doesn't matter and each agent ends the tick as if its tree had been
+ticked on its own. The random draws are made as arrays, so results match sequential ticking
+statistically, not draw for draw.
+"""
+
+"""
+The world as the leaves see it during one vectorized tick
+"""
+class BTBatch:
+    def __init__(self, store, site_field, indptr, indices, visible, cfg):
+        self.store = store # the agents' AgentStore, snapshotted at the start of the tick
+        self.site_field = site_field
+        self.indptr = indptr # every agent's neighbor list (CSR), as in agent.neighbors
+        self.indices = indices
+        self.visible = visible # (agents, sites) mask of the sites each agent can see that have resources, as in agent.potential_sites
+        self.cfg = cfg
+        rows = csr_rows(indptr)
+        self.same_group = store.group[indices] == store.group[rows] # which neighbor entries are group neighbors, as in agent.group_neighbors
+        self.num_neighbors = np.diff(indptr)
+        self.num_group_neighbors = np.bincount(rows[self.same_group], minlength=store.num_agents)
+
+    """
+    Returns the neighbor entries of the given agents: (entry indices, the position in ids of each entry's agent)
+    """
+    def entries(self, ids):
+        starts = self.indptr[ids]
+        counts = self.indptr[ids + 1] - starts
+        owner = np.repeat(np.arange(len(ids)), counts)
+        offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return starts[owner] + offsets, owner
+
+### LEAF KERNELS ###
+# each takes (batch, leaf, ids), where leaf is the program's behavior object, and returns one status code per id
+
+"""
+Agent.random_walk() for the given agents
+"""
+def random_walk(batch, ids, potency=1.0):
+    store = batch.store
+    store.theta[ids] += np.mod(np.random.uniform(-np.pi/12, np.pi/12, len(ids)), 2*np.pi)
+    theta = store.theta[ids]
+    store.positions[ids] += np.stack([np.cos(theta), np.sin(theta)], axis=1) * (batch.cfg.DT * 10 * potency)
+
+def flock_initialise(batch, leaf, ids):
+    timer = batch.store.timer
+    timer[ids[timer[ids] == 0]] = batch.cfg.AGENT_BORED_THRESHOLD
+
+def flock(batch, leaf, ids):
+    store = batch.store
+    timer = store.timer[ids]
+    status = np.full(len(ids), SUCCESS, dtype=np.int8)
+    status[(timer > 0) & (batch.num_neighbors[ids] <= 0)] = FAILURE
+    moving = ids[(timer > 0) & (batch.num_neighbors[ids] > 0)]
+    status[(timer > 0) & (batch.num_neighbors[ids] > 0)] = RUNNING
+    if len(moving) == 0:
+        return status
+    if batch.cfg.USE_BOID_MOVE:
+        store.positions[moving], store.theta[moving], _ = boid_step(store, batch.indptr, batch.indices, batch.cfg, ids=moving)
+    else:
+        attraction, diffuse, repulsion = laplacian_terms(store, batch.indptr, batch.indices, ids=moving)
+        store.positions[moving] += (attraction * leaf.attr_factor + diffuse * leaf.diff_factor - repulsion) * batch.cfg.DT
+    random_walk(batch, moving, potency=10.0)
+    store.timer[moving] -= 1
+    return status
+
+def go_to_site(batch, leaf, ids):
+    store = batch.store
+    positions = store.positions[ids]
+    following = store.following[ids]
+    dx = np.where((following >= 0)[:, None], store.prev_positions[following] - positions, 0.0)
+    dx += batch.site_field.positions[store.site_id[ids]] - positions
+    store.positions[ids] += dx * batch.cfg.DT * batch.cfg.AGENT_SITE_ATTRACTION
+    return np.full(len(ids), SUCCESS, dtype=np.int8)
+
+def query_for_sites(batch, leaf, ids):
+    store = batch.store
+    available = batch.site_field.available()
+
+    # follow the first group neighbor going to a site with resources, with 80% chance each
+    entries, owner = batch.entries(ids)
+    neighbors = batch.indices[entries]
+    neighbor_site = store.prev_site_id[neighbors]
+    candidate = batch.same_group[entries] & (neighbor_site >= 0)
+    candidate[candidate] = available[neighbor_site[candidate]]
+    accept = np.zeros(len(entries), dtype=bool)
+    accept[candidate] = np.random.random(np.count_nonzero(candidate)) > 0.2
+    winners, first = np.unique(owner[accept], return_index=True)
+    followed = ids[winners]
+    store.set_site_ids(followed, neighbor_site[accept][first])
+    store.remember_ids(followed, neighbor_site[accept][first])
+    store.following[followed] = neighbors[accept][first]
+
+    # otherwise, each sensed site gives a 50% chance to pick a sensed site that isn't remembered
+    rest = np.delete(ids, winners)
+    visible = batch.visible[rest]
+    num_visible = visible.sum(axis=1)
+    site_ids = np.arange(visible.shape[1])
+    for k in range(int(num_visible.max(initial=0))):
+        trying = np.flatnonzero(num_visible > k)
+        trying = trying[np.random.random(len(trying)) > 0.5]
+        agents = rest[trying]
+        remembered = (store.memory[agents][:, None, :] == site_ids[None, :, None]).any(axis=2)
+        viable = visible[trying] & ~remembered
+        num_viable = viable.sum(axis=1)
+        picking = num_viable > 0
+        agents, viable = agents[picking], viable[picking]
+        pick = np.random.randint(0, num_viable[picking]) if len(agents) > 0 else np.zeros(0, dtype=np.int64)
+        chosen = np.argmax(viable & (np.cumsum(viable, axis=1) - 1 == pick[:, None]), axis=1)
+        store.set_site_ids(agents, chosen)
+        store.remember_ids(agents, chosen)
+    return np.full(len(ids), SUCCESS, dtype=np.int8)
+
+def graze(batch, leaf, ids):
+    store = batch.store
+    store.hunger[ids] += 2
+    batch.site_field.consume_many(store.site_id[ids])
+    store.timer[ids] -= 1
+    store.positions[ids] += (batch.site_field.positions[store.site_id[ids]] - store.positions[ids]) * batch.cfg.DT
+    return np.full(len(ids), SUCCESS, dtype=np.int8)
+
+def explore(batch, leaf, ids):
+    random_walk(batch, ids)
+    return np.full(len(ids), SUCCESS, dtype=np.int8)
+
+def rest(batch, leaf, ids):
+    return np.full(len(ids), SUCCESS, dtype=np.int8)
+
+"""
+Returns SUCCESS where mask is True and FAILURE elsewhere
+"""
+def condition(mask):
+    return np.where(mask, SUCCESS, FAILURE).astype(np.int8)
+
+def at_site(batch, leaf, ids):
+    return condition(np.zeros(len(ids), dtype=bool)) # AtSite calls agent.at_site() without a site, which is always False
+
+def site_selected(batch, leaf, ids):
+    return condition(batch.store.site_id[ids] >= 0)
+
+def have_neighbors(batch, leaf, ids):
+    return condition(batch.num_neighbors[ids] > 0)
+
+def have_group_neighbors(batch, leaf, ids):
+    return condition(batch.num_group_neighbors[ids] > 0)
+
+def is_bored(batch, leaf, ids):
+    return condition(batch.store.timer[ids] <= 0)
+
+def is_hungry(batch, leaf, ids):
+    return condition(batch.store.hunger[ids] < batch.cfg.MAX_HUNGER // 2)
+
+def is_satisfied(batch, leaf, ids):
+    return condition(batch.store.hunger[ids] > floor(batch.cfg.MAX_HUNGER * 0.75))
+
+# behavior class -> (update kernel, initialise kernel or None)
+LEAF_KERNELS = {Flock: (flock, flock_initialise),
+                GoToSite: (go_to_site, None),
+                QueryForSites: (query_for_sites, None),
+                Graze: (graze, None),
+                Explore: (explore, None),
+                Rest: (rest, None),
+                AtSite: (at_site, None),
+                SiteSelected: (site_selected, None),
+                HaveNeighbors: (have_neighbors, None),
+                HaveGroupNeighbors: (have_group_neighbors, None),
+                IsBored: (is_bored, None),
+                IsHungry: (is_hungry, None),
+                IsSatisfied: (is_satisfied, None)}
+
+class VectorizedBT:
+    def __init__(self, program, bt_store):
+        self.program = program
+        self.bt_store = bt_store
+        self.kernels = [None] * program.num_nodes # each leaf's (update, initialise) kernels
+        for n, leaf in enumerate(program.leaves):
+            if program.kinds[n] != LEAF:
+                if program.initialises[n] is not None or program.terminates[n] is not None:
+                    raise ValueError(f"can't vectorize node '{program.names[n]}': it has its own initialise() or terminate()")
+                continue
+            if type(leaf) not in LEAF_KERNELS or program.terminates[n] is not None:
+                raise ValueError(f"can't vectorize leaf '{program.names[n]}' ({type(leaf).__name__})")
+            self.kernels[n] = LEAF_KERNELS[type(leaf)]
+        self.batch = None
+
+    """
+    Ticks the tree of every agent in ids (sorted) once, like CompiledBT.tick() for each of them
+    """
+    def tick(self, batch, ids):
+        self.batch = batch
+        try:
+            self._tick(0, ids)
+        finally:
+            self.batch = None
+        self.bt_store.count[ids] += 1
+
+    """
+    Ticks node n for the agents in ids and returns their new statuses
+    """
+    def _tick(self, n, ids):
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int8)
+        program = self.program
+        status = self.bt_store.status
+        current = self.bt_store.current_child
+        kind = program.kinds[n]
+        not_running = status[ids, n] != RUNNING
+
+        if kind == LEAF:
+            update, initialise = self.kernels[n]
+            if initialise is not None:
+                initialise(self.batch, program.leaves[n], ids[not_running])
+            new_status = update(self.batch, program.leaves[n], ids)
+            status[ids, n] = new_status
+            return new_status
+
+        children = program.children[n]
+        new_status = np.empty(len(ids), dtype=np.int8)
+        if kind == SEQUENCE:
+            starting = ids[not_running]
+            current[starting, n] = children[0]
+            for child in children:
+                self._stop(child, starting[status[starting, child] != INVALID], INVALID)
+            start = np.zeros(len(ids), dtype=np.int64)
+            if program.memory[n]:
+                start[~not_running] = self._positions(n, ids[~not_running])
+            else:
+                current[ids[~not_running], n] = children[0]
+            active = np.zeros(len(ids), dtype=bool)
+            for i, child in enumerate(children):
+                active |= start == i
+                child_status = self._tick(child, ids[active])
+                stopped = np.flatnonzero(active)[child_status != SUCCESS]
+                new_status[stopped] = child_status[child_status != SUCCESS]
+                status[ids[stopped], n] = new_status[stopped]
+                if not program.memory[n]:
+                    for later in children[i + 1:]: # kill dangling runners
+                        self._stop(later, ids[stopped][status[ids[stopped], later] != INVALID], INVALID)
+                active[stopped] = False
+                if i + 1 < len(children):
+                    current[ids[active], n] = children[i + 1]
+            new_status[active] = SUCCESS
+            self._stop(n, ids[active], SUCCESS)
+            return new_status
+
+        if kind == SELECTOR:
+            current[ids[not_running], n] = children[0]
+            start = np.zeros(len(ids), dtype=np.int64)
+            if program.memory[n]:
+                start = self._positions(n, ids)
+                for i, child in enumerate(children):
+                    self._stop(child, ids[start > i], INVALID)
+            previous = current[ids, n].copy()
+            active = np.zeros(len(ids), dtype=bool)
+            for i, child in enumerate(children):
+                active |= start == i
+                child_status = self._tick(child, ids[active])
+                won = (child_status == RUNNING) | (child_status == SUCCESS)
+                chosen = np.flatnonzero(active)[won]
+                new_status[chosen] = child_status[won]
+                current[ids[chosen], n] = child
+                status[ids[chosen], n] = new_status[chosen]
+                interrupted = ids[chosen[previous[chosen] != child]] # invalidate everything at a lower priority
+                for lower in children[i + 1:]:
+                    self._stop(lower, interrupted[status[interrupted, lower] != INVALID], INVALID)
+                active[chosen] = False
+            failed = ids[active]
+            new_status[active] = FAILURE
+            status[failed, n] = FAILURE
+            current[failed, n] = children[-1]
+            return new_status
+
+        # REPEAT
+        slot = program.repeat_slots[n]
+        success = self.bt_store.success
+        success[ids[not_running], slot] = 0
+        child_status = self._tick(children[0], ids)
+        new_status[:] = RUNNING
+        new_status[child_status == FAILURE] = FAILURE
+        succeeded = ids[child_status == SUCCESS]
+        success[succeeded, slot] += 1
+        done = np.zeros(len(ids), dtype=bool)
+        done[child_status == SUCCESS] = success[succeeded, slot] == program.num_success[n]
+        new_status[done] = SUCCESS
+        for code in (SUCCESS, FAILURE):
+            self._stop(n, ids[new_status == code], code)
+        status[ids, n] = new_status
+        return new_status
+
+    """
+    Returns the position among node n's children of each agent's current child
+    """
+    def _positions(self, n, ids):
+        lookup = np.full(self.program.num_nodes, -1, dtype=np.int64)
+        lookup[list(self.program.children[n])] = np.arange(len(self.program.children[n]))
+        return lookup[self.bt_store.current_child[ids, n]]
+
+    """
+    Stops node n for the agents in ids with new_status, like CompiledBT._stop()
+    """
+    def _stop(self, n, ids, new_status):
+        if len(ids) == 0:
+            return
+        program = self.program
+        status = self.bt_store.status
+        kind = program.kinds[n]
+        if kind == SEQUENCE or kind == SELECTOR:
+            if new_status == INVALID:
+                self.bt_store.current_child[ids, n] = -1
+                for child in program.children[n]:
+                    self._stop(child, ids[status[ids, child] != INVALID], INVALID)
+        elif kind == REPEAT:
+            child = program.children[n][0]
+            if new_status == INVALID:
+                self._stop(child, ids, INVALID)
+            self._stop(child, ids[status[ids, child] == RUNNING], INVALID)
+        status[ids, n] = new_status
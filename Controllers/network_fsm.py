@@ -0,0 +1,202 @@
+import numpy as np
+from Controllers.states import NET_FLOCK, NET_EXPLORE, NET_REST, NET_GOTOSITE, NET_FOLLOW
+from Model.movement import boid_step, laplacian_terms, csr_rows, sum_rows
+
+NETWORK_STATES = (NET_FLOCK, NET_EXPLORE, NET_REST, NET_GOTOSITE, NET_FOLLOW) # the codes of the states FSM_Simulation's agents use
+
+"""
+The vectorized network state machine: one tick of NetworkFlockState, NetworkExploreState, NetworkRestState,
+GoToSiteState, and FollowState (see states.py) for every agent at once. Agents are partitioned into one
+boolean mask per state, and each state's update() and move() become a few array operations over its mask.
+Like a synchronous tick, every condition reads the world as it was at the start of the tick, so the
+store's prev_* arrays must be snapshotted first. The random numbers are drawn as arrays, so the results
+match the object-based states statistically, not draw for draw.
+"""
+
+"""
+Returns math.isclose(a, b) elementwise
+"""
+def isclose(a, b):
+    return np.abs(a - b) <= 1e-9 * np.maximum(np.abs(a), np.abs(b))
+
+"""
+Vectorized border handling of State.move() and Simulation.handle_boundaries(): clamps every position to
+the world, in the same order as State.move(), and returns how many borders each position crossed
+"""
+def clamp_to_world(positions, cfg):
+    crossed = np.zeros(len(positions), dtype=np.int64)
+    low = cfg.PADDING
+    high = cfg.WORLD_SIZE - cfg.PADDING
+    for axis in (0, 1):
+        out = isclose(positions[:, axis], low) | (positions[:, axis] < low)
+        positions[out, axis] = low + cfg.DT
+        crossed += out
+    for axis in (0, 1):
+        out = isclose(positions[:, axis], high) | (positions[:, axis] > high)
+        positions[out, axis] = high - cfg.DT
+        crossed += out
+    return crossed
+
+"""
+Draws network_step()'s random numbers from np.random, like the object-based states do
+"""
+class NumpyDraws:
+    def __init__(self, num_agents):
+        self.num_agents = num_agents
+
+    """
+    Returns one uniform value in [low, high) per agent
+    """
+    def uniform(self, low, high):
+        return np.random.uniform(low, high, self.num_agents)
+
+    """
+    Returns one uniform [0, 1) value per entry of a CSR neighbor list
+    """
+    def pairs(self, indptr):
+        return np.random.random(int(indptr[-1]))
+
+"""
+Runs the update() and move() of every agent's network state. (indptr, indices) are the agents' neighbor lists.
+visible and at are (agents, S) masks of the sites each agent can see (and that have resources) and is at; column c
+is site id site_offset + c, where site_offset is 0 or one offset per agent. Site ids are SiteField rows.
+draws supplies the random numbers (see NumpyDraws). Grazing is recorded with site_field.consume_many(), and
+it is up to the caller to apply it.
+"""
+def network_step(store, site_field, indptr, indices, visible, at, draws, cfg, site_offset=0):
+    num_agents = store.num_agents
+    ids = np.arange(num_agents)
+    bored = cfg.AGENT_BORED_THRESHOLD
+    positions = store.prev_positions # where every agent was at the start of the tick
+    state = store.prev_state # every agent's state at the start of the tick
+    site = store.prev_site_id
+    timer = store.state_timer.copy()
+    offset = np.broadcast_to(np.asarray(site_offset, dtype=np.int64), (num_agents,))
+    available = site_field.available()
+
+    rows = csr_rows(indptr)
+    has_neighbors = np.diff(indptr) > 0
+    same_group = store.group[indices] == store.group[rows]
+    num_group_neighbors = np.bincount(rows[same_group], minlength=num_agents)
+
+    u_seek = draws.uniform(0.0, 1.0)
+    u_pick = draws.uniform(0.0, 1.0)
+    u_listen = draws.pairs(indptr)
+    new_speed = draws.uniform(1.0, cfg.MAX_SPEED)
+    new_theta = draws.uniform(-np.pi, np.pi)
+    u_walk = draws.uniform(-np.pi/12, np.pi/12)
+
+    # NetworkFlockState and FollowState: 50% chance to go to a sensed site that isn't remembered
+    site_ids = offset[:, None] + np.arange(visible.shape[1])
+    remembered = (store.memory[:, None, :] == site_ids[:, :, None]).any(axis=2)
+    viable = visible & ~remembered
+    num_viable = viable.sum(axis=1)
+    seek = ((state == NET_FLOCK) | (state == NET_FOLLOW)) & (u_seek > 0.5) & (num_viable > 0)
+    pick = np.minimum((u_pick * num_viable).astype(np.int64), np.maximum(num_viable - 1, 0))
+    chosen = offset.copy() # no agent seeks a site if there are none
+    if visible.shape[1] > 0:
+        chosen += np.argmax(viable & (np.cumsum(viable, axis=1) - 1 == pick[:, None]), axis=1)
+
+    # NetworkFlockState: follow the first group neighbor going to a site, with 80% chance each
+    flock = (state == NET_FLOCK) & ~seek
+    listen = flock[rows] & same_group & (state[indices] == NET_GOTOSITE) & (u_listen > 0.2)
+    listeners, first = np.unique(rows[listen], return_index=True)
+    leaders = indices[listen][first]
+    flock[listeners] = False
+    flock_bored = flock & (timer == 0)
+
+    # NetworkExploreState
+    explore = state == NET_EXPLORE
+    explore_done = explore & (timer == 0)
+
+    # NetworkRestState
+    rest = state == NET_REST
+    store.hunger[rest] += 2
+    site_field.consume_many(site[rest])
+    site_available = np.zeros(num_agents, dtype=bool)
+    site_available[rest] = available[site[rest]]
+    rest_done = rest & ((timer == 0) | (num_group_neighbors == 0) | (store.hunger >= cfg.MAX_HUNGER) | ~site_available)
+
+    # GoToSiteState
+    go = state == NET_GOTOSITE
+    at_own_site = np.zeros(num_agents, dtype=bool)
+    at_own_site[go] = at[ids[go], site[go] - offset[go]]
+    go_lost = go & ~has_neighbors
+    go_arrived = go & has_neighbors & at_own_site
+
+    # FollowState
+    follow = (state == NET_FOLLOW) & ~seek
+    follow_lost = follow & ~has_neighbors
+    leader = np.where(follow, store.following, 0)
+    leader_site = np.where(follow, site[leader], -1)
+    known = leader_site >= 0
+    at_leader_site = np.zeros(num_agents, dtype=bool)
+    at_leader_site[known] = at[ids[known], leader_site[known] - offset[known]]
+    follow_arrived = follow & has_neighbors & at_leader_site
+    follow_regroup = follow & has_neighbors & ~at_leader_site & (state[leader] != NET_GOTOSITE)
+
+    # apply the transitions; each agent takes at most one
+    new_state = state.copy()
+    to_site = np.flatnonzero(seek)
+    store.set_site_ids(to_site, chosen[to_site])
+    store.remember_ids(to_site, chosen[to_site])
+    store.following[seek & (state == NET_FOLLOW)] = -1
+    new_state[to_site] = NET_GOTOSITE
+
+    store.following[listeners] = leaders
+    new_state[listeners] = NET_FOLLOW
+
+    store.speed[rest_done] = new_speed[rest_done]
+    store.theta[rest_done] = new_theta[rest_done]
+    store.following[follow_lost] = -1
+    to_explore = flock_bored | rest_done | go_lost | follow_lost
+    new_state[to_explore] = NET_EXPLORE
+    to_flock = explore_done | follow_regroup
+    new_state[to_flock] = NET_FLOCK
+    store.set_site_ids(np.flatnonzero(to_explore | to_flock), -1)
+    store.state_timer[to_explore | to_flock] = bored
+    store.state_timer[explore & ~explore_done] -= 1
+
+    joined = np.flatnonzero(follow_arrived)
+    store.set_site_ids(joined, leader_site[joined])
+    store.remember_ids(joined, leader_site[joined])
+    new_state[go_arrived | follow_arrived] = NET_REST
+    store.state_timer[go_arrived | follow_arrived] = bored
+    store.state[:] = new_state
+
+    # movement, by the state each agent is in now
+    live = store.positions
+    flocking = new_state == NET_FLOCK
+    if cfg.USE_BOID_MOVE:
+        moved_positions, moved_theta, _ = boid_step(store, indptr, indices, cfg)
+        live[flocking] = moved_positions[flocking]
+        store.theta[flocking] = moved_theta[flocking]
+    else:
+        attraction, diffuse, repulsion = laplacian_terms(store, indptr, indices)
+        moving = flocking & has_neighbors
+        live[moving] += (attraction + diffuse - repulsion)[moving] * cfg.DT
+
+    # Agent.random_walk()
+    potency = np.select([flocking, new_state == NET_EXPLORE, new_state == NET_GOTOSITE], [0.5, 1.0, 1.0], 0.0)
+    walking = potency > 0
+    store.theta[walking] += np.mod(u_walk[walking], 2*np.pi)
+    theta = store.theta[walking]
+    live[walking] += np.stack([np.cos(theta), np.sin(theta)], axis=1) * (cfg.DT * 10 * potency[walking])[:, None]
+
+    going = new_state == NET_GOTOSITE
+    live[going] += (site_field.positions[store.site_id[going]] - live[going]) * cfg.DT
+
+    # NetworkRestState and FollowState move toward a target while keeping away from their neighbors
+    c = positions[indices] - positions[rows]
+    scaling_factor = np.einsum("ij,ij->i", c, c)
+    scaling_factor[scaling_factor == 0] = 1
+    spacing = sum_rows(rows, c / scaling_factor[:, None], num_agents)
+    resting = new_state == NET_REST
+    dx = site_field.positions[store.site_id[resting]] - live[resting]
+    live[resting] += (dx - spacing[resting]) * cfg.DT
+    following = new_state == NET_FOLLOW
+    dx = positions[store.following[following]] - live[following]
+    live[following] += (dx - spacing[following]) * cfg.DT
+
+    # State.move() border handling
+    store.hunger += clamp_to_world(live, cfg)
@@ -11,222 +11,237 @@ NET_EXPLORE_NAME = "NETWORK_EXP"
 NET_REST_NAME = "NETWORK_REST"
 NET_GOTOSITE_NAME = "NETWORK_LEAD"
 NET_FOLLOW_NAME = "NETWORK_FOLLOW"
+# integer codes used to store each agent's state in AgentStore.state; also the state's index in STATES
+NET_FLOCK, NET_EXPLORE, NET_REST, NET_GOTOSITE, NET_FOLLOW = 0, 1, 2, 3, 4
+EXPLORE, LOW_DENSE, HIGH_DENSE, REST, FLEE = 5, 6, 7, 8, 9
+# key: state name, value: code
+STATE_CODES = {NET_FLOCK_NAME: NET_FLOCK, NET_EXPLORE_NAME: NET_EXPLORE, NET_REST_NAME: NET_REST,
+               NET_GOTOSITE_NAME: NET_GOTOSITE, NET_FOLLOW_NAME: NET_FOLLOW, EXPLORE_NAME: EXPLORE,
+               LOW_DENSE_NAME: LOW_DENSE, HIGH_DENSE_NAME: HIGH_DENSE, REST_NAME: REST, FLEE_NAME: FLEE}
 
 import numpy as np
 import math
 from World.config import *
 
 """
-The base class for all the states. When making a new state:
-1. override all three base methods
+The base class for all the states. States are flyweights: there is one shared instance of each state
+(see STATES at the bottom of this file), and it holds no per-agent data. An agent's state is the integer
+code in AgentStore.state, and the timer its state counts down is AgentStore.state_timer
+(agent.state_timer), so a transition only writes two numbers and allocates nothing.
+To change an agent's state, call agent.transition(code), which runs the new state's enter().
+When making a new state:
+1. override the base methods, which all take the agent they act on
 2. call super().method() within the overridden methods
+3. give it a code in STATE_CODES and add its instance to STATES
 """
 class State:
-    def __init__(self, name, color, agent):
+    def __init__(self, name, color):
         self.name = name
         self.color = color
-        self.agent = agent
+        self.code = STATE_CODES.get(name, -1) # the code agents in this state store in AgentStore.state
+
+    """
+    enter() should contain the setup an agent needs when it transitions into the state.
+    """
+    def enter(self, agent):
+        pass
 
     """
     update() should contain all the logic to transition to and from the state.
     """
-    def update(self, neighbors, sites, predators):
+    def update(self, agent, neighbors, sites, predators):
         pass
 
     """
     move() should contain all the logic for the agent to move. Agent has two built-in methods for movement, depending
-    on whether USE_BOIDS_MOVEMENT is true or false. Use self.agent.move() if True, and self.agent.repulse_move() if False.
-    You can directly modify self.agent's properties.
+    on whether USE_BOIDS_MOVEMENT is true or false. Use agent.move() if True, and agent.repulse_move() if False.
+    You can directly modify agent's properties.
     """
-    def move(self, neighbors, predators):
+    def move(self, agent, neighbors, predators):
         # handle repulsion away from world borders
         # FIXME: current behavior just has agents crowding the edges
 
-        if math.isclose(self.agent.pos[0], PADDING) or self.agent.pos[0] < PADDING:
-            self.agent.pos[0] = PADDING + DT
-            self.agent.hunger += 1
+        if math.isclose(agent.pos[0], agent.cfg.PADDING) or agent.pos[0] < agent.cfg.PADDING:
+            agent.pos[0] = agent.cfg.PADDING + agent.cfg.DT
+            agent.hunger += 1
 
-        if math.isclose(self.agent.pos[1], PADDING) or self.agent.pos[1] < PADDING:
-            self.agent.pos[1] = PADDING + DT
-            self.agent.hunger += 1
+        if math.isclose(agent.pos[1], agent.cfg.PADDING) or agent.pos[1] < agent.cfg.PADDING:
+            agent.pos[1] = agent.cfg.PADDING + agent.cfg.DT
+            agent.hunger += 1
 
-        if math.isclose(self.agent.pos[0], WORLD_SIZE - PADDING) or self.agent.pos[0] > WORLD_SIZE - PADDING:
-            self.agent.pos[0] = WORLD_SIZE - PADDING - DT
-            self.agent.hunger += 1
+        if math.isclose(agent.pos[0], agent.cfg.WORLD_SIZE - agent.cfg.PADDING) or agent.pos[0] > agent.cfg.WORLD_SIZE - agent.cfg.PADDING:
+            agent.pos[0] = agent.cfg.WORLD_SIZE - agent.cfg.PADDING - agent.cfg.DT
+            agent.hunger += 1
 
-        if math.isclose(self.agent.pos[1], WORLD_SIZE - PADDING) or self.agent.pos[1] > WORLD_SIZE - PADDING:
-            self.agent.pos[1] = WORLD_SIZE - PADDING - DT
-            self.agent.hunger += 1 # this will make it so their hunger doesn't keep deprecating out of bounds to help with stats?
+        if math.isclose(agent.pos[1], agent.cfg.WORLD_SIZE - agent.cfg.PADDING) or agent.pos[1] > agent.cfg.WORLD_SIZE - agent.cfg.PADDING:
+            agent.pos[1] = agent.cfg.WORLD_SIZE - agent.cfg.PADDING - agent.cfg.DT
+            agent.hunger += 1 # this will make it so their hunger doesn't keep deprecating out of bounds to help with stats?
 
 """
-The Network-based States take into account neighbors that are part of self.agent's group in
+The Network-based States take into account neighbors that are part of the agent's group in
 either movement, transitioning, or both. These states are all part of the same state machine.
 """
 ### NETWORK-BASED STATES ###
 
 class NetworkFlockState(State):
-    def __init__(self, name, color, agent):
-        super().__init__(name, color, agent)
-        self.agent.site = None
-        self.timer = AGENT_BORED_THRESHOLD
+    def enter(self, agent):
+        super().enter(agent)
+        agent.site = None
+        agent.state_timer = agent.cfg.AGENT_BORED_THRESHOLD
 
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
         if sites:
             # random chance to actually want to go to site (default set to 50%?)
             if np.random.random() > 0.5:
                 # make sure we don't go back to last_known_site so agents can wander away
-                viable_sites = list(filter(lambda i: i not in self.agent.last_known_sites, sites))
+                viable_sites = list(filter(lambda i: i not in agent.last_known_sites, sites))
                 if len(viable_sites) > 0:
-                    self.agent.site = viable_sites[np.random.randint(0, len(viable_sites))]
-                    self.agent.add_site(self.agent.site)
-                    self.agent.state = GoToSiteState(NET_GOTOSITE_NAME, (0, 0, 255), self.agent)
+                    agent.site = viable_sites[np.random.randint(0, len(viable_sites))]
+                    agent.add_site(agent.site)
+                    agent.transition(NET_GOTOSITE)
                     return
 
+        group = agent.group
         for neighbor in neighbors:
-            if np.array_equal(self.agent.sim.get_agent_group_id(neighbor), self.agent.group_id):
-                if isinstance(self.agent.sim.agents[neighbor].state, GoToSiteState):
+            if agent.sim.get_agent_group(neighbor) == group:
+                if agent.sim.get_agent_state(neighbor) == NET_GOTOSITE:
                     # random chance to listen to neighbor
                     if np.random.random() > 0.2:
-                        self.agent.following = neighbor
-                        self.agent.state = FollowState(NET_FOLLOW_NAME, (0, 100, 255), self.agent)
+                        agent.following = neighbor
+                        agent.transition(NET_FOLLOW)
                         return
         
-        if self.timer == 0:
-            self.agent.state = NetworkExploreState(NET_EXPLORE_NAME, (100, 255, 0), self.agent)
+        if agent.state_timer == 0:
+            agent.transition(NET_EXPLORE)
 
-    def move(self, neighbors, predators):
-        if USE_BOID_MOVE:
-            self.agent.move(neighbors, predators)
+    def move(self, agent, neighbors, predators):
+        if agent.cfg.USE_BOID_MOVE:
+            agent.move(neighbors, predators)
         else:
-            self.agent.repulse_move(neighbors, predators)
-        self.agent.random_walk(potency=0.5) # turning on random walk causes some jitter, but also prevents stagnation when no neighbors
-        super().move(neighbors, predators)
+            agent.repulse_move(neighbors, predators)
+        agent.random_walk(potency=0.5) # turning on random walk causes some jitter, but also prevents stagnation when no neighbors
+        super().move(agent, neighbors, predators)
 
 class NetworkExploreState(State):
-    def __init__(self, name, color, agent):
-        super().__init__(name, color, agent)
-        self.agent.site = None
-        self.timer = AGENT_BORED_THRESHOLD
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        if self.timer == 0:
-            self.agent.state = NetworkFlockState(NET_FLOCK_NAME, (0, 255, 0), self.agent)
+    def enter(self, agent):
+        super().enter(agent)
+        agent.site = None
+        agent.state_timer = agent.cfg.AGENT_BORED_THRESHOLD
+
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        if agent.state_timer == 0:
+            agent.transition(NET_FLOCK)
             return
-        self.timer -= 1
+        agent.state_timer -= 1
     
-    def move(self, neighbors, predators):
-        self.agent.random_walk(potency=1.0)
-        super().move(neighbors, predators)
+    def move(self, agent, neighbors, predators):
+        agent.random_walk(potency=1.0)
+        super().move(agent, neighbors, predators)
 
 class NetworkRestState(State):
-    def __init__(self, name, color, agent):
-        super().__init__(name, color, agent)
-        self.timer = AGENT_BORED_THRESHOLD
+    def enter(self, agent):
+        super().enter(agent)
+        agent.state_timer = agent.cfg.AGENT_BORED_THRESHOLD
 
     # TODO: have a better way to transition out haha
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        self.agent.hunger += 2
-        self.agent.site.resource_count -= 1
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        agent.hunger += 2
+        agent.site.consume()
         # calculate group-id densities to determine how much more time they'll stay on site
         num_group_neighbors = 0
         if neighbors:
+            group = agent.group
             for neighbor in neighbors:
-                if np.array_equal(self.agent.sim.get_agent_group_id(neighbor), self.agent.group_id):
+                if agent.sim.get_agent_group(neighbor) == group:
                     num_group_neighbors += 1
 
         # will eventually leave site if no group members are present OR if no neighbors present either
         else:
-            self.timer = 0
+            agent.state_timer = 0
         
-        if self.timer == 0 or num_group_neighbors == 0 or self.agent.hunger >= MAX_HUNGER or not self.agent.site.is_available():
-            self.agent.speed = np.random.uniform(1.0, MAX_SPEED) # reset speed
-            self.agent.theta = np.random.uniform(-np.pi, np.pi)
-            self.agent.state = NetworkExploreState(NET_EXPLORE_NAME, (100, 255, 0), self.agent)
+        if agent.state_timer == 0 or num_group_neighbors == 0 or agent.hunger >= agent.cfg.MAX_HUNGER or not agent.site.is_available():
+            agent.speed = np.random.uniform(1.0, agent.cfg.MAX_SPEED) # reset speed
+            agent.theta = np.random.uniform(-np.pi, np.pi)
+            agent.transition(NET_EXPLORE)
 
         # *potentially* change group membership???
 
 
-    def move(self, neighbors, predators):
-        dx = self.agent.site.pos - self.agent.pos
-        repulsion = np.zeros_like(self.agent.pos)
+    def move(self, agent, neighbors, predators):
+        dx = agent.site.pos - agent.pos
+        repulsion = np.zeros_like(agent.pos)
         for neighbor in neighbors:
-            c = self.agent.sim.get_agent_pos(neighbor) - self.agent.pos
+            c = agent.sim.get_agent_pos(neighbor) - agent.pos
             scaling_factor = c @ c
             if scaling_factor == 0:
                 scaling_factor = 1
             repulsion += c / scaling_factor
-        self.agent.pos += (dx - repulsion) * DT
-        super().move(neighbors, predators)
+        agent.pos += (dx - repulsion) * agent.cfg.DT
+        super().move(agent, neighbors, predators)
 
 class GoToSiteState(State):
-    def __init__(self, name, color, agent):
-        super().__init__(name, color, agent)
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
         if not neighbors:
-            self.agent.state = NetworkExploreState(NET_EXPLORE_NAME, (100, 255, 0), self.agent)
+            agent.transition(NET_EXPLORE)
             return
-        if self.agent.at_site(self.agent.site):
-            self.agent.state = NetworkRestState(NET_REST_NAME, (0, 255, 255), self.agent)
+        if agent.at_site(agent.site):
+            agent.transition(NET_REST)
             return
         
-    def move(self, neighbors, predators):
-        # self.agent.repulse_move(neighbors, predators, attr_factor=0.0)
-        self.agent.random_walk(potency=1.0)
+    def move(self, agent, neighbors, predators):
+        # agent.repulse_move(neighbors, predators, attr_factor=0.0)
+        agent.random_walk(potency=1.0)
         
-        dx = self.agent.site.pos - self.agent.pos
+        dx = agent.site.pos - agent.pos
 
-        self.agent.pos += (dx * DT)
-        super().move(neighbors, predators)
+        agent.pos += (dx * agent.cfg.DT)
+        super().move(agent, neighbors, predators)
 
 class FollowState(State):
-    def __init__(self, name, color, agent):
-        super().__init__(name, color, agent)
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
         
         if sites:
             if np.random.random() > 0.5:
-                viable_sites = list(filter(lambda i: i not in self.agent.last_known_sites, sites))
+                viable_sites = list(filter(lambda i: i not in agent.last_known_sites, sites))
                 if len(viable_sites) > 0:
-                    self.agent.following = None
-                    self.agent.site = viable_sites[np.random.randint(0, len(viable_sites))]
-                    self.agent.add_site(self.agent.site)
-                    self.agent.state = GoToSiteState(NET_GOTOSITE_NAME, (0, 0, 255), self.agent)
+                    agent.following = None
+                    agent.site = viable_sites[np.random.randint(0, len(viable_sites))]
+                    agent.add_site(agent.site)
+                    agent.transition(NET_GOTOSITE)
                     return
 
         if not neighbors:
-            self.agent.following = None
-            self.agent.state = NetworkExploreState(NET_EXPLORE_NAME, (100, 255, 0), self.agent) # TODO: change to explore state
+            agent.following = None
+            agent.transition(NET_EXPLORE) # TODO: change to explore state
             return
         
-        if self.agent.at_site(self.agent.sim.get_agent_site(self.agent.following)):
-                self.agent.site = self.agent.sim.get_agent_site(self.agent.following)
-                self.agent.add_site(self.agent.site)
-                self.agent.state = NetworkRestState(NET_REST_NAME, (0, 255, 255), self.agent)
+        if agent.at_site(agent.sim.get_agent_site(agent.following)):
+                agent.site = agent.sim.get_agent_site(agent.following)
+                agent.add_site(agent.site)
+                agent.transition(NET_REST)
                 return
-        if not isinstance(self.agent.sim.agents[self.agent.following].state, GoToSiteState):
-            self.agent.state = NetworkFlockState(NET_FLOCK_NAME, (0, 255, 0), self.agent)
+        if agent.sim.get_agent_state(agent.following) != NET_GOTOSITE:
+            agent.transition(NET_FLOCK)
     
-    def move(self, neighbors, predators):
-        dx = self.agent.sim.get_agent_pos(self.agent.following) - self.agent.pos
+    def move(self, agent, neighbors, predators):
+        dx = agent.sim.get_agent_pos(agent.following) - agent.pos
 
         # to prevent colliding
-        repulsion = np.zeros_like(self.agent.pos)
+        repulsion = np.zeros_like(agent.pos)
         for neighbor in neighbors:
-            c = self.agent.sim.get_agent_pos(neighbor) - self.agent.pos
+            c = agent.sim.get_agent_pos(neighbor) - agent.pos
             scaling_factor = c @ c
             if scaling_factor == 0:
                 scaling_factor = 1
             repulsion += c / scaling_factor
 
-        self.agent.pos += ((dx - repulsion) * DT)
-        super().move(neighbors, predators)
+        agent.pos += ((dx - repulsion) * agent.cfg.DT)
+        super().move(agent, neighbors, predators)
 
 
 """
@@ -236,196 +251,211 @@ you can ignore it for now.
 """
 ### PROTOTYPE STATES ###
 class RestState(State):
-    def __init__(self, agent):
-        super().__init__(REST_NAME, REST_COLOR, agent)
+    def __init__(self):
+        super().__init__(REST_NAME, REST_COLOR)
+
+    def enter(self, agent):
+        super().enter(agent)
         agent.speed = 0.0
 
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        self.agent.hunger += 1
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        agent.hunger += 1
         if predators:
-            self.agent.state = FleeingState(self.agent)
+            agent.transition(FLEE)
             # we won't include the site here to reflect having a negative experience
             return
-        if self.agent.site.resource_count <= 0 or self.agent.hunger >= MAX_HUNGER:
-            self.agent.last_known_site = self.agent.site
+        if agent.site.resource_count <= 0 or agent.hunger >= agent.cfg.MAX_HUNGER:
+            agent.last_known_site = agent.site
             if neighbors:
-                if len(neighbors) > AGENT_NEIGHBOR_THRESHOLD:
-                    self.agent.state = HighDensityExplore(self.agent)
+                if len(neighbors) > agent.cfg.AGENT_NEIGHBOR_THRESHOLD:
+                    agent.transition(HIGH_DENSE)
             else:
-                self.agent.state = LowDensityExplore(self.agent)
+                agent.transition(LOW_DENSE)
             return
         else:
-            self.agent.site.resource_count -= 1
+            agent.site.consume()
 
         # calculate avg neighbor speed
         avg_speed = 0
         for neighbor in neighbors:
-            avg_speed += self.agent.sim.get_agent_speed(neighbor)
+            avg_speed += agent.sim.get_agent_speed(neighbor)
         if neighbors:
             avg_speed = float(avg_speed / len(neighbors))
-        if avg_speed > MAX_SPEED / 2:
-            self.agent.state = self.agent.state = FleeingState(self.agent) # later when fleeing gets implemented
+        if avg_speed > agent.cfg.MAX_SPEED / 2:
+            agent.transition(FLEE) # later when fleeing gets implemented
 
-    def move(self, neighbors, predators):
+    def move(self, agent, neighbors, predators):
         pass
 
 # BASE EXPLORE STATE
 class ExploreState(State): # maybe consider two different
-    def __init__(self, agent):
-        super().__init__(EXPLORE_NAME, EXPLORE_COLOR, agent)
+    def __init__(self):
+        super().__init__(EXPLORE_NAME, EXPLORE_COLOR)
+
+    def enter(self, agent):
+        super().enter(agent)
         agent.site = None
-        agent.speed = np.random.uniform(1.0, MAX_SPEED)
+        agent.speed = np.random.uniform(1.0, agent.cfg.MAX_SPEED)
 
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        if self.agent.hunger > 0:
-            self.agent.hunger -= 1
-        if sites and self.agent.site == None:
-            self.agent.site = sites[np.random.randint(0, len(sites))]
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        if agent.hunger > 0:
+            agent.hunger -= 1
+        if sites and agent.site == None:
+            agent.site = sites[np.random.randint(0, len(sites))]
 
         if predators:
-            self.agent.state = FleeingState(self.agent)
+            agent.transition(FLEE)
         # else probabilistically transition to RestState based on hunger
-        elif self.agent.site != None:
-            if math.dist(self.agent.site.pos, self.agent.pos) <= self.agent.site.radius:
-                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < self.agent.hunger:
-                self.agent.state = RestState(self.agent)
+        elif agent.site != None:
+            if math.dist(agent.site.pos, agent.pos) <= agent.site.radius:
+                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < agent.hunger:
+                agent.transition(REST)
 
-    def move(self, neighbors, predators):
+    def move(self, agent, neighbors, predators):
         if neighbors:
             # repulsion factor has to be pumped up super big in order to actually affect movement, and even then, it doesn't do it that well...
             # attraction still is too powerful
             # repulsion just affects how far away the agents try to stay away from each other
-            self.agent.move(neighbors, predators) 
+            agent.move(neighbors, predators) 
         else:
-            self.agent.random_walk()
+            agent.random_walk()
         
-        if self.agent.site:
-            self.agent.pos += (self.agent.site.pos - self.agent.pos) * DT
-        super().move(neighbors=None, predators=None)
+        if agent.site:
+            agent.pos += (agent.site.pos - agent.pos) * agent.cfg.DT
+        super().move(agent, neighbors=None, predators=None)
 
 class LowDensityExplore(State):
-    def __init__(self, agent):
-        super().__init__(LOW_DENSE_NAME, EXPLORE_COLOR, agent)
-        self.agent.site = None
-        self.agent.speed = agent.speed = np.random.uniform(1.0, MAX_SPEED)
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        if self.agent.hunger > 0:
-            self.agent.hunger -= 1
-        if sites and self.agent.site == None:
-            self.agent.site = sites[np.random.randint(0, len(sites))]
+    def __init__(self):
+        super().__init__(LOW_DENSE_NAME, EXPLORE_COLOR)
+
+    def enter(self, agent):
+        super().enter(agent)
+        agent.site = None
+        agent.speed = agent.speed = np.random.uniform(1.0, agent.cfg.MAX_SPEED)
+
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        if agent.hunger > 0:
+            agent.hunger -= 1
+        if sites and agent.site == None:
+            agent.site = sites[np.random.randint(0, len(sites))]
         
         # transition to Flee
         if predators:
-            self.agent.state = FleeingState(self.agent)
+            agent.transition(FLEE)
 
         # transition to Rest
-        elif self.agent.site != None:
-            if math.dist(self.agent.site.pos, self.agent.pos) <= self.agent.site.radius:
-                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < self.agent.hunger:
-                self.agent.state = RestState(self.agent)
+        elif agent.site != None:
+            if math.dist(agent.site.pos, agent.pos) <= agent.site.radius:
+                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < agent.hunger:
+                agent.transition(REST)
 
         # transition to High Density
         elif neighbors:
-            if len(neighbors) > AGENT_NEIGHBOR_THRESHOLD:
-                self.agent.state = HighDensityExplore(self.agent)
+            if len(neighbors) > agent.cfg.AGENT_NEIGHBOR_THRESHOLD:
+                agent.transition(HIGH_DENSE)
 
-    def move(self, neighbors, predators):
+    def move(self, agent, neighbors, predators):
         if neighbors:
-            self.agent.move(neighbors, predators, attr_factor=3.0)
+            agent.move(neighbors, predators, attr_factor=3.0)
         else:
-            self.agent.random_walk(2.0)
+            agent.random_walk(2.0)
         # prioritize moving toward a known site
-        if self.agent.site == None:
-            if self.agent.last_known_sites:
-                self.agent.pos += (self.agent.last_known_sites[0].pos - self.agent.pos) * DT * 3.0
-        super().move(neighbors, predators)
+        if agent.site == None:
+            if agent.last_known_sites:
+                agent.pos += (agent.last_known_sites[0].pos - agent.pos) * agent.cfg.DT * 3.0
+        super().move(agent, neighbors, predators)
 
 class HighDensityExplore(State):
-    def __init__(self, agent):
-        super().__init__(HIGH_DENSE_NAME, EXPLORE_COLOR, agent)
-        self.agent.site = None
-        self.agent.speed = agent.speed = np.random.uniform(1.0, MAX_SPEED)
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        if self.agent.hunger > 0:
-            self.agent.hunger -= 1
-        if sites and self.agent.site == None:
-            self.agent.site = sites[np.random.randint(0, len(sites))]
+    def __init__(self):
+        super().__init__(HIGH_DENSE_NAME, EXPLORE_COLOR)
+
+    def enter(self, agent):
+        super().enter(agent)
+        agent.site = None
+        agent.speed = agent.speed = np.random.uniform(1.0, agent.cfg.MAX_SPEED)
+
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        if agent.hunger > 0:
+            agent.hunger -= 1
+        if sites and agent.site == None:
+            agent.site = sites[np.random.randint(0, len(sites))]
         
         # transition to Flee
         if predators:
-            self.agent.state = FleeingState(self.agent)
+            agent.transition(FLEE)
 
         # transition to Rest
-        elif self.agent.site != None:
-            if math.dist(self.agent.site.pos, self.agent.pos) <= self.agent.site.radius:
-                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < self.agent.hunger:
-                self.agent.state = RestState(self.agent)
+        elif agent.site != None:
+            if math.dist(agent.site.pos, agent.pos) <= agent.site.radius:
+                # if np.random.default_rng().exponential(scale=MAX_HUNGER/4) < agent.hunger:
+                agent.transition(REST)
 
         # transition to Low Density once len(neighbors) is below like... half the constant threshold???
         elif neighbors:
-            if len(neighbors) / AGENT_NEIGHBOR_THRESHOLD:
-                self.agent.state = LowDensityExplore(self.agent)
+            if len(neighbors) / agent.cfg.AGENT_NEIGHBOR_THRESHOLD:
+                agent.transition(LOW_DENSE)
 
-    def move(self, neighbors, predators):
+    def move(self, agent, neighbors, predators):
         # prioritize repulsion from neighbors
         if neighbors:
-            self.agent.move(neighbors, predators, attr_factor=0.5, rpls_factor=25.0)
-            self.agent.random_walk(3.0)
+            agent.move(neighbors, predators, attr_factor=0.5, rpls_factor=25.0)
+            agent.random_walk(3.0)
         else:
-            self.agent.random_walk()
-        super().move(neighbors, predators)
+            agent.random_walk()
+        super().move(agent, neighbors, predators)
 
 class FleeingState(State):
-    def __init__(self, agent):
-        super().__init__(FLEE_NAME, FLEE_COLOR, agent)
-        self.agent.speed = MAX_SPEED
-
-    def update(self, neighbors, sites, predators):
-        super().update(neighbors, sites, predators)
-        if self.agent.hunger > 0:
-            self.agent.hunger -= 1
+    def __init__(self):
+        super().__init__(FLEE_NAME, FLEE_COLOR)
+
+    def enter(self, agent):
+        super().enter(agent)
+        agent.speed = agent.cfg.MAX_SPEED
+
+    def update(self, agent, neighbors, sites, predators):
+        super().update(agent, neighbors, sites, predators)
+        if agent.hunger > 0:
+            agent.hunger -= 1
         if not predators:
             if sites:
-                self.agent.site = sites[np.random.randint(0, len(sites))]
-                if math.dist(self.agent.site.pos, self.agent.pos) <= self.agent.site.radius:
-                    self.agent.state = RestState(self.agent)
+                agent.site = sites[np.random.randint(0, len(sites))]
+                if math.dist(agent.site.pos, agent.pos) <= agent.site.radius:
+                    agent.transition(REST)
             else:
-                self.agent.state = ExploreState(self.agent)
+                agent.transition(EXPLORE)
 
-    def move(self, neighbors, predators):
-        direction = self.get_heading(neighbors, predators)
+    def move(self, agent, neighbors, predators):
+        direction = self.get_heading(agent, neighbors, predators)
 
         x, y = direction
 
         desired_heading = np.arctan2(y, x)
-        difference_in_heading = (((desired_heading - self.agent.theta) + np.pi) % (2*np.pi)) - np.pi
+        difference_in_heading = (((desired_heading - agent.theta) + np.pi) % (2*np.pi)) - np.pi
 
         angular_velocity = 0.5 * (difference_in_heading) # k = 0.5, TODO: make k a constant
-        self.agent.pos = self.agent.pos + self.agent.heading() * self.agent.speed * DT
+        agent.pos = agent.pos + agent.heading() * agent.speed * agent.cfg.DT
 
-        self.agent.theta = self.agent.theta + (angular_velocity * DT)
-        # self.agent.theta = (((self.agent.theta + (angular_velocity * DT)) + np.pi) % (2*np.pi)) + np.pi
-        super().move(neighbors=None, predators=None)
+        agent.theta = agent.theta + (angular_velocity * agent.cfg.DT)
+        # agent.theta = (((agent.theta + (angular_velocity * DT)) + np.pi) % (2*np.pi)) + np.pi
+        super().move(agent, neighbors=None, predators=None)
 
-    def get_heading(self, neighbors, predators): # TODO: alter movement so they run away from predators faster
+    def get_heading(self, agent, neighbors, predators): # TODO: alter movement so they run away from predators faster
         attraction = np.zeros(2)
-        orientation = self.agent.heading()
+        orientation = agent.heading()
         repulsion = np.zeros(2)
         
         for predator in predators:
             orientation += predator.heading()
-            repulsion += 2 * (predator.pos - self.agent.pos)
+            repulsion += 2 * (predator.pos - agent.pos)
 
         for neighbor in neighbors:
-            attraction += (self.agent.pos - self.agent.sim.get_agent_pos(neighbor))
-            orientation += self.agent.sim.get_agent_heading(neighbor)
-            c = self.agent.sim.get_agent_pos(neighbor) - self.agent.pos
+            attraction += (agent.pos - agent.sim.get_agent_pos(neighbor))
+            orientation += agent.sim.get_agent_heading(neighbor)
+            c = agent.sim.get_agent_pos(neighbor) - agent.pos
             scaling_factor = c @ c
             if scaling_factor == 0:
                 repulsion += c
@@ -436,7 +466,31 @@ class FleeingState(State):
             attraction = attraction / np.linalg.norm(attraction)
             orientation = orientation / np.linalg.norm(orientation)
 
-        attraction *= 2 * self.agent.attr_factor
-        repulsion *= self.agent.rpls_factor
+        attraction *= 2 * agent.attr_factor
+        repulsion *= agent.rpls_factor
         attraction = attraction - repulsion + orientation
         return attraction
+
+"""
+The shared state instances, indexed by state code; agent.state looks an agent's state up here
+"""
+STATES = (NetworkFlockState(NET_FLOCK_NAME, (0, 255, 0)),
+          NetworkExploreState(NET_EXPLORE_NAME, (100, 255, 0)),
+          NetworkRestState(NET_REST_NAME, (0, 255, 255)),
+          GoToSiteState(NET_GOTOSITE_NAME, (0, 0, 255)),
+          FollowState(NET_FOLLOW_NAME, (0, 100, 255)),
+          ExploreState(),
+          LowDensityExplore(),
+          HighDensityExplore(),
+          RestState(),
+          FleeingState())
+
+"""
+Returns the ids of the agents in each state, given every agent's state code: a dict of code -> sorted ids,
+so agents can be processed in batches by state
+"""
+def partition_by_state(state_codes):
+    state_codes = np.asarray(state_codes)
+    order = np.argsort(state_codes, kind="stable")
+    bounds = np.searchsorted(state_codes[order], np.arange(len(STATES) + 1))
+    return {code: order[bounds[code]:bounds[code + 1]] for code in range(len(STATES))}
@@ -1,6 +1,7 @@
 import numpy as np
 import math
 from Controllers.states import *
+from Model.agent_store import AgentStore
 from World.config import *
 
 """
@@ -11,27 +12,39 @@ needed for both are initialized in its constructor.
 NOTE: agent.neighbors is a list of int, each int corresponding to a neighbor's ID.
 To query for a neighbor's info, call agent.sim.get_agent_x() (x being the info you want).
 See simulation.py for what information can be retrieved.
+NOTE: pos, theta, speed, hunger, group, group_id, site, following, last_known_sites, state, state_timer, and timer
+are views into the agent's row of sim.store (see agent_store.py). If the simulation has no store, the agent gets a private one-row store.
+The agent's state is stored as a code; agent.state is the shared State instance for that code (see states.py).
+Change it with transition().
 """
 class Agent:
     def __init__(self, id, pos, speed, theta, hunger, sim, attr_factor=1.0, orient_factor=1.0, repulse_factor=1.0,
-                 site=None, network=None, group_id=None, following=None, neighbors=None, group_neighbors=None):
+                 site=None, network=None, group_id=None, following=None, neighbors=None, group_neighbors=None, group=None, cfg=None):
         self.id = id # an int representing the agent's unique ID
+        self.sim = sim # the simulation the agent is in; used so the agent can query for simulation information
+        self.cfg = cfg if cfg is not None else getattr(sim, "cfg", None) or SimConfig() # the settings the agent uses; defaults to the simulation's
+        self._store = getattr(sim, "store", None) # the arrays holding this agent's row
+        self._row = id
+        if self._store is None:
+            self._store = AgentStore(1, site_memory=self.cfg.MAX_SITE_MEMORY)
+            self._row = 0
+        self._pos = self._store.positions[self._row] # the agent's row of the positions array, returned by pos
         self.pos = pos # where the agent is in the world
-        self.state = NetworkFlockState(NET_FLOCK_NAME, (0, 255, 0), self) # the state the agent is currently in; change here to determine starting state
+        self.group_id = group_id # a binary vector determining which group an agent belongs to
+        if group is not None:
+            self.group = group # the group number; takes precedence over group_id
+        self.transition(NET_FLOCK) # the state the agent is currently in; change here to determine starting state
         self.speed = speed # how fast the agent moves
         self.theta = theta # the angle the agent is facing
         self.angular_velocity = 0.0 # how fast the agent's theta can change
         self.hunger = hunger # represents how hungry the agent is (lower hunger = more hungry)
-        self.sim = sim # the simulation the agent is in; used so the agent can query for simulation information
         self.attr_factor = attr_factor # determines how much the agent will attract toward its neighbors, range(0.5, 1]
         self.orient_factor = orient_factor # determines how much the agent will orient to be like its neighbors, range(0.5, 1]
         self.rpls_factor = repulse_factor # determines how much the agent will space itself from its neighbors, range(0.5, 1]
         self.site = site # the site the agent is currently trying to get to
-        self.last_known_sites = [] # the sites the agent remembers
         if site != None:
-            self.last_known_sites.append(site)
+            self.add_site(site)
         self.network = network # the matrix representation of the agent's group network; currently unused
-        self.group_id = group_id # a binary vector determining which group an agent belongs to
         self.following = following # the neighbor that the agent is currently following
         # FOR BEHAVIOR TREE IMPLEMENTATION
         self.neighbors = neighbors # an agent's neighbors
@@ -40,6 +53,122 @@ class Agent:
         self.bt = None # the behavior tree that controls the agent
         self.timer = 0 # a timer used for several behaviors
 
+    ### STORE-BACKED ATTRIBUTES ###
+
+    # the agent's position; changing it in place (pos += ..., pos[0] = ...) changes the row itself
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        if value is self._pos: # pos += ... has already changed the row
+            return
+        store = self._store
+        if store.prev_live[self._row]: # a new position: the others go on seeing the one it replaces (see AgentStore.snapshot())
+            store.prev_positions[self._row] = self._pos
+            store.prev_live[self._row] = False
+        self._pos[:] = value
+
+    @property
+    def theta(self):
+        return self._store.theta[self._row]
+
+    @theta.setter
+    def theta(self, value):
+        self._store.theta[self._row] = value
+
+    @property
+    def speed(self):
+        return self._store.speed[self._row]
+
+    @speed.setter
+    def speed(self, value):
+        self._store.speed[self._row] = value
+
+    @property
+    def hunger(self):
+        return self._store.hunger[self._row]
+
+    @hunger.setter
+    def hunger(self, value):
+        self._store.hunger[self._row] = value
+
+    @property
+    def group(self):
+        return self._store.group[self._row]
+
+    @group.setter
+    def group(self, value):
+        self._store.set_group(self._row, -1 if value is None else value)
+
+    # one-hot view of group, kept for backwards compatibility; compare group instead
+    @property
+    def group_id(self):
+        return self._store.group_vector(self._store.group[self._row])
+
+    @group_id.setter
+    def group_id(self, value):
+        self.group = None if value is None else int(np.argmax(value))
+
+    @property
+    def site(self):
+        return self._store.site[self._row]
+
+    @site.setter
+    def site(self, value):
+        self._store.set_site(self._row, value)
+
+    # the ID of the neighbor the agent is following, or None
+    @property
+    def following(self):
+        following = self._store.following[self._row]
+        return int(following) if following >= 0 else None
+
+    @following.setter
+    def following(self, value):
+        self._store.following[self._row] = -1 if value is None else value
+
+    # the sites the agent remembers, oldest first; a copy, so add sites with add_site()
+    @property
+    def last_known_sites(self):
+        return self._store.remembered_sites(self._row)
+
+    # the shared State instance of the agent's state code; setting it doesn't run enter(), see transition()
+    @property
+    def state(self):
+        code = self._store.state[self._row]
+        return STATES[code] if code >= 0 else None
+
+    @state.setter
+    def state(self, value):
+        self._store.state[self._row] = value.code
+
+    # the timer the agent's behavior tree counts down
+    @property
+    def timer(self):
+        return self._store.timer[self._row]
+
+    @timer.setter
+    def timer(self, value):
+        self._store.timer[self._row] = value
+
+    # the timer the agent's FSM state counts down; separate from timer, which the behavior tree uses
+    @property
+    def state_timer(self):
+        return self._store.state_timer[self._row]
+
+    @state_timer.setter
+    def state_timer(self, value):
+        self._store.state_timer[self._row] = value
+
+    """
+    Moves the agent to the state with the given code and runs that state's enter()
+    """
+    def transition(self, code):
+        self._store.state[self._row] = code
+        STATES[code].enter(self)
+
     """
     Performs state actions
     """
@@ -47,34 +176,47 @@ class Agent:
         # get reading (neighbors, sites)
         # calculate neighbor task densities
         # do state actions
-        self.state.update(neighbors, sites, predators)
-        self.state.move(neighbors, predators)
+        profiler = self.sim.behavior_profiler
+        if profiler is not None: # times the state's update() and move() (see BehaviorProfiler)
+            profiler.update_agent(self, neighbors, sites, predators)
+            return
+        self.state.update(self, neighbors, sites, predators)
+        self.state.move(self, neighbors, predators) # the state may have changed in update()
     
     """
     Move like Boids with group detection.
     If toggled, agents will have greater range of movement, but not group as well.
     See Brown et. al in References.
+    If the simulation precomputed this tick's moves for every agent (USE_BATCHED_MOVE), the agent's
+    row is used instead of looping over its neighbors.
     """
     def move(self, neighbors, predators, attr_factor=1.0, rpls_factor=1.0):
+        batch = self.sim.boid_moves
+        if batch is not None and batch.matches(self.id, self.pos, self.theta, self.speed):
+            if neighbors:
+                self.pos = batch.new_positions[self.id]
+                self.theta = batch.new_theta[self.id]
+            return
         if neighbors:
             repulsion = np.zeros_like(self.pos)
             attraction = np.zeros_like(self.pos)
             orientation = self.heading()
 
             # calculate repulsion, attraction, and orientation
+            group = self.group
             for neighbor in neighbors:
                 neighbor_pos = self.sim.get_agent_pos(neighbor)
                 # repulsion
-                if math.dist(neighbor_pos, self.pos) <= AGENT_REPL_RADIUS:
+                if math.dist(neighbor_pos, self.pos) <= self.cfg.AGENT_REPL_RADIUS:
                     dist_vect = neighbor_pos - self.pos
                     if dist_vect @ dist_vect > 0:
                         repulsion += dist_vect / (dist_vect @ dist_vect)
                     else:
                         repulsion += dist_vect
                 # orient and attract only with neighbors within group
-                if np.array_equal(self.sim.get_agent_group_id(neighbor), self.group_id):
+                if self.sim.get_agent_group(neighbor) == group:
                     # orientation
-                    if math.dist(neighbor_pos, self.pos) <= AGENT_ORIENT_RADIUS:
+                    if math.dist(neighbor_pos, self.pos) <= self.cfg.AGENT_ORIENT_RADIUS:
                         orientation += self.sim.get_agent_heading(neighbor)
 
                     # attraction
@@ -96,9 +238,9 @@ class Agent:
             difference_in_heading = (((desired_heading - self.theta) + np.pi) % (2*np.pi)) - np.pi
 
             # calculate new heading and update
-            angular_vel = K * difference_in_heading
-            new_pos = self.pos + self.speed * self.heading() * DT
-            new_theta = (((self.theta + (angular_vel * DT)) + np.pi) % (2*np.pi)) + np.pi
+            angular_vel = self.cfg.K * difference_in_heading
+            new_pos = self.pos + self.speed * self.heading() * self.cfg.DT
+            new_theta = (((self.theta + (angular_vel * self.cfg.DT)) + np.pi) % (2*np.pi)) + np.pi
 
             self.pos = new_pos
             self.theta = new_theta
@@ -106,10 +248,17 @@ class Agent:
     """
     Move agent using graph laplacian.
     If toggled, agents will self sort into groups better, but not spread out as much
+    Uses the simulation's precomputed terms (USE_BATCHED_MOVE) when available, like move().
     """
     def repulse_move(self, neighbors, predators, attr_factor=1.0, diff_factor=1.0):
         # use a repulsion equation to space (boids-like repulsion)
         # use another repulsion equation to separate from other groups (diffusion)
+        batch = self.sim.laplacian_moves
+        if batch is not None and batch.matches(self.id, self.pos):
+            if neighbors:
+                dx = (batch.attraction[self.id] * attr_factor) + (batch.diffuse[self.id] * diff_factor) - batch.repulsion[self.id]
+                self.pos += (dx * self.cfg.DT)
+            return
         if neighbors:
             repulsion = np.zeros_like(self.pos) # avoid collisions
             diffuse = np.zeros_like(self.pos) # separate from other groups
@@ -117,9 +266,10 @@ class Agent:
             num_network_neighbors = 0
             num_outsider_neighbors = 0
 
+            group = self.group
             for neighbor in neighbors:
                 # attract toward neighbors in network
-                if np.array_equal(self.sim.get_agent_group_id(neighbor), self.group_id):
+                if self.sim.get_agent_group(neighbor) == group:
                     attraction += self.sim.get_agent_pos(neighbor)
                     num_network_neighbors += 1
 
@@ -138,14 +288,14 @@ class Agent:
             attraction -= (self.pos * num_network_neighbors)
             diffuse = (num_outsider_neighbors * self.pos) - diffuse
             dx = (attraction * attr_factor) + (diffuse * diff_factor) - repulsion
-            self.pos += (dx * DT)
+            self.pos += (dx * self.cfg.DT)
 
     """
     Randomly walk in a direction
     """
     def random_walk(self, potency=1.0):
         self.theta += np.random.uniform(-np.pi/12, np.pi/12) % (2*np.pi)
-        self.pos += np.array([np.cos(self.theta), np.sin(self.theta)]) * DT * 10 * potency
+        self.pos += np.array([np.cos(self.theta), np.sin(self.theta)]) * self.cfg.DT * 10 * potency
 
     ### UTILS ###
 
@@ -157,9 +307,13 @@ class Agent:
 
     """
     Returns a bool stating whether or not an agent reached a site
+    Uses the simulation's per-tick site query when it is still valid for the agent.
     """
     def at_site(self, site=None):
         if site != None:
+            query = self.sim.site_query
+            if query is not None and site.id is not None and query.matches(self.id, self.pos):
+                return query.at_site(self.id, site)
             if math.dist(site.pos, self.pos) <= site.radius:
                 return True
         return False
@@ -169,7 +323,5 @@ class Agent:
     SHOULD BE CALLED WHENEVER A NEW SITE IS DISCOVERED i.e. when agent.site is set
     """
     def add_site(self, site):
-        self.last_known_sites.append(site)
-        if len(self.last_known_sites) > MAX_SITE_MEMORY:
-            self.last_known_sites.pop(0)
+        self._store.remember(self._row, site)
 
@@ -0,0 +1,196 @@
+import numpy as np
+from World.config import *
+
+"""
+AgentStore keeps the per-agent simulation data in contiguous arrays (structure of arrays) so that
+whole-population operations can be vectorized and each agent costs a few dozen bytes instead of
+several Python objects. Row i belongs to the agent whose id is i; Agent is a thin view that reads
+and writes its row through properties.
+The prev_* arrays hold what other agents are allowed to see about an agent (see
+Simulation.get_agent_x()); they are copied from the live arrays with snapshot(). In a one-after-another
+tick, an agent's previous position can instead follow its live position (prev_live, see snapshot()).
+Sites are kept both as Site objects (site, memory_sites), which the object-based code uses, and as
+SiteField row ids (site_id, memory), which vectorized code uses. Write them through set_site() and
+remember() (or set_site_ids() and remember_ids()) so the two stay the same; the vectorized methods find
+the Site objects in site_table, set with set_sites().
+"""
+class AgentStore:
+    def __init__(self, num_agents, num_groups=NUM_GROUPS, site_memory=MAX_SITE_MEMORY):
+        self.num_agents = num_agents
+        # live state, written by the agents themselves
+        self.positions = np.zeros((num_agents, 2)) # where each agent is in the world
+        self.theta = np.zeros(num_agents) # the angle each agent is facing
+        self.speed = np.zeros(num_agents) # how fast each agent moves
+        self.hunger = np.zeros(num_agents, dtype=np.int64) # lower hunger = more hungry
+        self.group = np.full(num_agents, -1, dtype=np.int64) # the group number of each agent; -1 = no group
+        self.state = np.full(num_agents, -1, dtype=np.int64) # the code of each agent's state (see STATE_CODES in states.py); -1 = unknown
+        self.state_timer = np.zeros(num_agents, dtype=np.int64) # the timer each agent's FSM state counts down
+        self.timer = np.zeros(num_agents, dtype=np.int64) # the timer each agent's behavior tree counts down (agent.timer)
+        self.site = np.full(num_agents, None, dtype=object) # the site each agent is currently trying to get to
+        self.site_id = np.full(num_agents, -1, dtype=np.int64) # the id of that site; -1 = none
+        self.following = np.full(num_agents, -1, dtype=np.int64) # the id of the agent each agent is following; -1 = none
+        self.memory = np.full((num_agents, site_memory), -1, dtype=np.int64) # the ids of the sites each agent remembers, oldest first; -1 = empty
+        self.memory_sites = np.full((num_agents, site_memory), None, dtype=object) # the same sites as Site objects
+        self.memory_len = np.zeros(num_agents, dtype=np.int64) # how many sites each agent remembers
+        self.site_table = None # object array of the simulation's sites by id, with None at the end so that id -1 gives None
+        # what the other agents see of each agent: its position, speed, heading, state code, and site prior to its update
+        self.prev_positions = np.zeros((num_agents, 2))
+        self.prev_speed = np.zeros(num_agents)
+        self.prev_heading = np.zeros((num_agents, 2))
+        self.prev_state = np.full(num_agents, -1, dtype=np.int64)
+        self.prev_site = np.full(num_agents, None, dtype=object)
+        self.prev_site_id = np.full(num_agents, -1, dtype=np.int64)
+        self.prev_live = np.zeros(num_agents, dtype=bool) # whether each agent's previous position is its live position (see snapshot())
+        # one-hot group vectors for backwards compatibility with agent.group_id; rows are shared, so don't write to them
+        self.group_vectors = np.eye(num_groups)
+        self.group_vectors.flags.writeable = False
+        self.num_groups = num_groups
+        self._members = None # cached per-group membership index; rebuilt by group_members() after any group changes
+
+    """
+    Copies an agent's live values into the prev_* arrays. With live=True, the agent's previous position
+    follows its live position until the agent is given a new position (see Agent.pos), like the reference
+    to agent.pos the simulation used to keep: moves made in place (pos += ..., pos[0] = ...) are seen by the
+    agents updated after it in the tick, and after a new position is assigned they see the position it
+    replaced. Simulation.get_agent_pos() reads the live row while prev_live is set.
+    """
+    def snapshot(self, agent_id, live=False):
+        self.prev_positions[agent_id] = self.positions[agent_id]
+        self.prev_live[agent_id] = live
+        self.prev_speed[agent_id] = self.speed[agent_id]
+        theta = self.theta[agent_id]
+        self.prev_heading[agent_id, 0] = np.cos(theta)
+        self.prev_heading[agent_id, 1] = np.sin(theta)
+        self.prev_state[agent_id] = self.state[agent_id]
+        self.prev_site[agent_id] = self.site[agent_id]
+        self.prev_site_id[agent_id] = self.site_id[agent_id]
+
+    """
+    Copies every agent's live values into the prev_* arrays at once. In a synchronous tick this is the
+    buffer swap: the live arrays are the "next" buffer the agents write to, and the prev_* arrays are
+    the "previous" buffer everyone reads from. Nothing is allocated.
+    """
+    def snapshot_all(self):
+        np.copyto(self.prev_positions, self.positions)
+        self.prev_live[:] = False
+        np.copyto(self.prev_speed, self.speed)
+        np.cos(self.theta, out=self.prev_heading[:, 0])
+        np.sin(self.theta, out=self.prev_heading[:, 1])
+        np.copyto(self.prev_state, self.state)
+        np.copyto(self.prev_site, self.site)
+        np.copyto(self.prev_site_id, self.site_id)
+
+    """
+    Makes the prev_* arrays read-only (or writable again), so nothing can write to the previous buffer mid-tick
+    """
+    def lock_prev(self, locked=True):
+        for array in (self.prev_positions, self.prev_speed, self.prev_heading, self.prev_state, self.prev_site, self.prev_site_id):
+            array.flags.writeable = not locked
+
+    # the arrays that make up the agents' state; the Site object arrays follow from the site ids
+    STATE_ARRAYS = ("positions", "theta", "speed", "hunger", "group", "state", "state_timer", "timer", "site_id",
+                    "following", "memory", "memory_len", "prev_positions", "prev_speed", "prev_heading", "prev_state",
+                    "prev_site_id", "prev_live")
+
+    """
+    Returns the agents' state as a dict of arrays (see STATE_ARRAYS); the arrays are not copied
+    """
+    def state_arrays(self):
+        return {name: getattr(self, name) for name in self.STATE_ARRAYS}
+
+    """
+    Overwrites the agents' state with arrays from state_arrays(), then looks up the Site objects of the
+    site ids in site_table
+    """
+    def load_state_arrays(self, arrays):
+        for name in self.STATE_ARRAYS:
+            np.copyto(getattr(self, name), arrays[name])
+        if self.site_table is not None:
+            self.site[:] = self.site_table[self.site_id]
+            self.prev_site[:] = self.site_table[self.prev_site_id]
+            self.memory_sites[:] = self.site_table[self.memory]
+        self._members = None
+
+    """
+    Sets the sites that site ids refer to; sites[i] must have id i
+    """
+    def set_sites(self, sites):
+        self.site_table = np.array(list(sites) + [None], dtype=object)
+
+    """
+    Sets the site an agent is going to (None for no site)
+    """
+    def set_site(self, agent_id, site):
+        self.site[agent_id] = site
+        self.site_id[agent_id] = -1 if site is None or site.id is None else site.id
+
+    """
+    Sets the site of every agent in agent_ids by site id (-1 for no site)
+    """
+    def set_site_ids(self, agent_ids, site_ids):
+        self.site_id[agent_ids] = site_ids
+        if self.site_table is not None:
+            self.site[agent_ids] = self.site_table[self.site_id[agent_ids]]
+
+    """
+    Adds a site to an agent's memory, forgetting the oldest site when the memory is full (see Agent.add_site())
+    """
+    def remember(self, agent_id, site):
+        size = self.memory.shape[1]
+        if size == 0:
+            return
+        if self.memory_len[agent_id] == size:
+            self.memory[agent_id, :-1] = self.memory[agent_id, 1:]
+            self.memory_sites[agent_id, :-1] = self.memory_sites[agent_id, 1:]
+            self.memory_len[agent_id] -= 1
+        slot = self.memory_len[agent_id]
+        self.memory[agent_id, slot] = -1 if site.id is None else site.id
+        self.memory_sites[agent_id, slot] = site
+        self.memory_len[agent_id] += 1
+
+    """
+    Vectorized remember(): adds site_ids[i] to the memory of agent_ids[i]; agent_ids must not repeat
+    """
+    def remember_ids(self, agent_ids, site_ids):
+        size = self.memory.shape[1]
+        if size == 0:
+            return
+        full = agent_ids[self.memory_len[agent_ids] == size]
+        self.memory[full, :-1] = self.memory[full, 1:]
+        self.memory_len[full] -= 1
+        self.memory[agent_ids, self.memory_len[agent_ids]] = site_ids
+        self.memory_len[agent_ids] += 1
+        if self.site_table is not None:
+            self.memory_sites[agent_ids] = self.site_table[self.memory[agent_ids]]
+
+    """
+    Returns the Site objects an agent remembers, oldest first
+    """
+    def remembered_sites(self, agent_id):
+        return list(self.memory_sites[agent_id, :self.memory_len[agent_id]])
+
+    """
+    Sets an agent's group number and invalidates the membership index
+    """
+    def set_group(self, agent_id, group_num):
+        self.group[agent_id] = group_num
+        self._members = None
+
+    """
+    Returns the sorted ids of the agents in a group. The index for every group is built in one pass
+    the first time it is needed after a group changes.
+    """
+    def group_members(self, group_num):
+        if self._members is None:
+            order = np.argsort(self.group, kind="stable")
+            bounds = np.searchsorted(self.group[order], np.arange(self.num_groups + 1))
+            self._members = [order[bounds[g]:bounds[g + 1]] for g in range(self.num_groups)]
+        return self._members[group_num]
+
+    """
+    Returns the one-hot group vector for a group number, or None if the agent has no group
+    """
+    def group_vector(self, group_num):
+        if group_num < 0:
+            return None
+        return self.group_vectors[group_num]
@@ -1,7 +1,20 @@
+from Model.site_field import SiteField
 
+"""
+A Site is a view into its row of a SiteField (see site_field.py). If no field is given,
+the site gets a private one-row field.
+NOTE: grazing should go through consume(), which is applied at the end of the simulation's tick;
+writing resource_count directly takes effect immediately.
+"""
 class Site:
 
-    def __init__(self, pos, radius, regen_time, resource_count):
+    def __init__(self, pos, radius, regen_time, resource_count, id=None, field=None):
+        self.id = id # the site's index in Simulation.sites; None if the site isn't part of a simulation
+        self._field = field # the arrays holding this site's row
+        self._row = id
+        if self._field is None:
+            self._field = SiteField(1)
+            self._row = 0
         self.REGEN_TIME = regen_time # the number of game ticks it takes for a site to completely regenerate resources
         self.MAX_RESOURCES = resource_count
         self.pos = pos
@@ -9,6 +22,56 @@ class Site:
         self.resource_count = resource_count
         self.timer = 0
 
+    ### FIELD-BACKED ATTRIBUTES ###
+
+    @property
+    def pos(self):
+        return self._field.positions[self._row]
+
+    @pos.setter
+    def pos(self, value):
+        self._field.positions[self._row] = value
+
+    @property
+    def radius(self):
+        return self._field.radii[self._row]
+
+    @radius.setter
+    def radius(self, value):
+        self._field.radii[self._row] = value
+
+    @property
+    def resource_count(self):
+        return self._field.resources[self._row]
+
+    @resource_count.setter
+    def resource_count(self, value):
+        self._field.resources[self._row] = value
+
+    @property
+    def MAX_RESOURCES(self):
+        return self._field.max_resources[self._row]
+
+    @MAX_RESOURCES.setter
+    def MAX_RESOURCES(self, value):
+        self._field.max_resources[self._row] = value
+
+    @property
+    def REGEN_TIME(self):
+        return self._field.regen_time[self._row]
+
+    @REGEN_TIME.setter
+    def REGEN_TIME(self, value):
+        self._field.regen_time[self._row] = value
+
+    @property
+    def timer(self):
+        return self._field.timer[self._row]
+
+    @timer.setter
+    def timer(self, value):
+        self._field.timer[self._row] = value
+
     def update(self):
         if self.resource_count <= 0:
             if self.timer < self.REGEN_TIME:
@@ -17,5 +80,11 @@ class Site:
                 self.resource_count = self.MAX_RESOURCES
                 self.timer = 0
 
+    """
+    Records that an agent grazed amount resources from the site this tick
+    """
+    def consume(self, amount=1):
+        self._field.consume(self._row, amount)
+
     def is_available(self):
         return self.resource_count != 0
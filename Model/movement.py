@@ -0,0 +1,188 @@
+import numpy as np
+from World.config import *
+
+"""
+Batched (whole-population) versions of the Agent movement methods. Instead of each agent looping
+over its neighbors in Python, a kernel computes the movement of every agent in one NumPy pass
+over the neighbor lists in CSR form (indptr, indices), as built by SpatialHash.neighbor_csr().
+The kernels read neighbor information from the prev_* arrays of an AgentStore, just like
+Simulation.get_agent_x() does, so they must be run after the store has been snapshotted.
+"""
+
+"""
+Returns the row (source agent) of every entry in a CSR neighbor list
+"""
+def csr_rows(indptr):
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+"""
+Returns the neighbor lists of just the rows in ids, as a CSR neighbor list (indptr, indices) with one row per id
+"""
+def csr_select(indptr, indices, ids):
+    starts = indptr[ids]
+    counts = indptr[ids + 1] - starts
+    selected = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=selected[1:])
+    offsets = np.arange(selected[-1]) - np.repeat(selected[:-1], counts)
+    return selected, indices[np.repeat(starts, counts) + offsets]
+
+"""
+Sums per-pair values into their rows; values is (num_pairs,) or (num_pairs, 2)
+"""
+def sum_rows(rows, values, num_rows):
+    if values.ndim == 1:
+        return np.bincount(rows, weights=values, minlength=num_rows)
+    return np.stack([np.bincount(rows, weights=values[:, i], minlength=num_rows) for i in range(values.shape[1])], axis=1)
+
+"""
+A minimal sparse matrix in CSR form, so the adjacency of the neighbor graph can be used in
+matrix-vector products without a dense N x N array.
+"""
+class CSRMatrix:
+    def __init__(self, indptr, indices, data=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = np.ones(len(indices)) if data is None else data # the weight of each entry
+        self.num_rows = len(indptr) - 1
+        self.rows = csr_rows(indptr) # the row of each entry
+
+    """
+    Returns a matrix with the same rows that only keeps the entries where mask is True
+    """
+    def masked(self, mask, data=None):
+        data = self.data if data is None else data
+        counts = np.bincount(self.rows[mask], minlength=self.num_rows)
+        indptr = np.zeros(self.num_rows + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return CSRMatrix(indptr, self.indices[mask], data[mask])
+
+    """
+    Returns self @ x, where x is (num_cols,) or (num_cols, 2)
+    """
+    def dot(self, x):
+        values = x[self.indices] * (self.data if x.ndim == 1 else self.data[:, None])
+        return sum_rows(self.rows, values, self.num_rows)
+
+    """
+    Returns the sum of each row (the weighted degree of each node)
+    """
+    def row_sums(self):
+        return np.bincount(self.rows, weights=self.data, minlength=self.num_rows)
+
+"""
+Vectorized Agent.move(): Boids repulsion, orientation, and attraction for every agent at once.
+positions and theta are the agents' own (live) values; neighbor positions and headings come from
+store.prev_positions and store.prev_heading, and the radii and constants from cfg (a SimConfig).
+Returns (new_positions, new_theta, has_neighbors); agents without neighbors keep their position and
+theta, like Agent.move(). If ids is given, only those agents are moved and the results have one row per id.
+"""
+def boid_step(store, indptr, indices, cfg, positions=None, theta=None, speed=None, ids=None):
+    positions = store.positions if positions is None else positions
+    theta = store.theta if theta is None else theta
+    speed = store.speed if speed is None else speed
+    group = store.group
+    if ids is not None:
+        indptr, indices = csr_select(indptr, indices, ids)
+        positions, theta, speed, group = positions[ids], theta[ids], speed[ids], group[ids]
+    num = len(positions)
+    rows = csr_rows(indptr)
+    has_neighbors = np.diff(indptr) > 0
+
+    dist_vect = store.prev_positions[indices] - positions[rows]
+    dist_sq = np.einsum("ij,ij->i", dist_vect, dist_vect)
+    dist = np.sqrt(dist_sq)
+    same_group = store.group[indices] == group[rows]
+
+    # repulsion from every neighbor within AGENT_REPL_RADIUS
+    repel = dist <= cfg.AGENT_REPL_RADIUS
+    scale = np.divide(1.0, dist_sq, out=np.zeros_like(dist_sq), where=dist_sq > 0)
+    repulsion = -sum_rows(rows[repel], dist_vect[repel] * scale[repel, None], num)
+
+    # orientation with group neighbors within AGENT_ORIENT_RADIUS, starting from the agent's own heading
+    heading = np.stack([np.cos(theta), np.sin(theta)], axis=1)
+    orient = same_group & (dist <= cfg.AGENT_ORIENT_RADIUS)
+    orientation = heading + sum_rows(rows[orient], store.prev_heading[indices[orient]], num)
+    norm_o = np.linalg.norm(orientation, axis=1)
+    perpendicular = np.stack([np.cos(theta + np.pi/2), np.sin(theta + np.pi/2)], axis=1)
+    orientation = np.where((norm_o > 0)[:, None], orientation / np.where(norm_o > 0, norm_o, 1.0)[:, None], perpendicular)
+
+    # attraction toward group neighbors
+    attraction = sum_rows(rows[same_group], dist_vect[same_group], num)
+    norm_a = np.linalg.norm(attraction, axis=1)
+    attraction = attraction / np.where(norm_a > 0, norm_a, 1.0)[:, None]
+
+    # steer toward the desired heading
+    desired_dir = repulsion + orientation + attraction
+    desired_heading = np.arctan2(desired_dir[:, 1], desired_dir[:, 0])
+    difference_in_heading = (((desired_heading - theta) + np.pi) % (2*np.pi)) - np.pi
+    angular_vel = cfg.K * difference_in_heading
+    new_positions = positions + (speed * cfg.DT)[:, None] * heading
+    new_theta = (((theta + (angular_vel * cfg.DT)) + np.pi) % (2*np.pi)) + np.pi
+
+    new_positions[~has_neighbors] = positions[~has_neighbors]
+    new_theta[~has_neighbors] = theta[~has_neighbors]
+    return new_positions, new_theta, has_neighbors
+
+"""
+BoidMoves holds one tick of boid_step() results. Agent.move() uses an agent's row instead of
+looping over its neighbors, as long as the agent is still where the kernel assumed it was.
+"""
+class BoidMoves:
+    def __init__(self, store, indptr, indices, cfg):
+        self.positions = store.positions.copy() # the inputs the kernel used
+        self.theta = store.theta.copy()
+        self.speed = store.speed.copy()
+        self.new_positions, self.new_theta, self.has_neighbors = boid_step(store, indptr, indices, cfg, self.positions,
+                                                                           self.theta, self.speed)
+
+    """
+    Returns True if the precomputed move is valid for an agent at pos facing theta with the given speed
+    """
+    def matches(self, agent_id, pos, theta, speed):
+        return (pos[0] == self.positions[agent_id, 0] and pos[1] == self.positions[agent_id, 1]
+                and theta == self.theta[agent_id] and speed == self.speed[agent_id])
+
+"""
+Vectorized Agent.repulse_move(): the graph laplacian step for every agent at once. The neighbor
+adjacency A is split into in-group and out-of-group parts, so with L = D - A:
+    attraction = -(L_in @ P),  diffuse = L_out @ P,  repulsion = W @ P - rowsum(W) * pos
+where W weighs each neighbor by 1 / |p_j - pos|^2. Returns the three terms per agent so callers
+can apply their own attr_factor and diff_factor. If ids is given, the terms are only computed for those
+agents, one row per id.
+"""
+def laplacian_terms(store, indptr, indices, positions=None, ids=None):
+    positions = store.positions if positions is None else positions
+    group = store.group
+    if ids is not None:
+        indptr, indices = csr_select(indptr, indices, ids)
+        positions, group = positions[ids], group[ids]
+    neighbor_positions = store.prev_positions
+    adjacency = CSRMatrix(indptr, indices)
+    same_group = store.group[indices] == group[adjacency.rows]
+    in_group = adjacency.masked(same_group)
+    out_group = adjacency.masked(~same_group)
+
+    attraction = in_group.dot(neighbor_positions) - in_group.row_sums()[:, None] * positions
+    diffuse = out_group.row_sums()[:, None] * positions - out_group.dot(neighbor_positions)
+
+    c = neighbor_positions[indices] - positions[adjacency.rows]
+    scaling_factor = np.einsum("ij,ij->i", c, c)
+    scaling_factor[scaling_factor == 0] = 1
+    weights = CSRMatrix(indptr, indices, 1.0 / scaling_factor)
+    repulsion = weights.dot(neighbor_positions) - weights.row_sums()[:, None] * positions
+    return attraction, diffuse, repulsion
+
+"""
+LaplacianMoves holds one tick of laplacian_terms() results. Agent.repulse_move() uses an agent's
+row instead of looping over its neighbors, as long as the agent is still where the kernel assumed it was.
+"""
+class LaplacianMoves:
+    def __init__(self, store, indptr, indices):
+        self.positions = store.positions.copy() # the input the kernel used
+        self.attraction, self.diffuse, self.repulsion = laplacian_terms(store, indptr, indices, self.positions)
+
+    """
+    Returns True if the precomputed terms are valid for an agent at pos
+    """
+    def matches(self, agent_id, pos):
+        return pos[0] == self.positions[agent_id, 0] and pos[1] == self.positions[agent_id, 1]
@@ -1,23 +1,71 @@
 import numpy as np
 import math
-from Controllers.states import DT, PADDING
+from Model.predator_store import PredatorStore
 from World.config import *
 
+"""
+A Predator is a view into its row of the simulation's PredatorStore (see predator_store.py); if the
+simulation has no store, the predator gets a private one-row store. Simulation.update() moves every
+predator at once with PredatorStore.step(); update() and move() are the per-predator equivalent.
+"""
 class Predator:
-    def __init__(self, pos, theta, sim, speed=1.0, target=None):
+    def __init__(self, pos, theta, sim, speed=1.0, target=None, id=None):
+        self.id = id # the predator's index in Simulation.predators
+        self.sim = sim
+        self.cfg = getattr(sim, "cfg", None) or SimConfig() # the settings the predator uses; defaults to the simulation's
+        self._store = getattr(sim, "predator_store", None) # the arrays holding this predator's row
+        self._row = id
+        if self._store is None or id is None:
+            self._store = PredatorStore(1, self.cfg)
+            self._row = 0
         self.pos = pos
         self.theta = theta
-        self.sim = sim
         self.speed = speed
         self.target = target
-        self.neighbors = []
+        self.neighbors = [] # the agents the predator can see; only used by update()
+
+    ### STORE-BACKED ATTRIBUTES ###
+
+    @property
+    def pos(self):
+        return self._store.positions[self._row]
+
+    @pos.setter
+    def pos(self, value):
+        self._store.positions[self._row] = value
+
+    @property
+    def theta(self):
+        return self._store.theta[self._row]
+
+    @theta.setter
+    def theta(self, value):
+        self._store.theta[self._row] = value
+
+    @property
+    def speed(self):
+        return self._store.speed[self._row]
+
+    @speed.setter
+    def speed(self, value):
+        self._store.speed[self._row] = value
+
+    # the agent being chased, stored as its ID
+    @property
+    def target(self):
+        target_id = self._store.target[self._row]
+        return None if target_id < 0 else self.sim.agents[target_id]
+
+    @target.setter
+    def target(self, value):
+        self._store.target[self._row] = -1 if value is None else value.id
 
     def update(self):
         if self.neighbors:
             # get target
             if self.target == None:
                 self.target = self.neighbors[np.random.randint(0, len(self.neighbors))]
-                self.speed *= HUNTING_MULTIPLIER
+                self.speed *= self.cfg.HUNTING_MULTIPLIER
             
             # lose target if too many agents are there
             # else:
@@ -26,14 +74,13 @@ class Predator:
             #         self.theta = -math.atan2(dx[1], dx[0])
             #         self.target = None
 
-        if math.dist(self.pos, self.target.pos) > PREDATOR_SENSING_RADIUS:
+        if self.target != None and math.dist(self.pos, self.target.pos) > self.cfg.PREDATOR_SENSING_RADIUS:
                     self.target = None
-                    self.speed = self.speed / HUNTING_MULTIPLIER
+                    self.speed = self.speed / self.cfg.HUNTING_MULTIPLIER
         self.move()
         self.neighbors = []
 
     def move(self):
-        from World.simulation import WORLD_SIZE
         if self.target:
             # orient towards target
             dx = self.target.pos - self.pos
@@ -43,23 +90,23 @@ class Predator:
         self.theta = self.theta % (2*np.pi)
         # move according to orientation
         new_pos = np.array([self.speed * np.cos(self.theta), self.speed * np.sin(self.theta)])
-        self.pos = self.pos + new_pos * DT # FIXME: predators jumping around... moving too fast
+        self.pos = self.pos + new_pos * self.cfg.DT # FIXME: predators jumping around... moving too fast
 
         # check for world boundaries
-        if self.pos[0] <= PADDING:
-            self.pos[0] = self.pos[0] + (self.speed * DT)
+        if self.pos[0] <= self.cfg.PADDING:
+            self.pos[0] = self.pos[0] + (self.speed * self.cfg.DT)
             self.theta = 0.0
 
-        if self.pos[1] <= PADDING:
-            self.pos[1] = self.pos[1] + (self.speed * DT)
+        if self.pos[1] <= self.cfg.PADDING:
+            self.pos[1] = self.pos[1] + (self.speed * self.cfg.DT)
             self.theta = np.pi/2
 
-        if self.pos[0] >= WORLD_SIZE - PADDING:
-            self.pos[0] = self.pos[0] - (self.speed * DT)
+        if self.pos[0] >= self.cfg.WORLD_SIZE - self.cfg.PADDING:
+            self.pos[0] = self.pos[0] - (self.speed * self.cfg.DT)
             self.theta = np.pi
 
-        if self.pos[1] >= WORLD_SIZE - PADDING:
-            self.pos[1] = self.pos[1] - (self.speed * DT)
+        if self.pos[1] >= self.cfg.WORLD_SIZE - self.cfg.PADDING:
+            self.pos[1] = self.pos[1] - (self.speed * self.cfg.DT)
             self.theta = 3*np.pi/2
 
     def heading(self):
@@ -0,0 +1,79 @@
+import numpy as np
+from World.config import *
+
+"""
+PredatorStore keeps the data of every predator in contiguous arrays, like AgentStore does for agents.
+Row i belongs to the predator whose id is i; Predator is a thin view that reads and writes its row.
+step() runs one tick of Predator.update() for every predator at once.
+"""
+class PredatorStore:
+    def __init__(self, num_predators, cfg=None):
+        self.num_predators = num_predators
+        self.cfg = cfg if cfg is not None else SimConfig() # the settings the predators use
+        self.positions = np.zeros((num_predators, 2)) # where each predator is in the world
+        self.theta = np.zeros(num_predators) # the angle each predator is facing
+        self.speed = np.zeros(num_predators) # how fast each predator moves
+        self.target = np.full(num_predators, -1, dtype=np.int64) # the ID of the agent each predator is chasing; -1 = none
+
+    """
+    Vectorized Predator.update(): picks a random target for every idle predator with prey in range, drops
+    targets that got out of range, then moves every predator. agent_positions are the agents' current
+    positions and (indptr, indices) lists the agents within PREDATOR_SENSING_RADIUS of each predator.
+    """
+    def step(self, agent_positions, indptr, indices):
+        if self.num_predators == 0:
+            return
+        counts = np.diff(indptr)
+
+        # get target
+        pick = (counts > 0) & (self.target < 0)
+        if pick.any():
+            choice = np.random.randint(0, counts[pick])
+            self.target[pick] = indices[indptr[:-1][pick] + choice]
+            self.speed[pick] *= self.cfg.HUNTING_MULTIPLIER
+
+        # lose target if it got away
+        hunting = np.flatnonzero(self.target >= 0)
+        dist = np.linalg.norm(agent_positions[self.target[hunting]] - self.positions[hunting], axis=1)
+        lost = hunting[dist > self.cfg.PREDATOR_SENSING_RADIUS]
+        self.target[lost] = -1
+        self.speed[lost] = self.speed[lost] / self.cfg.HUNTING_MULTIPLIER
+
+        # orient towards target, or wander
+        hunting = self.target >= 0
+        dx = agent_positions[self.target[hunting]] - self.positions[hunting]
+        self.theta[hunting] = np.arctan2(dx[:, 1], dx[:, 0])
+        wandering = ~hunting
+        self.theta[wandering] += np.random.uniform(-np.pi/6, np.pi/6, size=int(wandering.sum()))
+        self.theta %= 2*np.pi
+
+        # move according to orientation
+        self.positions[:, 0] += self.speed * np.cos(self.theta) * self.cfg.DT
+        self.positions[:, 1] += self.speed * np.sin(self.theta) * self.cfg.DT
+
+        # check for world boundaries, in the same order as Predator.move()
+        step = self.speed * self.cfg.DT
+        for axis, low_theta in ((0, 0.0), (1, np.pi/2)):
+            low = self.positions[:, axis] <= self.cfg.PADDING
+            self.positions[low, axis] += step[low]
+            self.theta[low] = low_theta
+        for axis, high_theta in ((0, np.pi), (1, 3*np.pi/2)):
+            high = self.positions[:, axis] >= self.cfg.WORLD_SIZE - self.cfg.PADDING
+            self.positions[high, axis] -= step[high]
+            self.theta[high] = high_theta
+
+    # the arrays that make up the predators' state
+    STATE_ARRAYS = ("positions", "theta", "speed", "target")
+
+    """
+    Returns the predators' state as a dict of arrays (see STATE_ARRAYS); the arrays are not copied
+    """
+    def state_arrays(self):
+        return {name: getattr(self, name) for name in self.STATE_ARRAYS}
+
+    """
+    Overwrites the predators' state with arrays from state_arrays()
+    """
+    def load_state_arrays(self, arrays):
+        for name in self.STATE_ARRAYS:
+            np.copyto(getattr(self, name), arrays[name])
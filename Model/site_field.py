@@ -0,0 +1,72 @@
+import numpy as np
+
+"""
+SiteField keeps the data of every feeding site in contiguous arrays, the same way AgentStore does for
+agents. Row i belongs to the site whose id is i; Site is a thin view that reads and writes its row.
+All sites regenerate in one vectorized step, and grazing is not applied to resource counts right away:
+each consume() is recorded, and apply_consumption() subtracts a tick's total from every site at once,
+clamping at zero. Resource counts therefore stay fixed during a tick, whatever order agents graze in.
+"""
+class SiteField:
+    def __init__(self, num_sites):
+        self.num_sites = num_sites
+        self.positions = np.zeros((num_sites, 2)) # where each site is in the world
+        self.radii = np.zeros(num_sites) # how big each site is
+        self.resources = np.zeros(num_sites, dtype=np.int64) # the resources each site has left
+        self.max_resources = np.zeros(num_sites, dtype=np.int64) # the resources each site regenerates to
+        self.regen_time = np.zeros(num_sites, dtype=np.int64) # the number of ticks each site takes to regenerate once depleted
+        self.timer = np.zeros(num_sites, dtype=np.int64) # how many ticks each depleted site has been regenerating
+        self.pending = np.zeros(num_sites, dtype=np.int64) # resources consumed from each site this tick, not yet applied
+
+    """
+    Records that amount resources were consumed from a site this tick
+    """
+    def consume(self, site_id, amount=1):
+        self.pending[site_id] += amount
+
+    """
+    Records one unit of consumption for every entry in site_ids (site ids may repeat)
+    """
+    def consume_many(self, site_ids):
+        self.pending += np.bincount(np.asarray(site_ids, dtype=np.int64), minlength=self.num_sites)
+
+    """
+    Subtracts this tick's consumption from every site, clamping at zero
+    """
+    def apply_consumption(self):
+        np.subtract(self.resources, self.pending, out=self.resources)
+        np.maximum(self.resources, 0, out=self.resources)
+        self.pending[:] = 0
+
+    """
+    Vectorized Site.update(): depleted sites count up to their regen time, then refill completely
+    """
+    def regenerate(self):
+        depleted = self.resources <= 0
+        waiting = depleted & (self.timer < self.regen_time)
+        refilled = depleted & ~waiting
+        self.timer[waiting] += 1
+        self.resources[refilled] = self.max_resources[refilled]
+        self.timer[refilled] = 0
+
+    """
+    Returns a boolean mask of the sites that have resources
+    """
+    def available(self):
+        return self.resources != 0
+
+    # the arrays that make up the sites' state
+    STATE_ARRAYS = ("positions", "radii", "resources", "max_resources", "regen_time", "timer", "pending")
+
+    """
+    Returns the sites' state as a dict of arrays (see STATE_ARRAYS); the arrays are not copied
+    """
+    def state_arrays(self):
+        return {name: getattr(self, name) for name in self.STATE_ARRAYS}
+
+    """
+    Overwrites the sites' state with arrays from state_arrays()
+    """
+    def load_state_arrays(self, arrays):
+        for name in self.STATE_ARRAYS:
+            np.copyto(getattr(self, name), arrays[name])
@@ -12,6 +12,11 @@ DT = 0.01 # used to smooth agent/predator movement between iterations (too high
 NUM_GROUPS = 3 # determines the number of groups agents are separated into
 MAX_NETWORK_SIZE = (NUM_AGENTS // NUM_GROUPS) + 1 # determines the maximum size of each group
 USE_BT = False # toggles between the behavior tree implementation of agents and the finite state machine implementation
+USE_COMPILED_BT = True # ticks each agent's behavior tree as a flat compiled program instead of through py_trees (same results, see bt_compiler.py)
+USE_BULK_BUILD = False # draws the starting world (agents, groups, sites, predators) in a few array draws instead of one draw at a time; much faster for large worlds, but seeded runs differ from the one-at-a-time draws
+SYNC_UPDATE = False # toggles synchronous ticks: every agent reads a snapshot of the world from the start of the tick, so update order doesn't matter
+USE_SITE_QUERY = True # toggles computing all agent-site distances once per tick instead of once per site query (same results)
+USE_SPATIAL_HASH = True # toggles between grid-based neighbor sensing and the brute-force scan over every agent (same results, the scan is O(N^2))
 
 """If you wish to add more groups, please add the RGB hexadecimal value of the color
 and add the (group number, color) key-value pair to COLORS """
@@ -23,6 +28,9 @@ COLORS = {0: PINK, 1: CYAN, 2: GREEN} # a map between group number and group col
 
 # AGENT PROPERTIES
 USE_BOID_MOVE = True # toggles between pure Boid-like movement, or graph laplacian diffusion based movement
+USE_BATCHED_MOVE = False # computes every agent's movement in one vectorized pass per tick; always runs synchronous ticks (see SYNC_UPDATE)
+USE_VECTORIZED_FSM = False # FSM only: runs every agent's network state machine and movement as masked array operations (see network_fsm.py); always runs synchronous ticks
+USE_VECTORIZED_BT = False # BT only: ticks every agent's behavior tree at once, as array operations over the agents at each node (see bt_vectorized.py); needs USE_COMPILED_BT and always runs synchronous ticks
 AGENT_SENSING_RADIUS = 5 # determines how far the agent can "see" around itself, with the agent at the center
 MAX_HUNGER = 100 # determines the max amount of hunger satiation an agent can have (i.e. how full it can be)
 MAX_SPEED = 5.0 # determines the fastest an agent can go, used in movement
@@ -39,3 +47,43 @@ K = 0.5 # used to calculate angular velocity
 PREDATOR_SENSING_RADIUS = 5 # determines how far a predator can "see", centered around the predator
 HUNTING_MULTIPLIER = 3 # determines how much faster a predator will move when it has a target
 PREDATOR_NEIGHBOR_THRESHOLD = 5 # determines how big a group of agents had to be before a predator would give up chasing an agent
+
+"""
+SimConfig holds the settings of one simulation, so several configurations can run in the same process.
+Every setting defaults to the constant of the same name above; override any of them with keyword
+arguments, e.g. SimConfig(NUM_AGENTS=200, AGENT_SENSING_RADIUS=3). Settings that are derived from
+other settings above are recomputed from the overridden values unless they are overridden themselves.
+The simulation passes its config on to its agents, predators, states, and behaviors.
+"""
+class SimConfig:
+    DERIVED = {"SITE_MAX_RADIUS": lambda cfg: cfg.WORLD_SIZE * 0.25,
+               "MAX_NETWORK_SIZE": lambda cfg: (cfg.NUM_AGENTS // cfg.NUM_GROUPS) + 1,
+               "AGENT_NEIGHBOR_THRESHOLD": lambda cfg: cfg.NUM_AGENTS//10,
+               "AGENT_ORIENT_RADIUS": lambda cfg: cfg.AGENT_SENSING_RADIUS // 10 if cfg.AGENT_SENSING_RADIUS // 10 > 0 else 2}
+
+    def __init__(self, **overrides):
+        defaults = {name: value for name, value in globals().items() if name.isupper()}
+        unknown = set(overrides) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown config settings: {sorted(unknown)}")
+        self.overrides = dict(overrides) # the settings that differ from config.py
+        for name, value in defaults.items():
+            setattr(self, name, overrides.get(name, value))
+        for name, derive in self.DERIVED.items():
+            if name not in overrides:
+                setattr(self, name, derive(self))
+
+    """
+    Returns a new config with these settings overridden on top of this config's overrides
+    """
+    def replace(self, **overrides):
+        return SimConfig(**{**self.overrides, **overrides})
+
+    """
+    Returns every setting as a dict
+    """
+    def to_dict(self):
+        return {name: value for name, value in vars(self).items() if name.isupper()}
+
+    def __repr__(self):
+        return f"SimConfig({', '.join(f'{name}={value!r}' for name, value in self.overrides.items())})"
@@ -0,0 +1,127 @@
+import numpy as np
+from Controllers.network_fsm import NETWORK_STATES, network_step, clamp_to_world
+from Controllers.states import NET_FLOCK
+from Model.agent_store import AgentStore
+from Model.site_field import SiteField
+from World.config import *
+from World.generation import draw_agents, draw_sites
+from World.site_query import SiteQuery
+from World.spatial_hash import SpatialHash
+
+"""
+FSMEnsemble runs R independent replicas of FSM_Simulation as one set of arrays. Row r * N + i of every
+agent array is agent i of replica r, and row r * S + s of the SiteField is site s of replica r, so
+view() reshapes any of them to (R, N, ...) or (R, S, ...). Each tick, neighbor search, site sensing, the
+network state machine (see network_fsm.py), movement, and site updates run over every replica at once.
+Only the random draws loop over the replicas: each replica has its own RNG stream, so a replica gives the
+same run whatever ensemble it is part of.
+Ticks are synchronous, like FSM_Simulation with SYNC_UPDATE: every agent sees the world as it was at the
+start of the tick. Predators are left out, since the network states don't react to them. The results
+match FSM_Simulation statistically, not draw for draw.
+"""
+class FSMEnsemble:
+    def __init__(self, seeds, cfg=None):
+        self.cfg = cfg if cfg is not None else SimConfig()
+        self.rngs = [np.random.default_rng(seed) for seed in seeds] # one random stream per replica
+        self.num_replicas = len(self.rngs)
+        self.num_agents = self.cfg.NUM_AGENTS # agents per replica
+        self.num_sites = self.cfg.NUM_SITES # sites per replica
+        num_rows = self.num_replicas * self.num_agents
+        self.store = AgentStore(num_rows, self.cfg.NUM_GROUPS, self.cfg.MAX_SITE_MEMORY) # the agents of every replica; site ids are SiteField rows and there are no Site objects
+        self.replica = np.repeat(np.arange(self.num_replicas), self.num_agents) # the replica each agent row belongs to
+        self.site_field = SiteField(self.num_replicas * self.num_sites) # the sites of every replica
+        self.spatial_hash = SpatialHash(self.cfg.AGENT_SENSING_RADIUS)
+        self.build_world()
+        self.avg_hunger = self.view(self.store.hunger).mean(axis=1) # each replica's mean agent hunger after the last tick
+
+    """
+    Draws every replica's starting world from its own stream, with the same distributions as
+    Simulation.build_agents() and build_sites() (see generation.py). Every agent starts in NetworkFlockState.
+    """
+    def build_world(self):
+        cfg = self.cfg
+        N, S = self.num_agents, self.num_sites
+        for r, rng in enumerate(self.rngs):
+            agents = slice(r * N, (r + 1) * N)
+            draws = draw_agents(rng, N, cfg)
+            self.store.group[agents] = draws["group"]
+            self.store.positions[agents] = draws["positions"]
+            self.store.speed[agents] = draws["speed"]
+            self.store.theta[agents] = draws["theta"]
+            self.store.hunger[agents] = draws["hunger"]
+            sites = slice(r * S, (r + 1) * S)
+            self.site_field.positions[sites], self.site_field.radii[sites] = draw_sites(rng, S, cfg)
+        self.site_field.resources[:] = cfg.SITE_MAX_RESOURCE
+        self.site_field.max_resources[:] = cfg.SITE_MAX_RESOURCE
+        self.site_field.regen_time[:] = cfg.SITE_REGEN_TIME
+        self.store.state[:] = NET_FLOCK
+        self.store.state_timer[:] = cfg.AGENT_BORED_THRESHOLD
+
+    """
+    Returns a per-row array shaped (R, N, ...) (or (R, S, ...) for SiteField arrays); a view, not a copy
+    """
+    def view(self, array):
+        return array.reshape(self.num_replicas, -1, *array.shape[1:])
+
+    ### RANDOM DRAWS ###
+    # the same interface as NumpyDraws, but each replica's values come from its own stream
+
+    """
+    Returns one uniform value in [low, high) per agent row
+    """
+    def uniform(self, low, high):
+        return np.concatenate([rng.uniform(low, high, self.num_agents) for rng in self.rngs])
+
+    """
+    Returns one uniform [0, 1) value per entry of a CSR neighbor list
+    """
+    def pairs(self, indptr):
+        counts = np.diff(indptr[::self.num_agents]).tolist() # rows are grouped by replica, so each replica's entries are contiguous
+        return np.concatenate([rng.random(n) for rng, n in zip(self.rngs, counts)])
+
+    ### UPDATE ###
+
+    """
+    Runs one synchronous tick of every replica
+    """
+    def update(self):
+        cfg = self.cfg
+        store = self.store
+        S = self.num_sites
+        store.snapshot_all()
+        positions = store.prev_positions
+
+        # neighbors (within the same replica only)
+        indptr, indices = self.spatial_hash.neighbor_csr(positions, cfg.AGENT_SENSING_RADIUS, labels=self.replica)
+
+        # sites, like SiteQuery: which sites of its replica each agent can see and is at
+        site_offset = self.replica * S
+        site_rows = site_offset[:, None] + np.arange(S)
+        radii = self.site_field.radii[site_rows]
+        in_range, at = SiteQuery.within_masks(positions, self.site_field.positions[site_rows], [cfg.AGENT_SENSING_RADIUS + radii, radii])
+        visible = in_range & self.site_field.available()[site_rows]
+
+        network_step(store, self.site_field, indptr, indices, visible, at, self, cfg, site_offset)
+
+        # Simulation.update_agent()
+        store.hunger -= 1
+        self.avg_hunger = self.view(store.hunger).mean(axis=1)
+        store.hunger += clamp_to_world(store.positions, cfg) > 0
+
+        self.site_field.apply_consumption()
+        self.site_field.regenerate()
+
+    ### METRICS ###
+
+    """
+    Returns the number of agents in each network state, shaped (R, len(NETWORK_STATES))
+    """
+    def state_counts(self):
+        state = self.view(self.store.state)
+        return np.stack([(state == code).sum(axis=1) for code in NETWORK_STATES], axis=1)
+
+    """
+    Returns the total resources left at each replica's sites, shaped (R,)
+    """
+    def site_resources(self):
+        return self.view(self.site_field.resources).sum(axis=1)
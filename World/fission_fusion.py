@@ -0,0 +1,163 @@
+import numpy as np
+
+"""
+FissionFusionTracker follows the subgroups of a simulation from tick to tick. Each tick, the agents are
+split into the connected components of the proximity graph (agents within AGENT_SENSING_RADIUS of each
+other, optionally only pairs from the same group), found with a vectorized union-find. Each component is
+matched to the last tick's components through the agents they share, and every change is recorded as an event:
+- fission: a component's agents are now in two or more components
+- fusion: two or more components' agents are now in one component
+- birth: a component has none of the agents of the last tick's components
+- death: none of a component's agents are in a component anymore
+Components smaller than min_size (by default, lone agents) don't count as subgroups. A component keeps its
+id from tick to tick as long as it and a component of the last tick are each other's largest overlap; other
+components get new ids.
+Attach it with attach(simulation), like TrajectoryRecorder (see recorder.py); Simulation.update() then calls
+record() at the end of every tick. A synchronous tick's neighbor lists (Simulation.neighbor_csr) are reused
+for the graph, so those ticks don't search for neighbors again; otherwise the spatial hash finds them.
+"""
+
+"""
+Returns the connected component of every node of an undirected graph with edges (u, v), numbered 0..K-1
+in order of each component's smallest node. Roots are hooked under the smaller root of every edge and
+then the trees are flattened by pointer jumping, both over every edge at once, until no edge joins two
+trees; each round takes a few array passes over the edges.
+"""
+def connected_components(num_nodes, u, v):
+    parent = np.arange(num_nodes)
+    while len(u) > 0:
+        root_u, root_v = parent[u], parent[v]
+        joining = root_u != root_v
+        if not joining.any():
+            break
+        u, v = u[joining], v[joining] # edges inside a tree stay inside it
+        low = np.minimum(root_u[joining], root_v[joining])
+        high = np.maximum(root_u[joining], root_v[joining])
+        np.minimum.at(parent, high, low)
+        while True: # point every node at its root
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return np.unique(parent, return_inverse=True)[1].reshape(-1)
+
+class FissionFusionTracker:
+    def __init__(self, same_group=False, min_size=2):
+        self.same_group = same_group # only link agents of the same group
+        self.min_size = min_size # the smallest component that counts as a subgroup
+        self.tick = 0 # how many ticks have been tracked
+        self.labels = None # the component id of every agent at the last tick; -1 = not in a subgroup
+        self.next_id = 0 # the id the next new component gets
+        self.events = [] # every event so far, as dicts (see step())
+        self.counts = {"fission": 0, "fusion": 0, "birth": 0, "death": 0} # how many events of each kind so far
+        # the last tick's components, by component number (see connected_components())
+        self._rows = None # the component number of every agent; -1 = not in a subgroup
+        self._ids = np.zeros(0, dtype=np.int64) # the id of each component; -1 = not a subgroup
+        self._sizes = np.zeros(0, dtype=np.int64) # the number of agents in each component
+        self._composition = np.zeros((0, 0), dtype=np.int64) # the number of agents from each group in each component
+
+    """
+    Makes the simulation call record() at the end of every tick
+    """
+    def attach(self, simulation):
+        simulation.recorders.append(self)
+        return self
+
+    """
+    Stops the simulation from calling record()
+    """
+    def detach(self, simulation):
+        simulation.recorders.remove(self)
+
+    """
+    Called by Simulation.update() at the end of every tick; tracks the simulation's proximity graph
+    """
+    def record(self, simulation):
+        store = simulation.store
+        if simulation.neighbor_csr is not None:
+            indptr, indices = simulation.neighbor_csr
+        else:
+            indptr, indices = simulation.spatial_hash.neighbor_csr(store.positions, simulation.cfg.AGENT_SENSING_RADIUS)
+        self.step(indptr, indices, store.group, store.num_groups)
+
+    """
+    Tracks one tick, given the proximity graph as CSR neighbor lists (indptr, indices) and every agent's
+    group number, and returns the tick's events. Each event is a dict with the tick, the kind of event, the
+    ids of the components before and after, and each of those components' size and number of agents per
+    group ("before_sizes", "before_groups", "after_sizes", "after_groups"); births have no components before
+    and deaths none after. On the first tick, every subgroup is a birth.
+    """
+    def step(self, indptr, indices, groups, num_groups):
+        num_agents = len(indptr) - 1
+        groups = np.asarray(groups)
+        rows = np.repeat(np.arange(num_agents), np.diff(indptr))
+        keep = rows < indices # each edge once
+        if self.same_group:
+            keep &= groups[rows] == groups[indices]
+        components = connected_components(num_agents, rows[keep], indices[keep])
+
+        # subgroups: components with at least min_size agents
+        sizes = np.bincount(components, minlength=1)
+        num_components = len(sizes)
+        big = sizes >= self.min_size
+        raw = np.where(big[components], components, -1) # each agent's subgroup, by component number
+        members = raw >= 0
+        in_group = members & (groups >= 0)
+        composition = np.bincount(raw[in_group] * num_groups + groups[in_group], minlength=num_components * num_groups).reshape(num_components, num_groups)
+
+        # overlaps between the last tick's subgroups and this tick's: (old component, new component, shared agents), sorted
+        num_old = len(self._ids)
+        if self._rows is None:
+            old = new = shared = np.zeros(0, dtype=np.int64)
+        else:
+            both = (self._rows >= 0) & members
+            keys, shared = np.unique(self._rows[both] * num_components + raw[both], return_counts=True)
+            old, new = np.divmod(keys, num_components)
+
+        # ids: a component keeps an old id if each is the other's largest overlap
+        order = np.argsort(-shared, kind="stable") # largest overlaps first
+        best_of_old = order[np.unique(old[order], return_index=True)[1]] # the largest overlap of each old component
+        best_of_new = order[np.unique(new[order], return_index=True)[1]]
+        best_new = np.full(num_old, -1, dtype=np.int64)
+        best_new[old[best_of_old]] = new[best_of_old]
+        mutual = best_of_new[best_new[old[best_of_new]] == new[best_of_new]]
+        ids = np.full(num_components, -1, dtype=np.int64)
+        ids[new[mutual]] = self._ids[old[mutual]]
+        fresh = np.flatnonzero(big & (ids < 0))
+        ids[fresh] = self.next_id + np.arange(len(fresh))
+        self.next_id += len(fresh)
+
+        # events
+        old_degree = np.bincount(old, minlength=num_old) # how many new components each old one overlaps
+        new_degree = np.bincount(new, minlength=num_components)
+        old_bounds = np.searchsorted(old, np.arange(num_old + 1))
+        by_new = np.argsort(new, kind="stable")
+        new_bounds = np.searchsorted(new[by_new], np.arange(num_components + 1))
+        events = []
+        for o in np.flatnonzero(old_degree > 1).tolist():
+            events.append(self._event("fission", [o], new[old_bounds[o]:old_bounds[o + 1]].tolist(), ids, sizes, composition))
+        for n in np.flatnonzero(new_degree > 1).tolist():
+            events.append(self._event("fusion", old[by_new[new_bounds[n]:new_bounds[n + 1]]].tolist(), [n], ids, sizes, composition))
+        for n in np.flatnonzero(big & (new_degree == 0)).tolist():
+            events.append(self._event("birth", [], [n], ids, sizes, composition))
+        for o in np.flatnonzero((self._ids >= 0) & (old_degree == 0)).tolist():
+            events.append(self._event("death", [o], [], ids, sizes, composition))
+        for event in events:
+            self.counts[event["event"]] += 1
+        self.events.extend(events)
+
+        self.labels = np.where(members, ids[raw], -1)
+        self._rows = raw
+        self._ids = ids
+        self._sizes = sizes
+        self._composition = composition
+        self.tick += 1
+        return events
+
+    """
+    Returns an event; before and after are old and new component numbers
+    """
+    def _event(self, kind, before, after, ids, sizes, composition):
+        return {"tick": self.tick, "event": kind,
+                "before": self._ids[before].tolist(), "before_sizes": self._sizes[before].tolist(), "before_groups": self._composition[before].tolist(),
+                "after": ids[after].tolist(), "after_sizes": sizes[after].tolist(), "after_groups": composition[after].tolist()}
@@ -0,0 +1,159 @@
+import numpy as np
+from World.config import *
+
+"""
+Bulk world generation: every agent, site, and predator attribute is drawn in a few array draws instead
+of one scalar draw per attribute per agent. Positions, headings, speeds, and the other attributes have the
+same distributions as in Simulation.build_agents(), build_sites(), and build_predators(); groups don't
+(see assign_groups()). rng can be np.random itself (the global stream Simulation uses) or a np.random.Generator.
+"""
+
+"""
+Returns size random ints in [low, high) from either kind of rng
+"""
+def integers(rng, low, high, size=None):
+    if hasattr(rng, "integers"):
+        return rng.integers(low, high, size)
+    return rng.randint(low, high, size)
+
+"""
+Returns a group number for every agent. Each agent picks a group at random, and then agents in groups over
+max_size are moved to random open places in the other groups, so no group has more than max_size agents.
+build_agents() only redraws an agent's group once when the group is over MAX_NETWORK_SIZE, so its groups
+can end up larger than that.
+"""
+def assign_groups(rng, num_agents, num_groups, max_size):
+    if num_groups * max_size < num_agents:
+        raise ValueError(f"{num_agents} agents don't fit in {num_groups} groups of at most {max_size}")
+    groups = integers(rng, 0, num_groups, num_agents)
+    sizes = np.bincount(groups, minlength=num_groups)
+    if (sizes <= max_size).all():
+        return groups
+    # which agents leave each overfull group, picked at random
+    order = rng.permutation(num_agents)
+    order = order[np.argsort(groups[order], kind="stable")]
+    rank = np.empty(num_agents, dtype=np.int64)
+    rank[order] = np.arange(num_agents) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    moving = np.flatnonzero(rank >= max_size)
+    # the open places they move to, picked at random
+    open_places = np.repeat(np.arange(num_groups), np.maximum(max_size - sizes, 0))
+    groups[moving] = open_places[rng.permutation(len(open_places))[:len(moving)]]
+    return groups
+
+"""
+Returns the starting attributes of num_agents agents as a dict of arrays, like build_agents():
+group, positions, speed, theta, hunger, attraction, and repulsion
+"""
+def draw_agents(rng, num_agents, cfg):
+    return {"group": assign_groups(rng, num_agents, cfg.NUM_GROUPS, cfg.MAX_NETWORK_SIZE),
+            "positions": rng.uniform(0, cfg.WORLD_SIZE, (num_agents, 2)),
+            "speed": rng.uniform(1.0, cfg.MAX_SPEED, num_agents),
+            "theta": rng.uniform(-np.pi, np.pi, num_agents),
+            "hunger": integers(rng, int(cfg.MAX_HUNGER/2), cfg.MAX_HUNGER, num_agents),
+            "attraction": rng.uniform(0.25, 1.0, num_agents),
+            "repulsion": rng.uniform(0.25, 1.0, num_agents)}
+
+"""
+Returns the positions and radii of num_sites sites, like build_sites()
+"""
+def draw_sites(rng, num_sites, cfg):
+    return rng.uniform(0, cfg.WORLD_SIZE, (num_sites, 2)), integers(rng, 1, int(cfg.SITE_MAX_RADIUS), num_sites)
+
+"""
+Returns the positions and headings of num_predators predators, like build_predators()
+"""
+def draw_predators(rng, num_predators, cfg):
+    return rng.uniform(0, cfg.WORLD_SIZE, (num_predators, 2)), rng.uniform(-np.pi, np.pi, num_predators)
+
+"""
+Returns the pairs (i, j), i < j, at the given positions in the list of all pairs of num_nodes nodes
+in lexicographic order
+"""
+def _pairs(num_nodes, k):
+    n = num_nodes
+    i = np.floor(((2*n - 1) - np.sqrt((2.0*n - 1)**2 - 8.0*k)) / 2).astype(np.int64)
+    start = i * (2*n - i - 1) // 2 # the position of the first pair of each row
+    while True: # correct the rounding of the square root
+        over = start > k
+        under = (i + 1) * (2*n - i - 2) // 2 <= k
+        if not (over.any() or under.any()):
+            break
+        i += under.astype(np.int64) - over.astype(np.int64)
+        start = i * (2*n - i - 1) // 2
+    return i, k - start + i + 1
+
+"""
+Returns the rank of every entry among the entries with the same key, in order
+"""
+def _rank_within(keys, num_keys):
+    order = np.sort(keys * len(keys) + np.arange(len(keys))) % max(len(keys), 1) # a stable argsort; sorting the combined keys is much faster
+    counts = np.bincount(keys, minlength=num_keys)
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rank
+
+"""
+Returns each edge's rank among the edges of its first and of its second node. The edges (u, v), u < v, must
+be in lexicographic order, so a node's edges as the second node all come before its edges as the first
+node, and its edges as the first node are contiguous.
+"""
+def _edge_ranks(num_nodes, u, v):
+    as_second = np.bincount(v, minlength=num_nodes)
+    as_first = np.bincount(u, minlength=num_nodes)
+    rank_u = as_second[u] + np.arange(len(u)) - np.repeat(np.cumsum(as_first) - as_first, as_first)
+    return rank_u, _rank_within(v, num_nodes)
+
+"""
+Drops edges so no node has more than max_degree. The edges are kept greedily in order, like
+build_neighbor_matrix(): an edge is kept if both of its nodes have room when its turn comes. Each round
+keeps every remaining edge that can't be crowded out by the earlier ones, so the result is the same as
+the one-edge-at-a-time loop.
+"""
+def _cap_degree(num_nodes, u, v, max_degree):
+    keep = np.zeros(len(u), dtype=bool)
+    degree = np.zeros(num_nodes, dtype=np.int64)
+    remaining = np.arange(len(u))
+    while len(remaining) > 0:
+        room = max_degree - degree
+        remaining = remaining[(room[u[remaining]] > 0) & (room[v[remaining]] > 0)]
+        ru, rv = u[remaining], v[remaining]
+        rank_u, rank_v = _edge_ranks(num_nodes, ru, rv)
+        kept = (rank_u < room[ru]) & (rank_v < room[rv])
+        keep[remaining[kept]] = True
+        degree += np.bincount(ru[kept], minlength=num_nodes) + np.bincount(rv[kept], minlength=num_nodes)
+        remaining = remaining[~kept]
+    return u[keep], v[keep]
+
+"""
+Returns a random undirected network on num_nodes nodes in CSR form (indptr, indices), with each row's
+neighbors in ascending order. Every pair is linked with probability p (for a sparse network with mean
+degree d, use p = d / (num_nodes - 1)); only the links themselves are drawn, so the cost grows with the
+number of links rather than the number of pairs. With max_degree, links are dropped the way
+build_neighbor_matrix() does so that no node has more than max_degree.
+"""
+def random_network_csr(rng, num_nodes, p, max_degree=None):
+    num_pairs = num_nodes * (num_nodes - 1) // 2
+    links = np.zeros(0, dtype=np.int64)
+    if p > 0 and num_pairs > 0:
+        # the gaps between linked pairs are geometric, so draw them instead of one coin per pair
+        last = -1
+        chunks = []
+        expected = num_pairs * p
+        while last < num_pairs - 1:
+            gaps = rng.geometric(p, int(expected + 5 * np.sqrt(expected) + 16))
+            chunk = last + np.cumsum(gaps)
+            chunks.append(chunk[chunk < num_pairs])
+            last = chunk[-1]
+        links = np.concatenate(chunks)
+    u, v = _pairs(num_nodes, links)
+    if max_degree is not None:
+        u, v = _cap_degree(num_nodes, u, v, max_degree)
+    # each row lists its smaller neighbors (edges where it is the second node), then its larger ones
+    rank_u, rank_v = _edge_ranks(num_nodes, u, v)
+    as_second = np.bincount(v, minlength=num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(as_second + np.bincount(u, minlength=num_nodes), out=indptr[1:])
+    indices = np.empty(2 * len(u), dtype=np.int64)
+    indices[indptr[v] + rank_v] = u
+    indices[indptr[u] + rank_u] = v
+    return indptr, indices
@@ -0,0 +1,232 @@
+import numpy as np
+from Controllers.states import STATES
+from World.site_query import SiteQuery
+
+"""
+MetricsEngine computes a set of per-tick statistics straight from a simulation's arrays (AgentStore,
+SiteField), a few array operations per metric, and keeps only running aggregates of them (RunningStats),
+so nothing grows with the number of ticks. Call update(simulation) after every tick. Engines from several
+trials can be merged into one, e.g. to summarize a whole experiment.
+Each metric in METRICS is a function of the simulation that returns a number or a 1-D array; a metric
+that can't be computed for a tick (e.g. nearest-neighbor distance when no agent has a neighbor in range)
+returns nan, and nan entries are left out of the aggregates.
+"""
+
+HUNGER_PERCENTILES = (10, 50, 90) # the hunger percentiles hunger_percentiles() reports
+BRUTE_FORCE_AGENTS = 256 # with at most this many agents, nearest_neighbor_distance() checks every pair instead of using the grid
+
+"""
+Returns the mean hunger of every agent
+"""
+def hunger_mean(simulation):
+    return float(simulation.store.hunger.mean())
+
+"""
+Returns the HUNGER_PERCENTILES of the agents' hunger
+"""
+def hunger_percentiles(simulation):
+    hunger = np.sort(simulation.store.hunger)
+    if len(hunger) == 0:
+        return np.full(len(HUNGER_PERCENTILES), np.nan)
+    # np.percentile()'s linear interpolation, without its overhead
+    rank = np.asarray(HUNGER_PERCENTILES) / 100 * (len(hunger) - 1)
+    low = np.floor(rank).astype(np.int64)
+    high = np.minimum(low + 1, len(hunger) - 1)
+    return hunger[low] + (hunger[high] - hunger[low]) * (rank - low)
+
+"""
+Returns the number of agents in each state, indexed by state code (see STATES in states.py)
+"""
+def state_counts(simulation):
+    state = simulation.store.state
+    return np.bincount(state[state >= 0], minlength=len(STATES))
+
+"""
+Returns the number of agents at each site (within its radius), indexed by site id
+"""
+def site_occupancy(simulation):
+    field = simulation.site_field
+    return SiteQuery.at_mask(simulation.store.positions, field.positions, field.radii).sum(axis=0)
+
+"""
+Returns the resources left at each site, indexed by site id
+"""
+def site_resources(simulation):
+    return simulation.site_field.resources
+
+"""
+Returns each group's spread: the mean distance of its agents from the group's centroid, indexed by group
+number; nan for an empty group
+"""
+def group_cohesion(simulation):
+    store = simulation.store
+    members = store.group >= 0
+    group = store.group[members]
+    positions = store.positions[members]
+    counts = np.bincount(group, minlength=store.num_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroids = np.stack([np.bincount(group, positions[:, 0], store.num_groups),
+                              np.bincount(group, positions[:, 1], store.num_groups)], axis=1) / counts[:, None]
+        spread = np.linalg.norm(positions - centroids[group], axis=1)
+        return np.bincount(group, spread, store.num_groups) / counts
+
+"""
+Returns how aligned the agents' headings are: the length of their mean heading vector, from 0 (no common
+direction) to 1 (all facing the same way)
+"""
+def polarization(simulation):
+    theta = simulation.store.theta
+    if len(theta) == 0:
+        return np.nan
+    return float(np.hypot(np.cos(theta).mean(), np.sin(theta).mean()))
+
+"""
+Returns the mean distance from each agent to its nearest neighbor, over the agents that have a neighbor
+within AGENT_SENSING_RADIUS (farther agents aren't considered). A synchronous tick's neighbor lists
+(Simulation.neighbor_csr) are reused rather than searched again, so the neighbors are the ones sensed at
+the start of the tick, at their distances at the end of it.
+"""
+def nearest_neighbor_distance(simulation):
+    positions = simulation.store.positions
+    radius = simulation.cfg.AGENT_SENSING_RADIUS
+    if simulation.neighbor_csr is not None:
+        indptr, indices = simulation.neighbor_csr
+    elif len(positions) <= BRUTE_FORCE_AGENTS:
+        diff = positions[:, None, :] - positions[None, :, :]
+        dist = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+        np.fill_diagonal(dist, np.inf)
+        nearest = dist.min(axis=1) if len(positions) > 1 else np.zeros(0)
+        nearest = nearest[nearest < radius]
+        return float(nearest.mean()) if len(nearest) else np.nan
+    else:
+        indptr, indices = simulation.spatial_hash.neighbor_csr(positions, radius)
+    if len(indices) == 0:
+        return np.nan
+    counts = np.diff(indptr)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    dist = np.linalg.norm(positions[indices] - positions[rows], axis=1)
+    return float(np.minimum.reduceat(dist, indptr[:-1][counts > 0]).mean())
+
+# the registered metrics, by name; MetricsEngine computes all of them unless given a list of names
+METRICS = {"hunger_mean": hunger_mean,
+           "hunger_percentiles": hunger_percentiles,
+           "state_counts": state_counts,
+           "site_occupancy": site_occupancy,
+           "site_resources": site_resources,
+           "group_cohesion": group_cohesion,
+           "polarization": polarization,
+           "nearest_neighbor_distance": nearest_neighbor_distance}
+
+"""
+RunningStats keeps the count, mean, variance, min, and max of a stream of values (numbers or same-shaped
+arrays, aggregated entry by entry) without storing them, using Welford's update; merge() combines two
+streams exactly (Chan et al.'s parallel formula). nan entries are skipped.
+"""
+class RunningStats:
+    def __init__(self):
+        self.count = None # how many values each entry has seen
+        self.mean = None
+        self.m2 = None # the sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def _start(self, shape):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    """
+    Adds one value
+    """
+    def update(self, value):
+        value = np.asarray(value, dtype=float)
+        if self.count is None:
+            self._start(value.shape)
+        seen = ~np.isnan(value)
+        value = np.where(seen, value, 0.0)
+        self.count += seen
+        delta = value - self.mean
+        self.mean += np.where(seen, delta / np.maximum(self.count, 1), 0.0)
+        self.m2 += np.where(seen, delta * (value - self.mean), 0.0)
+        np.minimum(self.min, np.where(seen, value, np.inf), out=self.min)
+        np.maximum(self.max, np.where(seen, value, -np.inf), out=self.max)
+
+    """
+    Adds every value another RunningStats has seen
+    """
+    def merge(self, other):
+        if other.count is None:
+            return
+        if self.count is None:
+            self._start(other.count.shape)
+        count = self.count + other.count
+        total = np.maximum(count, 1)
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / total
+        self.m2 = self.m2 + other.m2 + delta**2 * self.count * other.count / total
+        self.count = count
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+
+    """
+    Returns the (population) standard deviation of the values seen
+    """
+    def std(self):
+        return np.sqrt(self.m2 / np.maximum(self.count, 1))
+
+    """
+    Returns count, mean, std, min, and max as plain numbers (or lists, for array values); nan where nothing was seen
+    """
+    def summary(self):
+        if self.count is None:
+            return {"count": 0}
+        seen = self.count > 0
+        def plain(array):
+            return np.where(seen, array, np.nan).tolist()
+        return {"count": self.count.tolist(), "mean": plain(self.mean), "std": plain(self.std()),
+                "min": plain(self.min), "max": plain(self.max)}
+
+class MetricsEngine:
+    def __init__(self, metrics=None):
+        self.names = list(metrics) if metrics is not None else list(METRICS) # the metrics to compute, by name (see METRICS)
+        unknown = set(self.names) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+        self.stats = {name: RunningStats() for name in self.names} # the running aggregate of each metric
+        self.last = {} # each metric's value at the last tick
+
+    """
+    Computes every metric for the simulation's current tick and adds it to the aggregates
+    """
+    def update(self, simulation):
+        for name in self.names:
+            value = np.array(METRICS[name](simulation), dtype=float)
+            self.last[name] = value
+            self.stats[name].update(value)
+
+    """
+    Adds the aggregates of another engine (e.g. another trial's) to this one's
+    """
+    def merge(self, other):
+        for name, stats in other.stats.items():
+            self.stats.setdefault(name, RunningStats()).merge(stats)
+            if name not in self.names:
+                self.names.append(name)
+
+    """
+    Returns one engine with the aggregates of every engine given
+    """
+    @staticmethod
+    def merged(engines):
+        total = MetricsEngine([])
+        for engine in engines:
+            total.merge(engine)
+        return total
+
+    """
+    Returns each metric's aggregates as plain numbers and lists (see RunningStats.summary()), e.g. for json.dump()
+    """
+    def summary(self):
+        return {name: self.stats[name].summary() for name in self.names}
@@ -0,0 +1,554 @@
+import json
+import time
+import numpy as np
+from Controllers.states import STATES
+from Controllers.bt_compiler import CompiledBT, STATUS_CODES
+from Controllers.bt_vectorized import VectorizedBT
+from World.simulation import BT_Simulation
+
+"""
+TickProfiler times the phases of Simulation.update() and counts what they do. enable(simulation) wraps
+the simulation's phase methods (and each agent's decision and movement methods) with timers, and
+disable(simulation) takes the wrappers off again, so a simulation that isn't being profiled runs exactly
+the code it always does. Profiling can be turned on and off between ticks. enable() returns the profiler,
+which can be used in a with block to disable it again at the end, even if a tick raises.
+Each phase's time is kept both in total and as self time, which leaves out the phases called inside it
+(e.g. "decide" leaves out "movement"); the self times of every phase and of "tick" add up to the time of
+the whole ticks. Phases that the vectorized modes run as array operations (USE_VECTORIZED_FSM,
+USE_VECTORIZED_BT) are timed as part of "update_agents".
+The counters are:
+- distance_checks: agent-agent, agent-site, and agent-predator distances computed
+- transitions: agents whose state changed, also kept per tick
+- the neighbor histogram: how many times an agent had each number of neighbors
+report() returns everything as a dict, to_json() as JSON, and table() as a text table.
+"""
+
+# the simulation methods that are timed, and the name of each one's phase
+PHASES = {"query_sites": "site_query",
+          "sense_predators": "predator_sensing",
+          "update_agents": "update_agents",
+          "sense_all": "snapshot_and_sense",
+          "get_neighbor_ids": "neighbors",
+          "get_sites": "sites",
+          "get_predators": "predators",
+          "handle_boundaries": "boundaries",
+          "update_predators": "predator_update",
+          "update_sites": "site_update"}
+MOVEMENT = ("move", "repulse_move", "random_walk") # the agent methods timed as "movement"
+
+class TickProfiler:
+    def __init__(self):
+        self.timers = {} # phase name -> [total seconds, self seconds, calls]
+        self.counters = {"distance_checks": 0, "transitions": 0}
+        self.neighbor_histogram = np.zeros(0, dtype=np.int64) # entry k: how many times an agent had k neighbors
+        self.transitions_per_tick = [] # how many agents changed state in each tick
+        self.ticks = 0
+        self._stack = [] # the time spent in the phases called inside each running phase
+        self._tick = None # the tick's state before it started: (start time, state codes, spatial hash distance checks)
+        self._simulation = None # the simulation being profiled
+
+    ### SWITCHING ON AND OFF ###
+
+    """
+    Starts profiling the simulation's ticks
+    """
+    def enable(self, simulation):
+        if simulation.profiler is not None: # don't wrap the methods twice
+            simulation.profiler.disable(simulation)
+        for method, phase in PHASES.items():
+            setattr(simulation, method, self._timed(phase, getattr(simulation, method), getattr(self, "_count_" + method, None), simulation))
+        for agent in simulation.agents:
+            agent.update = self._timed("decide", agent.update)
+            for method in MOVEMENT:
+                setattr(agent, method, self._timed("movement", getattr(agent, method)))
+            if agent.bt is not None:
+                agent.bt.tick = self._timed("decide", agent.bt.tick)
+        simulation.profiler = self
+        self._simulation = simulation
+        return self
+
+    """
+    Stops profiling the simulation's ticks; what has been recorded is kept
+    """
+    def disable(self, simulation):
+        for method in PHASES:
+            vars(simulation).pop(method, None)
+        for agent in simulation.agents:
+            for method in ("update", *MOVEMENT):
+                vars(agent).pop(method, None)
+            if agent.bt is not None:
+                vars(agent.bt).pop("tick", None)
+        simulation.profiler = None
+        self._simulation = None
+        self._stack.clear() # in case a tick was cut short
+        self._tick = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._simulation is not None:
+            self.disable(self._simulation)
+
+    """
+    Forgets everything recorded so far; an enabled profiler stays enabled
+    """
+    def reset(self):
+        for totals in self.timers.values(): # cleared in place, since the wrappers hold them
+            totals[:] = [0.0, 0.0, 0]
+        self.counters = {"distance_checks": 0, "transitions": 0}
+        self.neighbor_histogram = np.zeros(0, dtype=np.int64)
+        self.transitions_per_tick = []
+        self.ticks = 0
+
+    ### RECORDING ###
+
+    """
+    Returns function wrapped with a timer for phase; count(simulation, args, result) is called after each call
+    """
+    def _timed(self, phase, function, count=None, simulation=None):
+        totals = self.timers.setdefault(phase, [0.0, 0.0, 0])
+        stack = self._stack
+        def timed(*args, **kwargs):
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = stack.pop()
+                totals[0] += elapsed
+                totals[1] += elapsed - inner
+                totals[2] += 1
+                if stack:
+                    stack[-1] += elapsed
+            if count is not None:
+                count(simulation, args, result)
+            return result
+        return timed
+
+    """
+    Called by Simulation.update() before the tick
+    """
+    def start_tick(self, simulation):
+        self._stack.append(0.0)
+        self._tick = (time.perf_counter(), simulation.store.state.copy(), simulation.spatial_hash.distance_checks)
+
+    """
+    Called by Simulation.update() after the tick
+    """
+    def end_tick(self, simulation):
+        start, state, distance_checks = self._tick
+        elapsed = time.perf_counter() - start
+        inner = self._stack.pop()
+        totals = self.timers.setdefault("tick", [0.0, 0.0, 0])
+        totals[0] += elapsed
+        totals[1] += elapsed - inner
+        totals[2] += 1
+        transitions = int((simulation.store.state != state).sum())
+        self.counters["transitions"] += transitions
+        self.transitions_per_tick.append(transitions)
+        self.counters["distance_checks"] += simulation.spatial_hash.distance_checks - distance_checks
+        if simulation.neighbor_csr is not None: # neighbor lists built for the whole tick
+            self._count_neighbors(np.diff(simulation.neighbor_csr[0]))
+        self.ticks += 1
+        self._tick = None
+
+    def _count_neighbors(self, sizes):
+        counts = np.bincount(sizes)
+        if len(counts) > len(self.neighbor_histogram):
+            self.neighbor_histogram = np.concatenate([self.neighbor_histogram, np.zeros(len(counts) - len(self.neighbor_histogram), dtype=np.int64)])
+        self.neighbor_histogram[:len(counts)] += counts
+
+    # counters for the phases that measure distances themselves
+
+    def _count_query_sites(self, simulation, args, site_query):
+        if site_query is not None:
+            self.counters["distance_checks"] += site_query.at.size
+
+    def _count_get_neighbor_ids(self, simulation, args, result):
+        if simulation.neighbor_csr is not None: # the tick's neighbor lists are counted in end_tick()
+            return
+        agent = args[0]
+        self.counters["distance_checks"] += len(simulation.get_candidate_ids(agent)) - 1
+        neighbors = result[0] if isinstance(result, tuple) else result
+        self._count_neighbors(np.array([len(neighbors)]))
+
+    def _count_get_sites(self, simulation, args, result):
+        site_query = simulation.site_query
+        if site_query is None or not site_query.matches(args[0].id, args[0].pos):
+            self.counters["distance_checks"] += len(simulation.sites)
+
+    def _count_get_predators(self, simulation, args, result):
+        if simulation.predator_sensing is None:
+            self.counters["distance_checks"] += len(simulation.predators)
+
+    ### REPORTS ###
+
+    """
+    Returns everything recorded as a dict of plain numbers and lists. Times are in milliseconds.
+    """
+    def report(self):
+        tick_time = self.timers.get("tick", [0.0, 0.0, 0])[0]
+        phases = {}
+        for phase, (total, own, calls) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            if calls == 0: # a phase this mode doesn't run
+                continue
+            phases[phase] = {"calls": calls, "total_ms": total * 1e3, "self_ms": own * 1e3,
+                             "self_ms_per_tick": own * 1e3 / max(self.ticks, 1),
+                             "self_share": own / tick_time if tick_time > 0 else 0.0}
+        return {"ticks": self.ticks, "phases": phases, "counters": dict(self.counters),
+                "neighbor_histogram": self.neighbor_histogram.tolist(), "transitions_per_tick": list(self.transitions_per_tick)}
+
+    """
+    Returns report() as JSON, and writes it to path if given
+    """
+    def to_json(self, path=None, indent=2):
+        text = json.dumps(self.report(), indent=indent)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+    """
+    Returns report() as a text table, phases with the most self time first
+    """
+    def table(self):
+        report = self.report()
+        lines = [f"{report['ticks']} ticks",
+                 f"{'phase':<20}{'calls':>10}{'total ms':>12}{'self ms':>12}{'ms/tick':>10}{'share':>8}"]
+        for phase, row in report["phases"].items():
+            lines.append(f"{phase:<20}{row['calls']:>10}{row['total_ms']:>12.2f}{row['self_ms']:>12.2f}"
+                         f"{row['self_ms_per_tick']:>10.3f}{row['self_share']:>8.1%}")
+        ticks = max(report["ticks"], 1)
+        lines.append("")
+        for name, value in report["counters"].items():
+            lines.append(f"{name:<20}{value:>12} ({value / ticks:.1f} per tick)")
+        histogram = self.neighbor_histogram
+        if histogram.sum() > 0:
+            sizes = np.arange(len(histogram))
+            mean = (sizes * histogram).sum() / histogram.sum()
+            lines.append(f"{'neighbors':<20}mean {mean:.2f}, max {len(histogram) - 1}, histogram {histogram.tolist()}")
+        return "\n".join(lines)
+
+"""
+BehaviorProfiler accounts for the time spent in each behavior tree node or FSM state. While enabled, it
+records for every node how many times it was ticked, how many of those ticks ended in SUCCESS, FAILURE, or
+RUNNING, and its total time and self time (its time less its children's). It works with every way of ticking
+the trees: py_trees trees, CompiledBT, and VectorizedBT, where a tick of a node for n agents at once counts
+as n ticks. Nodes are named by their path from the root, e.g. "Root;Flock Root;Query".
+For FSM agents, each state's update() and move() are recorded as the nodes "STATE;update" and "STATE;move",
+under a node "STATE" that adds up the two; update() is called once per agent tick, so its ticks are the
+state's. The states are shared by every simulation (see STATES in states.py), so they aren't wrapped:
+Agent.update() hands them to the simulation's behavior_profiler instead, which leaves other simulations
+alone. The BT wrappers are set on the simulation's own trees. Like TickProfiler, enable() returns the
+profiler, which can be used in a with block to disable it again at the end.
+The vectorized FSM (USE_VECTORIZED_FSM) doesn't call the states, so only the transition matrix is recorded
+for it: transitions[a, b] is how many times an agent started a tick in state a and ended it in state b
+(the diagonal holds the ticks that stayed in their state).
+folded() returns the flame-style summary as folded stacks, which flame graph tools read, and table() as an
+indented tree.
+"""
+class BehaviorProfiler:
+    def __init__(self):
+        self.nodes = {} # node path -> [ticks, total seconds, self seconds, INVALID, RUNNING, SUCCESS, FAILURE counts]
+        self.transitions = np.zeros((len(STATES), len(STATES)), dtype=np.int64) # agent ticks from each state (row) to each state (column)
+        self.ticks = 0
+        self.fsm = False # whether the profiled simulation's agents use the FSM states
+        self._stack = [] # the time spent in the nodes called inside each running node
+        self._state = None # every agent's state code at the start of the tick
+        self._state_records = {} # state name -> the records of (the state, its update(), its move())
+        self._simulation = None # the simulation being profiled
+
+    ### SWITCHING ON AND OFF ###
+
+    """
+    Starts recording the simulation's behavior tree nodes or FSM states
+    """
+    def enable(self, simulation):
+        if self._simulation is not None: # one simulation at a time
+            self.disable(self._simulation)
+        self.fsm = not isinstance(simulation, BT_Simulation)
+        if self.fsm:
+            if simulation.behavior_profiler is not None:
+                simulation.behavior_profiler.disable(simulation)
+            for state in STATES:
+                self._state_records[state.name] = (self._record(state.name), self._record(state.name + ";update"),
+                                                   self._record(state.name + ";move"))
+            simulation.behavior_profiler = self
+            return self._start(simulation)
+        if simulation.use_vectorized_bt:
+            if simulation.vectorized_bt is None:
+                simulation.vectorized_bt = VectorizedBT(simulation.bt_program, simulation.bt_store)
+            vectorized = simulation.vectorized_bt
+            vectorized._tick = self._timed_batch(self._program_paths(vectorized.program), vectorized._tick)
+        paths = {} # program id -> its node paths; the agents usually share one program
+        for agent in simulation.agents:
+            if isinstance(agent.bt, CompiledBT):
+                program = agent.bt.program
+                if id(program) not in paths:
+                    paths[id(program)] = self._program_paths(program)
+                agent.bt._tick = self._timed_node(paths[id(program)], agent.bt._tick)
+            else:
+                for node, path in _tree_paths(agent.bt.root):
+                    node.tick = self._timed_generator(path, node, node.tick)
+        return self._start(simulation)
+
+    def _start(self, simulation):
+        self._state = simulation.store.state.copy()
+        simulation.recorders.append(self)
+        self._simulation = simulation
+        return self
+
+    """
+    Stops recording; what has been recorded is kept
+    """
+    def disable(self, simulation):
+        if self.fsm:
+            if simulation.behavior_profiler is self:
+                simulation.behavior_profiler = None
+        else:
+            if simulation.vectorized_bt is not None:
+                vars(simulation.vectorized_bt).pop("_tick", None)
+            for agent in simulation.agents:
+                if isinstance(agent.bt, CompiledBT):
+                    vars(agent.bt).pop("_tick", None)
+                else:
+                    for node, path in _tree_paths(agent.bt.root):
+                        vars(node).pop("tick", None)
+        if self in simulation.recorders:
+            simulation.recorders.remove(self)
+        self._simulation = None
+        self._stack.clear() # in case a tick was cut short
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._simulation is not None:
+            self.disable(self._simulation)
+
+    """
+    Forgets everything recorded so far; an enabled profiler stays enabled
+    """
+    def reset(self):
+        for record in self.nodes.values(): # cleared in place, since the wrappers hold them
+            record[:] = [0, 0.0, 0.0, 0, 0, 0, 0]
+        self.transitions[:] = 0
+        self.ticks = 0
+
+    ### RECORDING ###
+
+    def _record(self, path):
+        return self.nodes.setdefault(path, [0, 0.0, 0.0, 0, 0, 0, 0])
+
+    """
+    Returns the path of every node of a BTProgram, by index
+    """
+    def _program_paths(self, program):
+        paths = [program.names[0]] + [None] * (program.num_nodes - 1)
+        for n in range(program.num_nodes): # preorder: every parent comes before its children
+            for child in program.children[n]:
+                paths[child] = paths[n] + ";" + program.names[child]
+        return paths
+
+    """
+    Returns a CompiledBT's _tick() that records node n's tick and the status it returns
+    """
+    def _timed_node(self, paths, tick):
+        records = [self._record(path) for path in paths]
+        stack = self._stack
+        def timed(n):
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                status = tick(n)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+            record = records[n]
+            record[0] += 1
+            record[1] += elapsed
+            record[2] += elapsed - inner
+            record[3 + status] += 1
+            return status
+        return timed
+
+    """
+    Returns a VectorizedBT's _tick() that records node n's tick for every agent in ids and the statuses it returns
+    """
+    def _timed_batch(self, paths, tick):
+        records = [self._record(path) for path in paths]
+        stack = self._stack
+        def timed(n, ids):
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                statuses = tick(n, ids)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+            if len(ids) > 0:
+                record = records[n]
+                record[0] += len(ids)
+                record[1] += elapsed
+                record[2] += elapsed - inner
+                for code, count in enumerate(np.bincount(statuses, minlength=4).tolist()):
+                    record[3 + code] += count
+            return statuses
+        return timed
+
+    """
+    Returns a py_trees node's tick() generator that records the node's tick and its status. Only the time
+    spent inside the node's own generator counts, not the time its parents spend between its yields; the
+    tick ends when the node yields itself, since its parent may stop iterating there.
+    """
+    def _timed_generator(self, path, node, tick):
+        record = self._record(path)
+        stack = self._stack
+        def timed():
+            ticks = tick()
+            total = own = 0.0
+            while True:
+                stack.append(0.0)
+                start = time.perf_counter()
+                try:
+                    yielded = next(ticks, None)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    inner = stack.pop()
+                    if stack:
+                        stack[-1] += elapsed
+                total += elapsed
+                own += elapsed - inner
+                if yielded is None:
+                    return
+                if yielded is node:
+                    record[0] += 1
+                    record[1] += total
+                    record[2] += own
+                    record[3 + STATUS_CODES[node.status]] += 1
+                    total = own = 0.0
+                yield yielded
+        return timed
+
+    """
+    Called by Agent.update() instead of running the agent's state itself: runs the state's update() and
+    move() the same way, recording each one's time
+    """
+    def update_agent(self, agent, neighbors, sites, predators):
+        state = agent.state
+        self._timed_state(state, True, state.update, agent, neighbors, sites, predators)
+        state = agent.state # the state may have changed in update()
+        self._timed_state(state, False, state.move, agent, neighbors, predators)
+
+    """
+    Calls a state's update() (update=True) or move() and records it under "name;update" or "name;move",
+    adding its time to the state's node, name
+    """
+    def _timed_state(self, state, update, method, agent, *args):
+        state_record, update_record, move_record = self._state_records[state.name]
+        record = update_record if update else move_record
+        stack = self._stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            method(agent, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record[0] += 1
+            record[1] += elapsed
+            record[2] += elapsed - inner
+            state_record[0] += update
+            state_record[1] += elapsed
+
+    """
+    Called by Simulation.update() at the end of every tick; counts the tick's state transitions
+    """
+    def record(self, simulation):
+        state = simulation.store.state
+        counted = (self._state >= 0) & (state >= 0)
+        self.transitions += np.bincount(self._state[counted] * len(STATES) + state[counted],
+                                        minlength=len(STATES) ** 2).reshape(len(STATES), len(STATES))
+        self._state = state.copy()
+        self.ticks += 1
+
+    ### REPORTS ###
+
+    """
+    Returns everything recorded as a dict of plain numbers and lists, with the nodes in the order they were
+    first recorded (a tree's preorder). Times are in milliseconds.
+    """
+    def report(self):
+        nodes = {}
+        for path, (ticks, total, own, invalid, running, success, failure) in self.nodes.items():
+            if ticks == 0:
+                continue
+            nodes[path] = {"ticks": ticks, "success": success, "failure": failure, "running": running,
+                           "total_ms": total * 1e3, "self_ms": own * 1e3}
+        report = {"ticks": self.ticks, "nodes": nodes}
+        if self.fsm:
+            report["states"] = [state.name for state in STATES]
+            report["transitions"] = self.transitions.tolist()
+        return report
+
+    """
+    Returns report() as JSON, and writes it to path if given
+    """
+    def to_json(self, path=None, indent=2):
+        text = json.dumps(self.report(), indent=indent)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+    """
+    Returns the flame-style summary as folded stacks: one line per node, its path and its self time in
+    microseconds, e.g. "Root;Flock Root;Query 1520". Flame graph tools (flamegraph.pl, speedscope) draw these.
+    """
+    def folded(self):
+        return "\n".join(f"{path} {round(own * 1e6)}" for path, (ticks, total, own, *counts) in self.nodes.items() if ticks > 0)
+
+    """
+    Returns report() as a text table: the nodes as an indented tree with each one's ticks, status counts,
+    times, and share of the total time, followed by the transition matrix for FSM runs
+    """
+    def table(self):
+        report = self.report()
+        nodes = report["nodes"]
+        roots = [path for path in nodes if ";" not in path]
+        total_time = sum(nodes[path]["total_ms"] for path in roots)
+        lines = [f"{report['ticks']} ticks",
+                 f"{'node':<36}{'ticks':>9}{'success':>9}{'failure':>9}{'running':>9}{'total ms':>11}{'self ms':>11}{'share':>8}"]
+        for path, row in nodes.items():
+            depth = path.count(";")
+            name = "  " * depth + path.rsplit(";", 1)[-1]
+            share = row["total_ms"] / total_time if total_time > 0 else 0.0
+            lines.append(f"{name:<36}{row['ticks']:>9}{row['success']:>9}{row['failure']:>9}{row['running']:>9}"
+                         f"{row['total_ms']:>11.2f}{row['self_ms']:>11.2f}{share:>8.1%}")
+        if self.fsm:
+            names = report["states"]
+            used = [code for code in range(len(names)) if self.transitions[code].any() or self.transitions[:, code].any()]
+            width = max([len(names[code]) for code in used] + [4]) + 2
+            lines.append("")
+            lines.append("transitions (rows: from, columns: to)")
+            lines.append(" " * width + "".join(f"{names[code]:>{width}}" for code in used))
+            for code in used:
+                lines.append(f"{names[code]:<{width}}" + "".join(f"{self.transitions[code, to]:>{width}}" for to in used))
+        return "\n".join(lines)
+
+"""
+Yields every node of a py_trees tree with its path, in preorder
+"""
+def _tree_paths(node, prefix=""):
+    path = prefix + node.name
+    yield node, path
+    for child in node.children:
+        yield from _tree_paths(child, path + ";")
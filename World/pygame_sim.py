@@ -37,7 +37,7 @@ class PygameSim(Simulation):
         neighbors = agent_rect.collidelistall(self.agent_sprites.sprites())
         group_neighbors = []
         for neighbor in neighbors:
-            if np.array_equal(self.get_agent_group_id(neighbor), self.get_agent_group_id(agent.id)):
+            if self.get_agent_group(neighbor) == self.get_agent_group(agent.id):
                     group_neighbors.append(neighbor)
         return neighbors, group_neighbors
     
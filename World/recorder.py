@@ -0,0 +1,134 @@
+import os
+import numpy as np
+
+"""
+TrajectoryRecorder streams a simulation's per-tick state to disk as columns: agent positions, headings,
+hunger, state codes, followed agents, and site resources, plus the tick number. Attach it with
+attach(simulation); Simulation.update() then calls record() at the end of every tick, and every stride-th
+tick is copied into preallocated buffers of chunk_size samples. A full buffer is written out and reused, so
+memory use doesn't grow with the length of the run. Call close() when the run is done to write the rest.
+By default each column goes to its own .npy file in directory, which grows a chunk at a time and can be
+opened memory-mapped; with compress=True, each chunk is saved as one compressed .npz file instead.
+load_trajectory() reads either back.
+"""
+
+# the recorded columns: name -> (function returning the values of one tick, dtype on disk)
+COLUMNS = {"positions": (lambda sim: sim.store.positions, np.float64),
+           "theta": (lambda sim: sim.store.theta, np.float64),
+           "hunger": (lambda sim: sim.store.hunger, np.int64),
+           "state": (lambda sim: sim.store.state, np.int8),
+           "following": (lambda sim: sim.store.following, np.int32),
+           "site_resources": (lambda sim: sim.site_field.resources, np.int64)}
+
+HEADER_SIZE = 128 # bytes kept for each .npy header, so the header can be rewritten in place as the file grows
+
+"""
+Writes an .npy (version 1.0) header padded to HEADER_SIZE bytes
+"""
+def _write_header(file, dtype, shape):
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": tuple(shape)})
+    prefix = np.lib.format.magic(1, 0)
+    length = HEADER_SIZE - len(prefix) - 2
+    file.seek(0)
+    file.write(prefix + length.to_bytes(2, "little") + header.ljust(length - 1).encode("latin1") + b"\n")
+
+class TrajectoryRecorder:
+    def __init__(self, directory, stride=1, chunk_size=256, compress=False):
+        self.directory = directory
+        self.stride = stride # record every stride-th tick
+        self.chunk_size = chunk_size # how many samples are buffered before they are written out
+        self.compress = compress # write compressed .npz chunks instead of growing .npy files
+        self.ticks = 0 # how many ticks the recorder has seen
+        self.num_samples = 0 # how many samples have been written out
+        self.num_chunks = 0
+        self.buffers = None # column name -> (chunk_size, ...) array; allocated on the first recorded tick
+        self.filled = 0 # how many rows of the buffers hold samples that haven't been written out
+        self.files = {} # column name -> open .npy file, if not compressing
+        os.makedirs(directory, exist_ok=True)
+
+    """
+    Makes the simulation call record() at the end of every tick
+    """
+    def attach(self, simulation):
+        simulation.recorders.append(self)
+        return self
+
+    """
+    Stops the simulation from calling record()
+    """
+    def detach(self, simulation):
+        simulation.recorders.remove(self)
+
+    """
+    Called by Simulation.update() at the end of every tick; copies the tick's columns into the buffers on
+    every stride-th tick
+    """
+    def record(self, simulation):
+        tick = self.ticks
+        self.ticks += 1
+        if tick % self.stride != 0:
+            return
+        if self.buffers is None:
+            self.buffers = {"tick": np.zeros(self.chunk_size, dtype=np.int64)}
+            for name, (values, dtype) in COLUMNS.items():
+                self.buffers[name] = np.zeros((self.chunk_size, *np.shape(values(simulation))), dtype=dtype)
+        row = self.filled
+        self.buffers["tick"][row] = tick
+        for name, (values, dtype) in COLUMNS.items():
+            self.buffers[name][row] = values(simulation)
+        self.filled += 1
+        if self.filled == self.chunk_size:
+            self.flush()
+
+    """
+    Writes the buffered samples out
+    """
+    def flush(self):
+        if self.filled == 0:
+            return
+        n = self.filled
+        if self.compress:
+            np.savez_compressed(os.path.join(self.directory, f"chunk_{self.num_chunks:05d}.npz"),
+                                **{name: buffer[:n] for name, buffer in self.buffers.items()})
+        else:
+            for name, buffer in self.buffers.items():
+                file = self.files.get(name)
+                if file is None:
+                    file = self.files[name] = open(os.path.join(self.directory, name + ".npy"), "w+b")
+                file.seek(HEADER_SIZE + self.num_samples * buffer[0].nbytes)
+                file.write(buffer[:n].tobytes())
+                _write_header(file, buffer.dtype, (self.num_samples + n, *buffer.shape[1:]))
+                file.flush()
+        self.num_samples += n
+        self.num_chunks += 1
+        self.filled = 0
+
+    """
+    Writes the rest of the samples out and closes the files
+    """
+    def close(self):
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+"""
+Reads a trajectory written by TrajectoryRecorder into a dict of arrays, one row per recorded tick.
+Uncompressed columns are memory-mapped (read-only) unless mmap is False.
+"""
+def load_trajectory(directory, mmap=True):
+    chunks = sorted(name for name in os.listdir(directory) if name.startswith("chunk_") and name.endswith(".npz"))
+    if chunks:
+        parts = []
+        for name in chunks:
+            with np.load(os.path.join(directory, name)) as data:
+                parts.append(dict(data))
+        return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+    return {column: np.load(os.path.join(directory, column + ".npy"), mmap_mode="r" if mmap else None)
+            for column in ("tick", *COLUMNS) if os.path.exists(os.path.join(directory, column + ".npy"))}
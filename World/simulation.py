@@ -1,11 +1,23 @@
 from Model.agent import Agent
+from Model.agent_store import AgentStore
 from Model.feeding_site import Site
+from Model.site_field import SiteField
 from Model.predator import Predator
+from Model.predator_store import PredatorStore
+from Model.movement import BoidMoves, LaplacianMoves
 from World.config import *
+from World.spatial_hash import SpatialHash
+from World.site_query import SiteQuery
+from World.generation import draw_agents, draw_sites, draw_predators, random_network_csr
+from World.ensemble import FSMEnsemble
+from Controllers.network_fsm import NETWORK_STATES, NumpyDraws, network_step, clamp_to_world
 from Controllers.bt_construction import build_bt, build_ppa_bt
+from Controllers.bt_compiler import BTProgram, BTStore, CompiledBT, save_tree_state, load_tree_state
+from Controllers.bt_vectorized import BTBatch, VectorizedBT
 
 import numpy as np
 import math
+import ast
 
 """
 Simulation() is the base simulation class, and it manages the simulation by retrieving
@@ -15,139 +27,283 @@ If information about an agent that is not the agent's self is needed, call
 agent.sim.get_agent_x() (x being the info you need).
 """
 class Simulation:
-    def __init__(self):
+    def __init__(self, cfg=None):
+        self.cfg = cfg if cfg is not None else SimConfig() # The settings of this simulation; defaults to the constants in config.py
         self.avg_hunger = 0 # Measures the mean hunger of all the agents at any given point
-        self.prev_state = dict() # Keeps track of agent information prior to the current' iteration's update; key: agent_id, value: [pos, speed, heading]
+        self.store = AgentStore(self.cfg.NUM_AGENTS, self.cfg.NUM_GROUPS, self.cfg.MAX_SITE_MEMORY) # Array-backed agent data; agents are views into its rows, and its prev_* arrays keep track of agent information prior to the current iteration's update
+        self.use_batched_move = self.cfg.USE_BATCHED_MOVE # toggles computing every agent's movement in one vectorized pass per tick; can be changed between ticks
+        self.sync_update = self.cfg.SYNC_UPDATE # toggles synchronous ticks, where every agent reads the world as it was at the start of the tick; can be changed between ticks
+        self.neighbor_csr = None # (indptr, indices) neighbor lists of every agent for the current tick; only built in synchronous ticks
+        self.boid_moves = None # this tick's precomputed Agent.move() results; only computed when moves are batched
+        self.laplacian_moves = None # this tick's precomputed Agent.repulse_move() terms; only computed when moves are batched
+        self.use_site_query = self.cfg.USE_SITE_QUERY # toggles computing every agent-site distance once per tick instead of per query; can be changed between ticks
+        self.site_query = None # this tick's agent-site visibility and at-site masks
+        self.predator_sensing = None # (agent positions, indptr, indices): the predators each agent could see at the start of this tick
+        self.bt_program = None # the compiled behavior tree every agent shares, if USE_COMPILED_BT
+        self.bt_store = None # every agent's behavior tree runtime state (node statuses, current children, Repeat counts), one row per agent
+        self.recorders = [] # objects whose record(simulation) is called at the end of every tick, like TrajectoryRecorder (see recorder.py)
+        self.profiler = None # the TickProfiler timing this simulation's ticks, if profiling is on (see profiler.py)
+        self.behavior_profiler = None # the BehaviorProfiler timing this simulation's FSM states, if it is on (see profiler.py)
         self.agent_colors = [] # Tracks the agents' group's color for use for the display; assumes self.agents and self.agent_colors refer to the same agent at the same index
         self.agents = self.build_agents() # A list of the agents in the simulation
+        self.site_field = SiteField(self.cfg.NUM_SITES) # Array-backed site data; sites are views into its rows
         self.sites = self.build_sites() # A list of the sites in the simulation
+        self.store.set_sites(self.sites)
+        self.predator_store = PredatorStore(self.cfg.NUM_PREDS, self.cfg) # Array-backed predator data; predators are views into its rows
         self.predators = self.build_predators() # A list of the predators in the simulation
-        self.avg_hunger = float(self.avg_hunger / NUM_AGENTS)
+        self.avg_hunger = float(self.avg_hunger / self.cfg.NUM_AGENTS)
+        self.use_spatial_hash = self.cfg.USE_SPATIAL_HASH # toggles between grid-based neighbor sensing and the brute-force scan; can be changed between ticks
+        self.spatial_hash = SpatialHash(self.cfg.AGENT_SENSING_RADIUS) # cell list over agent positions, rebuilt every tick in update()
+        self.spatial_hash.rebuild([agent.pos for agent in self.agents])
 
     def build_agents(self):
+        if self.cfg.USE_BULK_BUILD:
+            return self.build_agents_bulk()
         agents = []
-        group_sizes = np.zeros(NUM_GROUPS)
-        for i in range(NUM_AGENTS): # TODO: generate agent colors based on group so as to not rely on hardcoding
-            # generate group_id
-            group_num = np.random.choice(list(range(NUM_GROUPS)))
-            if group_sizes[group_num] > MAX_NETWORK_SIZE:
-                group_num = np.random.choice(list(range(NUM_GROUPS)))
-            group_id = np.zeros(NUM_GROUPS)
-            group_id[group_num] = 1
+        group_sizes = np.zeros(self.cfg.NUM_GROUPS)
+        for i in range(self.cfg.NUM_AGENTS): # TODO: generate agent colors based on group so as to not rely on hardcoding
+            # generate group number
+            group_num = np.random.choice(list(range(self.cfg.NUM_GROUPS)))
+            if group_sizes[group_num] > self.cfg.MAX_NETWORK_SIZE:
+                group_num = np.random.choice(list(range(self.cfg.NUM_GROUPS)))
             group_sizes[group_num] += 1
 
-            self.agent_colors.append(COLORS.get(group_num))
+            self.agent_colors.append(self.cfg.COLORS.get(group_num))
 
-            pos = np.array([np.random.uniform(0, WORLD_SIZE), np.random.uniform(0, WORLD_SIZE)])
-            speed = np.random.uniform(1.0, MAX_SPEED)
+            pos = np.array([np.random.uniform(0, self.cfg.WORLD_SIZE), np.random.uniform(0, self.cfg.WORLD_SIZE)])
+            speed = np.random.uniform(1.0, self.cfg.MAX_SPEED)
             theta = np.random.uniform(-np.pi, np.pi)
-            hunger = np.random.randint(MAX_HUNGER/2, MAX_HUNGER)
+            hunger = np.random.randint(self.cfg.MAX_HUNGER/2, self.cfg.MAX_HUNGER)
             attraction = np.random.uniform(0.25, 1.0)
             repulsion = np.random.uniform(0.25, 1.0)
 
-            agents.append(Agent(i, pos, speed, theta, hunger, self, attr_factor=attraction, repulse_factor=repulsion, network=[], group_id=group_id))
+            agents.append(Agent(i, pos, speed, theta, hunger, self, attr_factor=attraction, repulse_factor=repulsion, network=[], group=group_num))
             
             # Behavior Tree
-            agents[i].bt = build_bt(agents[i])
+            if not self.cfg.USE_COMPILED_BT:
+                agents[i].bt = build_bt(agents[i])
 
             # simulation book-keeping
-            self.prev_state.update({i: [pos, speed, np.array([np.cos(theta), np.sin(theta)])]})
+            self.store.snapshot(i)
             self.avg_hunger += hunger
+        if self.cfg.USE_COMPILED_BT and agents:
+            self.build_bts(agents)
         return agents
 
+    """
+    build_agents() with every attribute drawn at once (see generation.py)
+    """
+    def build_agents_bulk(self):
+        draws = draw_agents(np.random, self.cfg.NUM_AGENTS, self.cfg)
+        groups = draws["group"].tolist()
+        self.agent_colors = [self.cfg.COLORS.get(group_num) for group_num in groups]
+        speed, theta, hunger = draws["speed"].tolist(), draws["theta"].tolist(), draws["hunger"].tolist()
+        attraction, repulsion = draws["attraction"].tolist(), draws["repulsion"].tolist()
+        agents = [Agent(i, draws["positions"][i], speed[i], theta[i], hunger[i], self, attr_factor=attraction[i],
+                        repulse_factor=repulsion[i], network=[], group=groups[i]) for i in range(self.cfg.NUM_AGENTS)]
+        if self.cfg.USE_COMPILED_BT:
+            if agents:
+                self.build_bts(agents)
+        else:
+            for agent in agents:
+                agent.bt = build_bt(agent)
+        self.store.snapshot_all()
+        self.avg_hunger += sum(hunger)
+        return agents
+
+    """
+    Gives every agent a view into one shared compiled behavior tree: the tree is built and compiled once,
+    and each agent's part of it is a row of self.bt_store (see bt_compiler.py)
+    """
+    def build_bts(self, agents):
+        self.bt_program = BTProgram(build_bt(agents[0]).root)
+        self.bt_store = BTStore(self.bt_program, len(agents))
+        for agent in agents:
+            agent.bt = CompiledBT(self.bt_program, self.bt_store, agent.id, agent)
+
     def build_sites(self):
+        if self.cfg.USE_BULK_BUILD:
+            positions, radii = draw_sites(np.random, self.cfg.NUM_SITES, self.cfg)
+            return [Site(positions[i], radius, self.cfg.SITE_REGEN_TIME, self.cfg.SITE_MAX_RESOURCE, id=i, field=self.site_field)
+                    for i, radius in enumerate(radii.tolist())]
         sites = []
-        for i in range(NUM_SITES):
-            pos = np.array([np.random.uniform(0, WORLD_SIZE), np.random.uniform(0, WORLD_SIZE)])
-            radius = np.random.randint(1, SITE_MAX_RADIUS)
+        for i in range(self.cfg.NUM_SITES):
+            pos = np.array([np.random.uniform(0, self.cfg.WORLD_SIZE), np.random.uniform(0, self.cfg.WORLD_SIZE)])
+            radius = np.random.randint(1, self.cfg.SITE_MAX_RADIUS)
             # resources = np.random.randint(SITE_MAX_RESOURCE//2, SITE_MAX_RESOURCE + 1)
-            sites.append(Site(pos, radius, SITE_REGEN_TIME, SITE_MAX_RESOURCE))
+            sites.append(Site(pos, radius, self.cfg.SITE_REGEN_TIME, self.cfg.SITE_MAX_RESOURCE, id=i, field=self.site_field))
             # print(f"Site {i}: {pos}")
         return sites
 
     def build_predators(self):
+        if self.cfg.USE_BULK_BUILD:
+            positions, theta = draw_predators(np.random, self.cfg.NUM_PREDS, self.cfg)
+            return [Predator(positions[i], angle, self, speed=self.cfg.MAX_SPEED, id=i) for i, angle in enumerate(theta.tolist())]
         predators = []
-        for i in range(NUM_PREDS):
-            pos = np.array([np.random.uniform(0, WORLD_SIZE), np.random.uniform(0, WORLD_SIZE)])
+        for i in range(self.cfg.NUM_PREDS):
+            pos = np.array([np.random.uniform(0, self.cfg.WORLD_SIZE), np.random.uniform(0, self.cfg.WORLD_SIZE)])
             theta = np.random.uniform(-np.pi, np.pi)
-            predators.append(Predator(pos, theta, self, speed=MAX_SPEED))
+            predators.append(Predator(pos, theta, self, speed=self.cfg.MAX_SPEED, id=i))
             # print(f"Predator {i} starting pos: {pos}")
         return predators
     
     """
-    Creates a matrix representation of the group networks 
+    Creates a matrix representation of the group networks: every pair of agents is linked with 50% chance,
+    as long as both have fewer than MAX_NETWORK_SIZE links. Returns the network in CSR form (see
+    generation.random_network_csr()) and fills in each agent's network list.
     """
     def build_neighbor_matrix(self): # TODO: repurpose for sorting groups
-        for i in range(0, NUM_AGENTS):
-            for j in range(i, NUM_AGENTS):
-                if i != j:
-                    if len(self.agents[i].network) < MAX_NETWORK_SIZE and len(self.agents[j].network) < MAX_NETWORK_SIZE:
-                        if np.random.choice([0, 1]) == 1:
-                            self.agents[i].network.append(j)
-                            self.agents[j].network.append(i)
+        indptr, indices = random_network_csr(np.random, self.cfg.NUM_AGENTS, 0.5, self.cfg.MAX_NETWORK_SIZE)
+        for agent in self.agents:
+            agent.network = indices[indptr[agent.id]:indptr[agent.id + 1]].tolist()
+        return indptr, indices
     
     """
     Returns a list of sites that are within the agent's detection radius
     """
     def get_sites(self, agent):
+        if self.site_query is not None and self.site_query.matches(agent.id, agent.pos):
+            return self.site_query.visible_sites(agent.id)
         sites = []
         for site in self.sites:
             if site.is_available():
-                if math.dist(site.pos, agent.pos) <= AGENT_SENSING_RADIUS + site.radius:
+                if math.dist(site.pos, agent.pos) <= self.cfg.AGENT_SENSING_RADIUS + site.radius:
                     sites.append(site)
         return sites
 
     """
     Returns a list of predators that are within an agent's detection radius
+    (and that are close enough to see the agent themselves)
     """
     def get_predators(self, agent):
+        if self.predator_sensing is not None:
+            positions, indptr, indices = self.predator_sensing
+            if agent.pos[0] == positions[agent.id, 0] and agent.pos[1] == positions[agent.id, 1]:
+                return [self.predators[i] for i in indices[indptr[agent.id]:indptr[agent.id + 1]].tolist()]
         predators = []
         for predator in self.predators:
-            if math.dist(agent.pos, predator.pos) <= PREDATOR_SENSING_RADIUS:
-                predator.neighbors.append(agent)
-                if math.dist(agent.pos, predator.pos) <= AGENT_SENSING_RADIUS:
-                    predators.append(predator)
+            dist = math.dist(agent.pos, predator.pos)
+            if dist <= self.cfg.PREDATOR_SENSING_RADIUS and dist <= self.cfg.AGENT_SENSING_RADIUS:
+                predators.append(predator)
         return predators
+
+    """
+    Finds which predators every agent can see, using the spatial hash; predators don't move until
+    update_predators(), so this stays valid for every agent that hasn't moved yet this tick
+    """
+    def sense_predators(self):
+        if not self.predators:
+            self.predator_sensing = None
+            return
+        positions = self.store.positions.copy()
+        radius = min(self.cfg.AGENT_SENSING_RADIUS, self.cfg.PREDATOR_SENSING_RADIUS)
+        self.predator_sensing = (positions, *self.spatial_hash.cross_csr(positions, self.predator_store.positions, radius, inclusive=True))
+
+    """
+    Moves every predator at once: each predator senses the agents within PREDATOR_SENSING_RADIUS
+    through the spatial hash, then targets, pursuits, and boundaries are handled in PredatorStore.step()
+    """
+    def update_predators(self):
+        if not self.predators:
+            return
+        indptr, indices = self.spatial_hash.cross_csr(self.predator_store.positions, self.store.positions, self.cfg.PREDATOR_SENSING_RADIUS, inclusive=True)
+        self.predator_store.step(self.store.positions, indptr, indices)
     
+    """
+    Returns the IDs of the agents that could be within AGENT_SENSING_RADIUS of the agent, in ascending order.
+    With the spatial hash this is only the agents in the surrounding grid cells; otherwise it is every agent.
+    The caller is responsible for the exact distance check.
+    """
+    def get_candidate_ids(self, agent):
+        if self.use_spatial_hash:
+            return self.spatial_hash.query(agent.pos)
+        return range(len(self.agents))
+
+    """
+    Returns the agent's neighbor IDs from this tick's neighbor lists as an array, in ascending order
+    """
+    def get_sensed_ids(self, agent):
+        indptr, indices = self.neighbor_csr
+        return indices[indptr[agent.id]:indptr[agent.id + 1]]
+
+    """
+    Returns True if the current tick is synchronous. Batched moves are computed for every agent from the
+    same snapshot, so they always run synchronously.
+    """
+    def is_synchronous(self):
+        return self.sync_update or self.use_batched_move
+
+    """
+    Snapshots every agent at once, then builds every agent's neighbor list (and, if moves are batched,
+    precomputes every agent's movement) from that snapshot. Agents updated later in the tick still see
+    the world as it was at the start.
+    """
+    def sense_all(self):
+        self.store.snapshot_all()
+        self.neighbor_csr = self.spatial_hash.neighbor_csr(self.store.prev_positions, self.cfg.AGENT_SENSING_RADIUS)
+        if not self.use_batched_move:
+            return
+        if self.cfg.USE_BOID_MOVE:
+            self.boid_moves = BoidMoves(self.store, *self.neighbor_csr, self.cfg)
+        else:
+            self.laplacian_moves = LaplacianMoves(self.store, *self.neighbor_csr)
+
     """
     Each method in the get_agent_x() section:
     takes the agent's id and returns some information regarding the agent.
     These assume that the agent_id correlates with the agent's index is simulation.agents.
     """
     def get_agent_pos(self, agent_id):
-        return self.prev_state.get(agent_id)[0]
+        store = self.store
+        return store.positions[agent_id] if store.prev_live[agent_id] else store.prev_positions[agent_id]
     
     def get_agent_speed(self, agent_id):
-        return self.prev_state.get(agent_id)[1]
+        return self.store.prev_speed[agent_id]
     
     def get_agent_heading(self, agent_id):
-        return self.prev_state.get(agent_id)[2]
+        return self.store.prev_heading[agent_id]
     
+    def get_agent_group(self, agent_id):
+        return self.store.group[agent_id]
+
     def get_agent_group_id(self, agent_id):
         return self.agents[agent_id].group_id
+
+    """
+    Returns the sorted IDs of every agent in a group
+    """
+    def get_group_members(self, group_num):
+        return self.store.group_members(group_num)
     
     def get_agent_site(self, agent_id):
+        if self.is_synchronous():
+            return self.store.prev_site[agent_id]
         return self.agents[agent_id].site
+
+    def get_agent_state(self, agent_id):
+        if self.is_synchronous():
+            return self.store.prev_state[agent_id]
+        return self.store.state[agent_id]
     
     """
     Ensures agents don't go out of bounds
     """
     def handle_boundaries(self, agent):
         out_of_bounds = False
-        if math.isclose(agent.pos[0], PADDING) or agent.pos[0] < PADDING:
-            agent.pos[0] = PADDING + DT
+        if math.isclose(agent.pos[0], self.cfg.PADDING) or agent.pos[0] < self.cfg.PADDING:
+            agent.pos[0] = self.cfg.PADDING + self.cfg.DT
             out_of_bounds = True
 
-        if math.isclose(agent.pos[1], PADDING) or agent.pos[1] < PADDING:
-            agent.pos[1] = PADDING + DT
+        if math.isclose(agent.pos[1], self.cfg.PADDING) or agent.pos[1] < self.cfg.PADDING:
+            agent.pos[1] = self.cfg.PADDING + self.cfg.DT
             out_of_bounds = True
 
-        if math.isclose(agent.pos[0], WORLD_SIZE - PADDING) or agent.pos[0] > WORLD_SIZE - PADDING:
-            agent.pos[0] = WORLD_SIZE - PADDING - DT
+        if math.isclose(agent.pos[0], self.cfg.WORLD_SIZE - self.cfg.PADDING) or agent.pos[0] > self.cfg.WORLD_SIZE - self.cfg.PADDING:
+            agent.pos[0] = self.cfg.WORLD_SIZE - self.cfg.PADDING - self.cfg.DT
             out_of_bounds = True
 
-        if math.isclose(agent.pos[1], WORLD_SIZE - PADDING) or agent.pos[1] > WORLD_SIZE - PADDING:
-            agent.pos[1] = WORLD_SIZE - PADDING - DT
+        if math.isclose(agent.pos[1], self.cfg.WORLD_SIZE - self.cfg.PADDING) or agent.pos[1] > self.cfg.WORLD_SIZE - self.cfg.PADDING:
+            agent.pos[1] = self.cfg.WORLD_SIZE - self.cfg.PADDING - self.cfg.DT
             out_of_bounds = True
 
         if out_of_bounds:
@@ -155,13 +311,183 @@ class Simulation:
 
     """
     Updates the world conditions (agent positions, predator positions, site conditions, etc.)
+    In a synchronous tick (see is_synchronous()), the store's prev_* arrays are filled once at the start
+    and locked, every agent reads only from them and writes only to the live arrays, so the outcome
+    doesn't depend on the order agents are updated in. Otherwise each agent is snapshotted right before
+    its own update and sensing sees the agents updated earlier in the tick where they are now.
     """
     def update(self):
-        for agent in self.agents:
-            self.prev_state.update({agent.id: [agent.pos, agent.speed, agent.heading()]})
-            self.update_agent(agent)
-        for site in self.sites:
-            site.update()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_tick(self)
+        self.neighbor_csr = None
+        self.boid_moves = None
+        self.laplacian_moves = None
+        self.site_query = self.query_sites()
+        self.sense_predators()
+        self.update_agents()
+        self.update_predators()
+        self.update_sites()
+        if profiler is not None:
+            profiler.end_tick(self)
+        for recorder in self.recorders:
+            recorder.record(self)
+
+    """
+    Returns this tick's SiteQuery, or None if use_site_query is off
+    """
+    def query_sites(self):
+        if not self.use_site_query:
+            return None
+        return SiteQuery(self.store.positions, self.sites, self.cfg.AGENT_SENSING_RADIUS, field=self.site_field)
+
+    """
+    Applies this tick's grazing to the sites, then regenerates them
+    """
+    def update_sites(self):
+        self.site_field.apply_consumption()
+        self.site_field.regenerate()
+
+    """
+    Updates every agent, synchronously or one after another (see update())
+    """
+    def update_agents(self):
+        if self.is_synchronous():
+            self.sense_all()
+            self.store.lock_prev()
+            try:
+                for agent in self.agents:
+                    self.update_agent(agent)
+            finally:
+                self.store.lock_prev(False)
+        else:
+            if self.use_spatial_hash:
+                self.spatial_hash.rebuild([agent.pos for agent in self.agents])
+            for agent in self.agents:
+                self.store.snapshot(agent.id, live=True)
+                self.update_agent(agent)
+                if self.use_spatial_hash:
+                    self.spatial_hash.move(agent.id, agent.pos) # keep the grid exact for the agents updated after this one
+
+    ### CHECKPOINTS ###
+    # the settings that fix the shape of the saved arrays; a checkpoint can only be restored with the same values
+    CHECKPOINT_LAYOUT = ("NUM_AGENTS", "NUM_SITES", "NUM_PREDS", "NUM_GROUPS", "MAX_SITE_MEMORY", "USE_COMPILED_BT")
+
+    """
+    Returns everything the run needs to go on as a dict of read-only arrays: the config, the agents, sites,
+    and predators, every agent's behavior tree state, the toggles, and the state of np.random (which every
+    random draw in the simulation uses). The arrays are copies, so the checkpoint stays frozen while the
+    simulation goes on. Call it between ticks; a simulation restored with from_checkpoint() continues exactly
+    like this one would.
+    """
+    def checkpoint(self):
+        agents = self.agents
+        networks = [agent.network for agent in agents]
+        flags = {name: value for name, value in vars(self).items() if isinstance(value, bool)} # the use_* toggles
+        rng = np.random.get_state()
+        arrays = {"kind": np.array(type(self).__name__),
+                  "config": np.array(repr(self.cfg.to_dict())),
+                  "avg_hunger": np.array(self.avg_hunger),
+                  "flag_names": np.array(list(flags), dtype=str),
+                  "flag_values": np.array(list(flags.values()), dtype=bool),
+                  "agent_attr_factor": np.array([agent.attr_factor for agent in agents], dtype=float),
+                  "agent_orient_factor": np.array([agent.orient_factor for agent in agents], dtype=float),
+                  "agent_rpls_factor": np.array([agent.rpls_factor for agent in agents], dtype=float),
+                  "agent_angular_velocity": np.array([agent.angular_velocity for agent in agents], dtype=float),
+                  "agent_network_len": np.array([-1 if network is None else len(network) for network in networks], dtype=np.int64), # -1 = None
+                  "agent_network": np.array([i for network in networks if network for i in network], dtype=np.int64),
+                  "rng_keys": rng[1], "rng_pos": np.array(rng[2]), "rng_has_gauss": np.array(rng[3]), "rng_cached_gaussian": np.array(rng[4])}
+        arrays.update({"agent_" + name: array for name, array in self.store.state_arrays().items()})
+        arrays.update({"site_" + name: array for name, array in self.site_field.state_arrays().items()})
+        arrays.update({"predator_" + name: array for name, array in self.predator_store.state_arrays().items()})
+        bt_store = self.bt_store
+        if bt_store is None and agents and agents[0].bt is not None: # separate py_trees trees: copy their state into a BTStore
+            bt_store = BTStore(BTProgram(agents[0].bt.root), len(agents))
+            for agent in agents:
+                save_tree_state(agent.bt, bt_store, agent.id)
+        if bt_store is not None:
+            arrays.update({"bt_status": bt_store.status, "bt_current_child": bt_store.current_child,
+                           "bt_success": bt_store.success, "bt_count": bt_store.count})
+        for name, array in arrays.items():
+            arrays[name] = array = np.array(array)
+            array.flags.writeable = False
+        return arrays
+
+    """
+    Saves checkpoint() to a compressed .npz file at path
+    """
+    def save_checkpoint(self, path):
+        np.savez_compressed(path, **self.checkpoint())
+
+    """
+    Returns a simulation restored from a file written by save_checkpoint() (see from_checkpoint())
+    """
+    @classmethod
+    def load_checkpoint(cls, path):
+        with np.load(path) as data:
+            return cls.from_checkpoint(data)
+
+    """
+    Returns a simulation restored from a checkpoint() (or an opened checkpoint file). It is built like a new
+    simulation, then every saved array is copied in, so it has to be restored with the class that saved it,
+    and the checkpoint itself is only read. The state of np.random is restored too.
+    By default the simulation is built with the saved config. A different cfg can be given to fork the run
+    with changed settings, as long as the CHECKPOINT_LAYOUT settings are the same; the toggles are then the
+    ones cfg sets. Settings that were copied into the world when it was built (like SITE_REGEN_TIME) keep
+    their saved values.
+    """
+    @classmethod
+    def from_checkpoint(cls, data, cfg=None):
+        if str(data["kind"]) != cls.__name__:
+            raise ValueError(f"can't restore a {data['kind']} checkpoint as a {cls.__name__}")
+        saved = SimConfig(**ast.literal_eval(str(data["config"])))
+        if cfg is None:
+            simulation = cls(saved)
+        else:
+            changed = [name for name in cls.CHECKPOINT_LAYOUT if getattr(cfg, name) != getattr(saved, name)]
+            if changed:
+                raise ValueError(f"can't restore a checkpoint with different {', '.join(changed)}")
+            simulation = cls(cfg)
+        simulation.load_state(data, flags=cfg is None)
+        return simulation
+
+    """
+    Copies the state in a checkpoint() into this simulation, which must have the same CHECKPOINT_LAYOUT
+    settings. With flags=False, the toggles are left as they are.
+    """
+    def load_state(self, data, flags=True):
+        self.store.load_state_arrays({name: data["agent_" + name] for name in AgentStore.STATE_ARRAYS})
+        self.site_field.load_state_arrays({name: data["site_" + name] for name in SiteField.STATE_ARRAYS})
+        self.predator_store.load_state_arrays({name: data["predator_" + name] for name in PredatorStore.STATE_ARRAYS})
+        self.avg_hunger = data["avg_hunger"].item()
+        if flags:
+            for name, value in zip(data["flag_names"].tolist(), data["flag_values"].tolist()):
+                setattr(self, name, value)
+
+        network_len = data["agent_network_len"]
+        bounds = np.concatenate(([0], np.cumsum(np.maximum(network_len, 0)))).tolist()
+        network = data["agent_network"].tolist()
+        for agent, attr, orient, rpls, angular, length in zip(self.agents, data["agent_attr_factor"].tolist(), data["agent_orient_factor"].tolist(),
+                                                              data["agent_rpls_factor"].tolist(), data["agent_angular_velocity"].tolist(), network_len.tolist()):
+            agent.attr_factor, agent.orient_factor, agent.rpls_factor, agent.angular_velocity = attr, orient, rpls, angular
+            agent.network = None if length < 0 else network[bounds[agent.id]:bounds[agent.id + 1]]
+        self.agent_colors = [self.cfg.COLORS.get(group_num) for group_num in self.store.group.tolist()]
+
+        if "bt_status" in data:
+            if self.bt_store is not None:
+                bt_store = self.bt_store
+            else:
+                bt_store = BTStore(BTProgram(self.agents[0].bt.root), len(self.agents))
+            np.copyto(bt_store.status, data["bt_status"])
+            np.copyto(bt_store.current_child, data["bt_current_child"])
+            np.copyto(bt_store.success, data["bt_success"])
+            np.copyto(bt_store.count, data["bt_count"])
+            if self.bt_store is None:
+                for agent in self.agents:
+                    load_tree_state(agent.bt, bt_store, agent.id)
+
+        np.random.set_state(("MT19937", data["rng_keys"], int(data["rng_pos"]), int(data["rng_has_gauss"]), float(data["rng_cached_gaussian"])))
+        self.spatial_hash.rebuild([agent.pos for agent in self.agents])
 
     ### FUNCTIONS CHILD NEEDS TO OVERRIDE ###
     """
@@ -180,16 +506,61 @@ class Simulation:
         pass
 
 class BT_Simulation(Simulation):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg=None):
+        self.use_vectorized_bt = (cfg if cfg is not None else SimConfig()).USE_VECTORIZED_BT # toggles ticking every agent's tree at once (see bt_vectorized.py); can be changed between ticks
+        self.vectorized_bt = None # the VectorizedBT over the shared tree, made on the first vectorized tick
+        super().__init__(cfg)
+
+    """
+    Vectorized ticks are synchronous too: every agent's tree is ticked from the same snapshot
+    """
+    def is_synchronous(self):
+        return super().is_synchronous() or self.use_vectorized_bt
+
+    """
+    With use_vectorized_bt, ticks every agent's behavior tree at once with VectorizedBT instead of calling
+    update_agent() per agent. Each agent does what its own tree would do in a synchronous tick; the random
+    draws differ, so the results match statistically. agent.neighbors, agent.group_neighbors, and
+    agent.potential_sites aren't filled in.
+    """
+    def update_agents(self):
+        if not self.use_vectorized_bt:
+            super().update_agents()
+            return
+        if self.bt_store is None:
+            raise ValueError("use_vectorized_bt needs the shared compiled tree (USE_COMPILED_BT)")
+        if self.vectorized_bt is None:
+            self.vectorized_bt = VectorizedBT(self.bt_program, self.bt_store)
+        store = self.store
+        store.snapshot_all()
+        self.neighbor_csr = self.spatial_hash.neighbor_csr(store.prev_positions, self.cfg.AGENT_SENSING_RADIUS)
+        site_query = self.site_query
+        if site_query is None:
+            site_query = SiteQuery(store.prev_positions, self.sites, self.cfg.AGENT_SENSING_RADIUS, field=self.site_field)
+        batch = BTBatch(store, self.site_field, *self.neighbor_csr, site_query.visible, self.cfg)
+        store.lock_prev()
+        try:
+            self.vectorized_bt.tick(batch, np.arange(store.num_agents))
+        finally:
+            store.lock_prev(False)
+
+        # Simulation.update_agent()
+        store.hunger -= 1
+        self.avg_hunger += store.hunger.sum()
+        store.hunger += clamp_to_world(store.positions, self.cfg) > 0
 
     def get_neighbor_ids(self, agent):
+        if self.neighbor_csr is not None:
+            sensed = self.get_sensed_ids(agent)
+            return sensed.tolist(), sensed[self.store.group[sensed] == self.store.group[agent.id]].tolist()
         neighbors = []
         group_neighbors = []
-        for neighbor in self.agents:
-            if neighbor.id != agent.id and math.dist(neighbor.pos, agent.pos) < AGENT_SENSING_RADIUS:
+        group = self.store.group[agent.id]
+        for neighbor_id in self.get_candidate_ids(agent):
+            neighbor = self.agents[neighbor_id]
+            if neighbor.id != agent.id and math.dist(neighbor.pos, agent.pos) < self.cfg.AGENT_SENSING_RADIUS:
                 neighbors.append(neighbor.id)
-                if np.array_equal(self.get_agent_group_id(neighbor.id), self.get_agent_group_id(agent.id)):
+                if self.store.group[neighbor.id] == group:
                     group_neighbors.append(neighbor.id)
         return neighbors, group_neighbors
     
@@ -203,13 +574,54 @@ class BT_Simulation(Simulation):
         super().update_agent(agent)
     
 class FSM_Simulation(Simulation):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg=None):
+        self.use_vectorized_fsm = (cfg if cfg is not None else SimConfig()).USE_VECTORIZED_FSM # toggles running every agent's state machine as array operations (see network_fsm.py); can be changed between ticks
+        super().__init__(cfg)
+
+    """
+    Vectorized ticks are synchronous too: every agent is updated from the same snapshot
+    """
+    def is_synchronous(self):
+        return super().is_synchronous() or self.use_vectorized_fsm
+
+    """
+    With use_vectorized_fsm, runs one tick of every agent's state machine at once with network_step()
+    instead of calling update_agent() per agent. The results match the synchronous object-based tick
+    statistically, not draw for draw. Only the network states (NETWORK_STATES) are vectorized.
+    """
+    def update_agents(self):
+        if not self.use_vectorized_fsm:
+            super().update_agents()
+            return
+        store = self.store
+        if not np.isin(store.state, NETWORK_STATES).all():
+            raise ValueError("use_vectorized_fsm only supports the network states (NETWORK_STATES)")
+        store.snapshot_all()
+        self.neighbor_csr = self.spatial_hash.neighbor_csr(store.prev_positions, self.cfg.AGENT_SENSING_RADIUS)
+        site_query = self.site_query
+        if site_query is None:
+            site_query = SiteQuery(store.prev_positions, self.sites, self.cfg.AGENT_SENSING_RADIUS, field=self.site_field)
+        network_step(store, self.site_field, *self.neighbor_csr, site_query.visible, site_query.at, NumpyDraws(store.num_agents), self.cfg)
+
+        # Simulation.update_agent()
+        store.hunger -= 1
+        self.avg_hunger += store.hunger.sum()
+        store.hunger += clamp_to_world(store.positions, self.cfg) > 0
+
+    """
+    Returns an FSMEnsemble (see ensemble.py) with one replica per seed, all stepped together as arrays
+    """
+    @staticmethod
+    def ensemble(seeds, cfg=None):
+        return FSMEnsemble(seeds, cfg)
 
     def get_neighbor_ids(self, agent):
+        if self.neighbor_csr is not None:
+            return self.get_sensed_ids(agent).tolist()
         neighbors = []
-        for neighbor in self.agents:
-            if neighbor.id != agent.id and math.dist(neighbor.pos, agent.pos) < AGENT_SENSING_RADIUS:
+        for neighbor_id in self.get_candidate_ids(agent):
+            neighbor = self.agents[neighbor_id]
+            if neighbor.id != agent.id and math.dist(neighbor.pos, agent.pos) < self.cfg.AGENT_SENSING_RADIUS:
                 neighbors.append(neighbor.id)
         return neighbors
 
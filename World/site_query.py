@@ -0,0 +1,90 @@
+import numpy as np
+import math
+
+"""
+SiteQuery computes every agent-site distance once per tick and keeps the results as boolean masks:
+which sites each agent can see (within sensing_radius + site.radius) and which sites each agent is at
+(within site.radius). Simulation.get_sites() and Agent.at_site() read these masks instead of calling
+math.dist for every agent-site pair. The comparisons give the same results as math.dist.
+Every site must have its index in Simulation.sites as its id. If the sites' SiteField is given, its arrays
+are used directly instead of being gathered from the Site objects.
+"""
+class SiteQuery:
+    CHUNK_SIZE = 4096 # the number of agents whose distances are computed at once; bounds the memory used
+
+    def __init__(self, positions, sites, sensing_radius, field=None):
+        self.sites = sites
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2) # the agent positions the masks are valid for
+        if field is not None:
+            site_pos = field.positions
+            radii = field.radii
+            self.available = field.available() # site availability at the start of the tick
+        else:
+            site_pos = np.array([site.pos for site in sites], dtype=float).reshape(-1, 2)
+            radii = np.array([site.radius for site in sites], dtype=float)
+            self.available = np.array([site.is_available() for site in sites], dtype=bool)
+        # in_range[i, s]: agent i can see site s; at[i, s]: agent i is at site s
+        self.in_range, self.at = self.within_masks(self.positions, site_pos, [sensing_radius + radii, radii])
+        self.visible = self.in_range & self.available # visible[i, s]: agent i can see site s and it had resources at the start of the tick
+
+    """
+    Returns just the at mask: at[i, s] is True if positions[i] is within radii[s] of site_pos[s]. Cheaper than
+    a full query when the sensing ranges and availability aren't needed.
+    """
+    @classmethod
+    def at_mask(cls, positions, site_pos, radii):
+        return cls.within_masks(positions, site_pos, [radii])[0]
+
+    """
+    Returns one mask per threshold array: mask[i, s] is True if positions[i] is within threshold[s] of
+    site_pos[s], settled like the masks of a query. site_pos and the thresholds can instead have one row per
+    position, (positions, S, 2) and (positions, S), when the positions see different sites (see ensemble.py).
+    """
+    @classmethod
+    def within_masks(cls, positions, site_pos, thresholds):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        site_pos = np.asarray(site_pos, dtype=float)
+        per_position = site_pos.ndim == 3
+        thresholds = [np.asarray(threshold, dtype=float) for threshold in thresholds]
+        masks = [np.zeros((len(positions), site_pos.shape[-2]), dtype=bool) for _ in thresholds]
+        for start in range(0, len(positions), cls.CHUNK_SIZE):
+            rows = slice(start, start + cls.CHUNK_SIZE)
+            chunk = positions[rows]
+            chunk_sites = site_pos[rows] if per_position else site_pos
+            diff = chunk_sites - chunk[:, None, :]
+            dist = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+            for mask, threshold in zip(masks, thresholds):
+                mask[rows] = cls._within(dist, threshold[rows] if threshold.ndim == 2 else threshold, chunk, chunk_sites)
+        return masks
+
+    """
+    Returns dist <= threshold, settling distances within rounding error of the threshold with math.dist.
+    site_pos is (S, 2), or (agents, S, 2) for one set of sites per agent.
+    """
+    @staticmethod
+    def _within(dist, threshold, agent_pos, site_pos):
+        within = dist <= threshold
+        threshold = np.broadcast_to(threshold, dist.shape)
+        site_pos = np.broadcast_to(site_pos, dist.shape + (2,))
+        for i, s in zip(*np.nonzero(np.abs(dist - threshold) <= 1e-9 * np.maximum(threshold, 1.0))):
+            within[i, s] = math.dist(site_pos[i, s], agent_pos[i]) <= threshold[i, s]
+        return within
+
+    """
+    Returns True if the masks are valid for an agent at pos, i.e. it hasn't moved since the query was made
+    """
+    def matches(self, agent_id, pos):
+        return pos[0] == self.positions[agent_id, 0] and pos[1] == self.positions[agent_id, 1]
+
+    """
+    Returns the sites in range of the agent that have resources, in site order. Grazing is only applied
+    at the end of a tick (see SiteField), so availability at the start of the tick is still current.
+    """
+    def visible_sites(self, agent_id):
+        return [self.sites[s] for s in np.flatnonzero(self.visible[agent_id]).tolist()]
+
+    """
+    Returns True if the agent is at the site
+    """
+    def at_site(self, agent_id, site):
+        return bool(self.at[agent_id, site.id])
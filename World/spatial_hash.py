@@ -0,0 +1,150 @@
+import numpy as np
+import math
+
+"""
+SpatialHash is a uniform-grid (cell list) index over agent positions used for neighbor sensing.
+Cells are squares with side length cell_size, so anything closer than cell_size to a point lies
+in the 3x3 block of cells around that point's cell. The grid is rebuilt once per tick and
+individual ids are re-binned with move() as they change position, which keeps query() exact
+even though agents are updated one after another within a tick.
+NOTE: ids are assumed to be the index of the agent in Simulation.agents.
+"""
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size # the side length of each cell; must be at least the query radius
+        self.cells = dict() # key: (cell_x, cell_y), value: set of ids currently in that cell
+        self.id_cells = dict() # key: id, value: the (cell_x, cell_y) the id is currently binned in
+        self.distance_checks = 0 # how many candidate pairs cross_csr() has checked the distance of (read by TickProfiler)
+
+    """
+    Returns the (cell_x, cell_y) key of the cell containing pos
+    """
+    def cell_of(self, pos):
+        return (math.floor(pos[0] / self.cell_size), math.floor(pos[1] / self.cell_size))
+
+    """
+    Re-bins every id from scratch; positions is indexed by id
+    """
+    def rebuild(self, positions):
+        self.cells.clear()
+        self.id_cells.clear()
+        keys = np.floor(np.asarray(positions, dtype=float).reshape(-1, 2) / self.cell_size).astype(np.int64)
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            self.id_cells[i] = key
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = {i}
+            else:
+                cell.add(i)
+
+    """
+    Moves a single id to the cell containing its new position
+    """
+    def move(self, id, pos):
+        key = self.cell_of(pos)
+        old_key = self.id_cells.get(id)
+        if key == old_key:
+            return
+        if old_key is not None:
+            old_cell = self.cells[old_key]
+            old_cell.discard(id)
+            if not old_cell:
+                del self.cells[old_key]
+        self.id_cells[id] = key
+        self.cells.setdefault(key, set()).add(id)
+
+    """
+    Returns the sorted ids in the 3x3 block of cells around pos. These are candidates only;
+    the caller still has to check the actual distance.
+    """
+    def query(self, pos):
+        cx, cy = self.cell_of(pos)
+        candidates = []
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    candidates.extend(cell)
+        candidates.sort()
+        return candidates
+
+    """
+    Builds the neighbor lists of every position at once and returns them in CSR form (indptr, indices):
+    the neighbors of i are indices[indptr[i]:indptr[i+1]], in ascending order, excluding i itself.
+    j is a neighbor of i if math.dist(positions[i], positions[j]) < radius, exactly like the per-agent scan.
+    Does not use or change the incremental grid. If labels is given, only points with the same label can be
+    neighbors, e.g. to search several independent worlds in one call.
+    """
+    def neighbor_csr(self, positions, radius, labels=None):
+        return self.cross_csr(positions, positions, radius, exclude_self=True, query_labels=labels, labels=labels)
+
+    """
+    Like neighbor_csr(), but between two sets of points: row i lists the indices of the points in positions
+    within radius of query_positions[i] (or exactly at radius, if inclusive). Used e.g. for predator-prey sensing.
+    query_labels and labels are optional non-negative integer labels; a point only matches queries with its label.
+    """
+    def cross_csr(self, query_positions, positions, radius, inclusive=False, exclude_self=False, query_labels=None, labels=None):
+        query_positions = np.asarray(query_positions, dtype=float).reshape(-1, 2)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        num_queries = len(query_positions)
+        empty = (np.zeros(num_queries + 1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        if num_queries == 0 or len(positions) == 0:
+            return empty
+
+        # flatten the 2D cell keys into one integer id per cell, with a margin so neighboring cells don't wrap
+        reach = max(1, math.ceil(radius / self.cell_size)) # how many cells away a point within radius can be
+        query_keys = np.floor(query_positions / self.cell_size).astype(np.int64)
+        keys = np.floor(positions / self.cell_size).astype(np.int64)
+        origin = np.minimum(query_keys.min(axis=0), keys.min(axis=0)) - reach
+        query_keys -= origin
+        keys -= origin
+        width = int(max(query_keys[:, 1].max(), keys[:, 1].max())) + reach + 1
+        query_cell_ids = query_keys[:, 0] * width + query_keys[:, 1]
+        cell_ids = keys[:, 0] * width + keys[:, 1]
+        if labels is not None:
+            # give every label its own block of cells, so points with different labels are never candidates
+            height = int(max(query_keys[:, 0].max(), keys[:, 0].max())) + reach + 1
+            query_cell_ids += np.asarray(query_labels, dtype=np.int64) * (height * width)
+            cell_ids += np.asarray(labels, dtype=np.int64) * (height * width)
+        order = np.argsort(cell_ids, kind="stable")
+        sorted_cell_ids = cell_ids[order]
+
+        # candidate pairs: every query paired with every point in the block of cells around it
+        sources = []
+        targets = []
+        ids = np.arange(num_queries)
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cell = query_cell_ids + (dx * width + dy)
+                start = np.searchsorted(sorted_cell_ids, cell, side="left")
+                counts = np.searchsorted(sorted_cell_ids, cell, side="right") - start
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                sources.append(np.repeat(ids, counts))
+                targets.append(order[np.repeat(start, counts) + offsets])
+        if not sources:
+            return empty
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        self.distance_checks += len(sources)
+
+        # exact distance check; squared distances within rounding error of radius^2 are settled with math.dist
+        diff = positions[targets] - query_positions[sources]
+        dist_sq = np.einsum("ij,ij->i", diff, diff)
+        within = dist_sq <= radius * radius if inclusive else dist_sq < radius * radius
+        close_call = np.flatnonzero(np.abs(dist_sq - radius * radius) <= 1e-9 * radius * radius)
+        for pair in close_call.tolist():
+            dist = math.dist(positions[targets[pair]], query_positions[sources[pair]])
+            within[pair] = dist <= radius if inclusive else dist < radius
+        if exclude_self:
+            within &= sources != targets
+        sources = sources[within]
+        targets = targets[within]
+
+        pair_order = np.lexsort((targets, sources))
+        indices = targets[pair_order]
+        indptr = np.zeros(num_queries + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_queries), out=indptr[1:])
+        return indptr, indices
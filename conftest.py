@@ -0,0 +1 @@
+# makes the repository root importable for the tests in tests/
@@ -1,5 +1,5 @@
 import pygame
-from World.config import WORLD_SIZE, USE_BT
+from World.config import USE_BT
 from World.pygame_sim import PygameSim
 from World.simulation import Simulation, BT_Simulation, FSM_Simulation
 
@@ -15,12 +15,13 @@ class PygameDisplay:
         # pygame display stuff
         pygame.init()
         self.should_scale = False
-        if WORLD_SIZE > 500:
-            self.screen = pygame.display.set_mode((WORLD_SIZE, WORLD_SIZE))
+        world_size = simulation.cfg.WORLD_SIZE
+        if world_size > 500:
+            self.screen = pygame.display.set_mode((world_size, world_size))
         else:
             self.screen = pygame.display.set_mode((500, 500))
             self.should_scale = True
-            self.scale = 500 / WORLD_SIZE
+            self.scale = 500 / world_size
         self.clock = pygame.time.Clock()
         self.running = True
 
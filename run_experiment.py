@@ -1,12 +1,162 @@
-import matplotlib.pyplot as plt
+import os
+import multiprocessing
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from World.simulation import *
 from World.config import *
+from World.metrics import MetricsEngine
+from Controllers.states import NET_EXPLORE, NET_REST, EXPLORE, LOW_DENSE, HIGH_DENSE, REST, FLEE, EXPLORE_NAME, REST_NAME, FLEE_NAME
 
 NUM_TRIALS = 100
+NUM_WORKERS = os.cpu_count() # how many processes run trials at the same time; 1 runs every trial in this process
+MASTER_SEED = 0 # every trial's seed is derived from this, so results don't depend on NUM_WORKERS
+USE_ENSEMBLE = False # runs all FSM trials in this process as one vectorized FSMEnsemble; matches per-trial simulations statistically, not exactly
+BURN_IN_ITERS = 0 # if > 0, runs one burn-in of this many ticks and forks every trial from its end state instead of starting each trial fresh (see run_forks())
 filename = 'bt_default_config_test2'
 
-def run_simulation_mult(filename):
+# the state codes counted as exploring, resting, and fleeing in the trial statistics
+EXPLORE_STATES = [NET_EXPLORE, EXPLORE, LOW_DENSE, HIGH_DENSE]
+REST_STATES = [NET_REST, REST]
+FLEE_STATES = [FLEE]
+
+"""
+Returns one seed per trial, derived from the master seed
+"""
+def trial_seeds(master_seed, num_trials):
+    return np.random.SeedSequence(master_seed).generate_state(num_trials).tolist()
+
+"""
+Runs a single trial from its own seed and returns its statistics. cfg is the SimConfig to run with;
+the defaults in config.py are used if it is None. Runs headless, so it can be used in worker processes;
+nothing here imports matplotlib.
+"""
+def run_trial(seed, cfg=None):
+    cfg = cfg if cfg is not None else SimConfig()
+    np.random.seed(seed)
+    if cfg.USE_BT:
+        simulation = BT_Simulation(cfg)
+    else:
+        simulation = FSM_Simulation(cfg)
+    return simulate(simulation, cfg.NUM_ITERS)
+
+"""
+Runs a simulation for num_iters ticks and returns the trial statistics (see run_trial()). The state counts
+are means over the ticks, and "metrics" is a MetricsEngine with the running aggregates of every per-tick
+metric (see World/metrics.py).
+"""
+def simulate(simulation, num_iters):
+    cfg = simulation.cfg
+    start_hunger = simulation.avg_hunger
+    trial_avg_site_resources = 0
+    metrics = MetricsEngine()
+
+    for j in range(num_iters):
+        simulation.avg_hunger = 0
+
+        simulation.update()
+
+        simulation.avg_hunger = float(simulation.avg_hunger / cfg.NUM_AGENTS)
+        trial_avg_site_resources += int(simulation.site_field.resources.sum())
+        metrics.update(simulation)
+
+    state_counts = metrics.stats["state_counts"].mean
+    return {"start_hunger": start_hunger,
+            "end_hunger": simulation.avg_hunger,
+            "explore_agents": float(state_counts[EXPLORE_STATES].sum()),
+            "rest_agents": float(state_counts[REST_STATES].sum()),
+            "flee_agents": float(state_counts[FLEE_STATES].sum()),
+            "site_resources": float(trial_avg_site_resources / (cfg.NUM_SITES * num_iters)),
+            "metrics": metrics}
+
+_snapshot = None # the burn-in checkpoint run_fork() continues from; set before the workers start, so forked workers share it copy-on-write
+SIMULATIONS = {simulation.__name__: simulation for simulation in (BT_Simulation, FSM_Simulation)} # the simulation classes by checkpoint kind
+
+def _set_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+"""
+Runs one simulation from its own seed for num_iters ticks and returns its end state as a checkpoint
+(see Simulation.checkpoint()), for trials to fork from with run_forks()
+"""
+def burn_in(seed, num_iters, cfg=None):
+    cfg = cfg if cfg is not None else SimConfig()
+    np.random.seed(seed)
+    if cfg.USE_BT:
+        simulation = BT_Simulation(cfg)
+    else:
+        simulation = FSM_Simulation(cfg)
+    simulate(simulation, num_iters)
+    return simulation.checkpoint()
+
+"""
+Runs a single trial that continues the shared burn-in snapshot with its own seed and returns the same
+statistics as run_trial(); start_hunger is the hunger at the fork. cfg may change any setting that doesn't
+change the shape of the world (see Simulation.from_checkpoint()); by default the burn-in's config is used.
+"""
+def run_fork(seed, cfg=None):
+    simulation = SIMULATIONS[str(_snapshot["kind"])].from_checkpoint(_snapshot, cfg)
+    np.random.seed(seed)
+    return simulate(simulation, simulation.cfg.NUM_ITERS)
+
+def _run_fork_job(job):
+    seed, cfg = job
+    return run_fork(seed, cfg)
+
+"""
+Runs one trial per seed, each continuing the same burn-in snapshot (from burn_in()), in parallel if
+num_workers > 1. cfgs optionally gives each trial its own SimConfig. Where processes can be forked, the
+workers share the snapshot's memory with this process instead of each getting a copy of it; elsewhere each
+worker gets one copy when it starts. Results come back in trial order.
+"""
+def run_forks(snapshot, seeds, cfgs=None, num_workers=NUM_WORKERS):
+    jobs = list(zip(seeds, cfgs if cfgs is not None else [None] * len(seeds)))
+    _set_snapshot(snapshot)
+    try:
+        if num_workers is None or num_workers <= 1:
+            return [_run_fork_job(job) for job in jobs]
+        if "fork" in multiprocessing.get_all_start_methods():
+            executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("fork"))
+        else:
+            executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_set_snapshot, initargs=(snapshot,))
+        with executor:
+            return list(executor.map(_run_fork_job, jobs))
+    finally:
+        _set_snapshot(None)
+
+"""
+Runs one FSM trial per seed as a single FSMEnsemble and returns the same statistics as run_trial(), in trial order
+"""
+def run_ensemble(seeds, cfg=None):
+    cfg = cfg if cfg is not None else SimConfig()
+    ensemble = FSM_Simulation.ensemble(seeds, cfg)
+    start_hunger = ensemble.avg_hunger.copy()
+    site_resources = np.zeros(len(seeds))
+    state_counts = np.zeros((len(seeds), len(NETWORK_STATES))) # the ensemble only has the network states, so a column is a state code
+
+    for j in range(cfg.NUM_ITERS):
+        ensemble.update()
+        site_resources += ensemble.site_resources()
+        state_counts += ensemble.state_counts()
+
+    state_counts /= cfg.NUM_ITERS
+    return [{"start_hunger": float(start_hunger[r]),
+             "end_hunger": float(ensemble.avg_hunger[r]),
+             "explore_agents": float(state_counts[r, NET_EXPLORE]),
+             "rest_agents": float(state_counts[r, NET_REST]),
+             "flee_agents": 0.0,
+             "site_resources": float(site_resources[r] / (cfg.NUM_SITES * cfg.NUM_ITERS))} for r in range(len(seeds))]
+
+"""
+Runs every trial, in parallel if num_workers > 1, with cfg (see run_trial()). Results come back in trial order.
+"""
+def run_trials(seeds, num_workers=NUM_WORKERS, cfg=None):
+    if num_workers is None or num_workers <= 1:
+        return [run_trial(seed, cfg) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(run_trial, seeds, [cfg] * len(seeds)))
+
+def run_simulation_mult(filename, num_workers=NUM_WORKERS, master_seed=MASTER_SEED):
     with open(filename, 'w') as file:
         file.write("SIM CONFIG\n" +
                    f"NUM AGENTS={NUM_AGENTS}\n" +
@@ -14,7 +164,8 @@ def run_simulation_mult(filename):
                    f"NUM SITES={NUM_SITES}\n" +
                    f"NUM PREDATORS={NUM_PREDS}\n" +
                    f"SITE REGEN TIME={SITE_REGEN_TIME}\n" +
-                   f"SITE MAX RESOURCES={SITE_MAX_RESOURCE}\n")
+                   f"SITE MAX RESOURCES={SITE_MAX_RESOURCE}\n" +
+                   f"MASTER SEED={master_seed}\n")
         ending_hunger = []
         avg_starting_hunger = 0.0
         avg_ending_hunger = 0.0
@@ -25,53 +176,35 @@ def run_simulation_mult(filename):
         avg_site_resources = 0.0
         print("Starting Experiment\n")
 
-        for i in range(NUM_TRIALS):
-            if USE_BT:
-                simulation = BT_Simulation()
-            else:
-                simulation = FSM_Simulation()
-            trial_avg_explore_agents = 0
-            trial_avg_rest_agents = 0
-            trial_avg_flee_agents = 0
-            trial_avg_site_resources = 0
-
-            file.write(f"\nTrial {i}: Starting hunger={simulation.avg_hunger}\n")
-            print("Starting Trial\n")
-            avg_starting_hunger += simulation.avg_hunger
-            start_hunger = simulation.avg_hunger
-
-            for j in range(NUM_ITERS):
-                simulation.avg_hunger = 0
-                
-                simulation.bt_update()
-                    
-                simulation.avg_hunger = float(simulation.avg_hunger / NUM_AGENTS)
-                for site in simulation.sites:
-                    trial_avg_site_resources += site.resource_count
-                
-            avg_ending_hunger += simulation.avg_hunger
-            ending_hunger.append(simulation.avg_hunger)
-            hunger_diff = simulation.avg_hunger - start_hunger
-            avg_hunger_diff += hunger_diff
+        if BURN_IN_ITERS > 0:
+            seeds = trial_seeds(master_seed, NUM_TRIALS + 1) # the first seed is the burn-in's
+            file.write(f"BURN IN ITERS={BURN_IN_ITERS}\n")
+            results = run_forks(burn_in(seeds[0], BURN_IN_ITERS), seeds[1:], num_workers=num_workers)
+        elif USE_ENSEMBLE and not USE_BT:
+            results = run_ensemble(trial_seeds(master_seed, NUM_TRIALS))
+        else:
+            results = run_trials(trial_seeds(master_seed, NUM_TRIALS), num_workers)
 
-            # Process stats for trial
-            trial_avg_explore_agents = float(trial_avg_explore_agents / NUM_ITERS)
-            trial_avg_rest_agents = float(trial_avg_rest_agents / NUM_ITERS)
-            trial_avg_flee_agents = float(trial_avg_flee_agents / NUM_ITERS)
-            trial_avg_site_resources = float(trial_avg_site_resources / (NUM_SITES * NUM_ITERS))
+        for i, result in enumerate(results):
+            file.write(f"\nTrial {i}: Starting hunger={result['start_hunger']}\n")
+            avg_starting_hunger += result["start_hunger"]
+            avg_ending_hunger += result["end_hunger"]
+            ending_hunger.append(result["end_hunger"])
+            hunger_diff = result["end_hunger"] - result["start_hunger"]
+            avg_hunger_diff += hunger_diff
 
             # Do some processing for experiment
-            avg_explore_agents += trial_avg_explore_agents
-            avg_rest_agents += trial_avg_rest_agents
-            avg_flee_agents += trial_avg_flee_agents
-            avg_site_resources += trial_avg_site_resources
+            avg_explore_agents += result["explore_agents"]
+            avg_rest_agents += result["rest_agents"]
+            avg_flee_agents += result["flee_agents"]
+            avg_site_resources += result["site_resources"]
 
             # Record simulation results
-            file.write(f"Ending Hunger={simulation.avg_hunger}\n")
-            # file.write(f"Avg State Nums\n{EXPLORE_NAME}={trial_avg_explore_agents}\n"
-            #         + f"{REST_NAME}={trial_avg_rest_agents}\n{FLEE_NAME}={trial_avg_flee_agents}\n")
-            file.write(f"Avg Resources per Iter={trial_avg_site_resources}\n")
-        
+            file.write(f"Ending Hunger={result['end_hunger']}\n")
+            file.write(f"Avg State Nums\n{EXPLORE_NAME}={result['explore_agents']}\n"
+                       + f"{REST_NAME}={result['rest_agents']}\n{FLEE_NAME}={result['flee_agents']}\n")
+            file.write(f"Avg Resources per Iter={result['site_resources']}\n")
+
         # Process data for experiment
         avg_starting_hunger = avg_starting_hunger / NUM_TRIALS
         avg_ending_hunger = avg_ending_hunger / NUM_TRIALS
@@ -86,22 +219,33 @@ def run_simulation_mult(filename):
         file.write(f"Avg Starting Hunger={avg_starting_hunger}, Avg Ending Hunger={avg_ending_hunger}\n")
         file.write(f"Avg Hunger Difference={avg_hunger_diff}\n")
         file.write(f"Avg Site Resources per Iter={avg_site_resources}\n")
-        # file.write(f"AVG STATE NUMS\n{EXPLORE_NAME}={avg_explore_agents}\n"
-        #             + f"{REST_NAME}={avg_rest_agents}\n{FLEE_NAME}={avg_flee_agents}\n")
-        
+        file.write(f"AVG STATE NUMS\n{EXPLORE_NAME}={avg_explore_agents}\n"
+                   + f"{REST_NAME}={avg_rest_agents}\n{FLEE_NAME}={avg_flee_agents}\n")
+        metrics = MetricsEngine.merged(result["metrics"] for result in results if "metrics" in result)
+        if metrics.names:
+            file.write(f"\nPER-TICK METRICS (over every tick of every trial)\n")
+            for name, summary in metrics.summary().items():
+                file.write(f"{name}: mean={summary['mean']}, std={summary['std']}, min={summary['min']}, max={summary['max']}\n")
+
         return ending_hunger
 
-experiment_ending_hunger = run_simulation_mult('../experiment_results/' + filename + '.txt')
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt # only the main process draws, so workers never import matplotlib
+
+    for directory in ('../experiment_results/experiment_data/', '../experiment_results/graphs/'):
+        os.makedirs(directory, exist_ok=True)
+
+    experiment_ending_hunger = run_simulation_mult('../experiment_results/' + filename + '.txt')
 
-# save data to .npz
-np.save(file='../experiment_results/experiment_data/' + filename + '.npy', arr=experiment_ending_hunger, allow_pickle=False)
+    # save data to .npz
+    np.save(file='../experiment_results/experiment_data/' + filename + '.npy', arr=experiment_ending_hunger, allow_pickle=False)
 
-# set up boxplot
-fig = plt.figure(figsize=(10,7))
-plt.boxplot(experiment_ending_hunger)
+    # set up boxplot
+    fig = plt.figure(figsize=(10,7))
+    plt.boxplot(experiment_ending_hunger)
 
-# save boxplot as .jpg
-plt.savefig('../experiment_results/graphs/' + filename + 'graph.jpg')
+    # save boxplot as .jpg
+    plt.savefig('../experiment_results/graphs/' + filename + 'graph.jpg')
 
-# display
-plt.show()
\ No newline at end of file
+    # display
+    plt.show()
@@ -0,0 +1,96 @@
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from World.config import *
+from run_experiment import run_trial, NUM_WORKERS, MASTER_SEED
+
+TRIALS_PER_CONFIG = 10
+filename = 'sweep_test'
+
+# The settings to sweep. For a grid, every combination of the listed values is run;
+# for a random sweep, each setting is drawn uniformly from (low, high).
+SWEEP_GRID = {"NUM_AGENTS": [50, 100, 200],
+              "AGENT_SENSING_RADIUS": [3, 6, 12]}
+SWEEP_RANGES = {"AGENT_SENSING_RADIUS": (2, 15),
+                "SITE_REGEN_TIME": (5, 50)}
+NUM_SAMPLES = 0 # if > 0, run NUM_SAMPLES random configs from SWEEP_RANGES instead of the grid
+
+"""
+Returns one SimConfig for every combination of the values in params, a dict of setting name -> list of values
+"""
+def sweep_grid(params, base=None):
+    base = base if base is not None else SimConfig()
+    names = list(params)
+    return [base.replace(**dict(zip(names, values))) for values in itertools.product(*(params[name] for name in names))]
+
+"""
+Returns num_samples SimConfigs with each setting in ranges (setting name -> (low, high)) drawn uniformly.
+A setting whose default is an int gets an int drawn from [low, high].
+"""
+def sweep_random(ranges, num_samples, seed=MASTER_SEED, base=None):
+    base = base if base is not None else SimConfig()
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(num_samples):
+        overrides = {}
+        for name, (low, high) in ranges.items():
+            if isinstance(getattr(base, name), int):
+                overrides[name] = int(rng.integers(low, high, endpoint=True))
+            else:
+                overrides[name] = float(rng.uniform(low, high))
+        configs.append(base.replace(**overrides))
+    return configs
+
+"""
+Returns the trial seeds of every config. Each config's seeds are derived from the master seed and the
+config's index, so adding trials or configs doesn't change the seeds of the others.
+"""
+def sweep_seeds(master_seed, num_configs, trials_per_config):
+    return [np.random.SeedSequence([master_seed, i]).generate_state(trials_per_config).tolist()
+            for i in range(num_configs)]
+
+def _run_job(job):
+    seed, cfg = job
+    return run_trial(seed, cfg)
+
+"""
+Runs trials_per_config trials of every config, in parallel if num_workers > 1.
+Returns a list with each config's trial results, in config and trial order.
+"""
+def run_sweep(configs, trials_per_config=TRIALS_PER_CONFIG, num_workers=NUM_WORKERS, master_seed=MASTER_SEED):
+    jobs = [(seed, cfg) for cfg, seeds in zip(configs, sweep_seeds(master_seed, len(configs), trials_per_config))
+            for seed in seeds]
+    if num_workers is None or num_workers <= 1:
+        results = [_run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_run_job, jobs))
+    return [results[i:i + trials_per_config] for i in range(0, len(results), trials_per_config)]
+
+def write_sweep(filename, configs, results, master_seed=MASTER_SEED):
+    with open(filename, 'w') as file:
+        file.write(f"SWEEP\nCONFIGS={len(configs)}\nTRIALS PER CONFIG={len(results[0]) if results else 0}\n" +
+                   f"MASTER SEED={master_seed}\n")
+        for i, (cfg, trials) in enumerate(zip(configs, results)):
+            ending_hunger = [trial["end_hunger"] for trial in trials]
+            hunger_diff = [trial["end_hunger"] - trial["start_hunger"] for trial in trials]
+            file.write(f"\nConfig {i}: {cfg}\n")
+            file.write(f"Avg Ending Hunger={np.mean(ending_hunger)}, Std={np.std(ending_hunger)}\n")
+            file.write(f"Avg Hunger Difference={np.mean(hunger_diff)}\n")
+            file.write(f"Avg Site Resources per Iter={np.mean([trial['site_resources'] for trial in trials])}\n")
+
+if __name__ == "__main__":
+    os.makedirs('../experiment_results/experiment_data/', exist_ok=True)
+
+    if NUM_SAMPLES > 0:
+        configs = sweep_random(SWEEP_RANGES, NUM_SAMPLES)
+    else:
+        configs = sweep_grid(SWEEP_GRID)
+    print(f"Starting sweep of {len(configs)} configs\n")
+    results = run_sweep(configs)
+    write_sweep('../experiment_results/' + filename + '.txt', configs, results)
+
+    # save each config's ending hunger to .npy, one row per config
+    ending_hunger = np.array([[trial["end_hunger"] for trial in trials] for trials in results])
+    np.save(file='../experiment_results/experiment_data/' + filename + '.npy', arr=ending_hunger, allow_pickle=False)
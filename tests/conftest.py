@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+"""
+Returns pin(fraction), which replaces np.random.random(), uniform(), and randint() for the rest of the
+test with draws that always land at the same fraction of their range: random() and uniform(0, 1) return
+fraction, and randint(low, high) returns low + floor(fraction * (high - low)), like network_step()'s
+u_pick. Array sizes and array bounds work like numpy's, so code that draws one value at a time and code
+that draws arrays get the same values.
+"""
+@pytest.fixture
+def pin_draws(monkeypatch):
+    def pin(fraction):
+        def uniform(low=0.0, high=1.0, size=None):
+            value = low + fraction * (high - low)
+            return value if size is None else np.full(size, value)
+
+        def random(size=None):
+            return uniform(0.0, 1.0, size)
+
+        def randint(low, high=None, size=None):
+            if high is None:
+                low, high = 0, low
+            value = low + np.floor(fraction * (np.asarray(high) - low)).astype(np.int64)
+            if size is not None:
+                return np.full(size, value)
+            return value if np.ndim(value) else int(value)
+
+        monkeypatch.setattr(np.random, "uniform", uniform)
+        monkeypatch.setattr(np.random, "random", random)
+        monkeypatch.setattr(np.random, "randint", randint)
+    return pin
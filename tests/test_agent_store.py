@@ -0,0 +1,53 @@
+import numpy as np
+
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+
+def simulation():
+    np.random.seed(0)
+    return FSM_Simulation(SimConfig(NUM_AGENTS=5))
+
+"""
+After snapshot(live=True), moves made in place are seen by the agents updated later in the tick
+"""
+def test_in_place_moves_are_seen():
+    sim = simulation()
+    agent = sim.agents[0]
+    start = agent.pos.copy()
+    sim.store.snapshot(0, live=True)
+    agent.pos += [1.0, 0.0]
+    np.testing.assert_array_equal(sim.get_agent_pos(0), start + [1.0, 0.0])
+    agent.pos[1] = 7.0
+    np.testing.assert_array_equal(sim.get_agent_pos(0), [start[0] + 1.0, 7.0])
+    assert sim.store.prev_live[0]
+
+"""
+Once an agent is given a new position, the others go on seeing the position it replaced
+"""
+def test_new_position_leaves_the_old_one_seen():
+    sim = simulation()
+    agent = sim.agents[0]
+    sim.store.snapshot(0, live=True)
+    agent.pos += [1.0, 0.0]
+    moved = agent.pos.copy()
+    agent.pos = np.array([3.0, 4.0])
+    np.testing.assert_array_equal(agent.pos, [3.0, 4.0])
+    np.testing.assert_array_equal(sim.get_agent_pos(0), moved)
+    assert not sim.store.prev_live[0]
+    # later moves, in place or not, stay hidden until the next snapshot
+    agent.pos += [1.0, 1.0]
+    agent.pos = np.array([9.0, 9.0])
+    np.testing.assert_array_equal(sim.get_agent_pos(0), moved)
+    sim.store.snapshot(0, live=True)
+    np.testing.assert_array_equal(sim.get_agent_pos(0), [9.0, 9.0])
+
+def test_snapshot_all_clears_the_marks():
+    sim = simulation()
+    for agent in sim.agents:
+        sim.store.snapshot(agent.id, live=True)
+    positions = sim.store.positions.copy()
+    sim.store.snapshot_all()
+    assert not sim.store.prev_live.any()
+    for agent in sim.agents:
+        agent.pos += [0.5, 0.5]
+    np.testing.assert_array_equal([sim.get_agent_pos(agent.id) for agent in sim.agents], positions)
@@ -0,0 +1,96 @@
+import random
+import numpy as np
+import py_trees
+import pytest
+from py_trees.behaviour import Behaviour
+from py_trees.common import Status
+
+import World.simulation as simulation_module
+from Controllers.bt_compiler import CompiledBT, compile_bt
+from Controllers.bt_construction import build_bt, build_ppa_bt
+from World.config import SimConfig
+from World.simulation import BT_Simulation
+
+"""
+A leaf that returns random statuses and logs every update(), initialise(), and terminate() call to calls
+"""
+class TracedLeaf(Behaviour):
+    def __init__(self, name, rng, calls):
+        super().__init__(name)
+        self.rng = rng
+        self.calls = calls
+
+    def initialise(self):
+        self.calls.append(("initialise", self.name))
+
+    def terminate(self, new_status):
+        self.calls.append(("terminate", self.name, new_status))
+
+    def update(self):
+        self.calls.append(("update", self.name))
+        return self.rng.choice([Status.SUCCESS, Status.FAILURE, Status.RUNNING])
+
+"""
+Returns a random tree of Sequences, Selectors (with and without memory), Repeats, and TracedLeafs.
+Two calls with equally seeded rngs build identical trees whose leaves also draw the same statuses.
+"""
+def random_tree(rng, calls, depth=0, counter=None):
+    counter = counter if counter is not None else [0]
+    counter[0] += 1
+    name = f"node{counter[0]}"
+    kind = rng.random()
+    if depth > 3 or kind < 0.35:
+        return TracedLeaf(name, rng, calls)
+    if kind < 0.45:
+        return py_trees.decorators.Repeat(name, random_tree(rng, calls, depth + 1, counter), rng.randint(1, 3))
+    children = [random_tree(rng, calls, depth + 1, counter) for _ in range(rng.randint(1, 4))]
+    composite = py_trees.composites.Sequence if kind < 0.72 else py_trees.composites.Selector
+    return composite(name, rng.random() < 0.5, children=children)
+
+def preorder(node):
+    nodes = [node]
+    for child in getattr(node, "children", []):
+        nodes += preorder(child)
+    return nodes
+
+@pytest.mark.parametrize("seed", range(200))
+def test_compiled_bt_matches_py_trees(seed):
+    py_trees_calls = []
+    compiled_calls = []
+    original = random_tree(random.Random(seed), py_trees_calls)
+    tree = py_trees.trees.BehaviourTree(original)
+    compiled = compile_bt(random_tree(random.Random(seed), compiled_calls))
+    nodes = preorder(original)
+    for _ in range(30):
+        tree.tick()
+        compiled.tick()
+        assert compiled_calls == py_trees_calls
+        assert [compiled.node_status(i) for i in range(len(nodes))] == [node.status for node in nodes]
+        py_trees_calls.clear()
+        compiled_calls.clear()
+
+def root_status(bt):
+    return bt.node_status(0) if isinstance(bt, CompiledBT) else bt.root.status
+
+"""
+Returns the state of a seeded BT run after ticks ticks, with the trees built by builder
+"""
+def run_bt(monkeypatch, builder, compiled, sync, seed, ticks=60):
+    monkeypatch.setattr(simulation_module, "build_bt", builder)
+    np.random.seed(seed)
+    simulation = BT_Simulation(SimConfig(USE_COMPILED_BT=compiled, SYNC_UPDATE=sync))
+    for _ in range(ticks):
+        simulation.update()
+    store = simulation.store
+    return [store.positions, store.theta, store.speed, store.hunger, store.state, store.site_id,
+            np.array([agent.timer for agent in simulation.agents]), simulation.site_field.resources,
+            np.array([root_status(agent.bt).value for agent in simulation.agents])]
+
+@pytest.mark.parametrize("sync", [False, True])
+@pytest.mark.parametrize("builder", [build_bt, build_ppa_bt])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_seeded_runs_match_py_trees(monkeypatch, seed, builder, sync):
+    expected = run_bt(monkeypatch, builder, False, sync, seed)
+    actual = run_bt(monkeypatch, builder, True, sync, seed)
+    for a, b in zip(actual, expected):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from Controllers.bt_compiler import tree_nodes
+from World.config import SimConfig
+from World.simulation import FSM_Simulation, BT_Simulation
+
+"""
+Returns everything that can differ between two runs: the agents, sites, predators, and behavior trees
+"""
+def run_state(simulation):
+    store = simulation.store
+    state = [store.positions, store.theta, store.speed, store.hunger, store.state, store.site_id, store.following,
+             store.memory, store.timer, simulation.site_field.resources, simulation.predator_store.positions,
+             np.array(simulation.avg_hunger)]
+    if simulation.bt_store is not None:
+        state += [simulation.bt_store.status, simulation.bt_store.current_child, simulation.bt_store.count]
+    else:
+        state.append(np.array([[node.status.value for node in tree_nodes(agent.bt.root)] for agent in simulation.agents]))
+    return [np.array(value, copy=True) for value in state]
+
+@pytest.mark.parametrize("cls, cfg", [
+    (FSM_Simulation, SimConfig(NUM_PREDS=3)),
+    (FSM_Simulation, SimConfig(NUM_PREDS=2, SYNC_UPDATE=True, USE_BATCHED_MOVE=True, USE_BOID_MOVE=False)),
+    (FSM_Simulation, SimConfig(USE_VECTORIZED_FSM=True)),
+    (BT_Simulation, SimConfig(USE_BT=True, NUM_PREDS=2)),
+    (BT_Simulation, SimConfig(USE_BT=True, USE_COMPILED_BT=False, NUM_PREDS=2)),
+    (BT_Simulation, SimConfig(USE_BT=True, USE_VECTORIZED_BT=True)),
+])
+def test_restored_run_is_bit_identical(tmp_path, cls, cfg):
+    path = tmp_path / "checkpoint.npz"
+    np.random.seed(3)
+    simulation = cls(cfg)
+    for _ in range(40):
+        simulation.update()
+    simulation.save_checkpoint(path)
+    for _ in range(40):
+        simulation.update()
+    expected = run_state(simulation)
+
+    np.random.seed(99) # the checkpoint restores np.random too
+    restored = cls.load_checkpoint(path)
+    for _ in range(40):
+        restored.update()
+    for a, b in zip(run_state(restored), expected):
+        np.testing.assert_array_equal(a, b)
+
+def test_checkpoint_needs_the_same_kind_of_simulation(tmp_path):
+    path = tmp_path / "checkpoint.npz"
+    FSM_Simulation(SimConfig(NUM_AGENTS=5)).save_checkpoint(path)
+    with pytest.raises(ValueError):
+        BT_Simulation.load_checkpoint(path)
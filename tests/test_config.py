@@ -0,0 +1,32 @@
+import pytest
+
+from World.config import SimConfig
+
+def test_defaults():
+    cfg = SimConfig()
+    assert cfg.overrides == {}
+    for name, derive in SimConfig.DERIVED.items():
+        assert getattr(cfg, name) == derive(cfg)
+
+"""
+replace() recomputes the derived settings from the new values, unless they are overridden themselves
+"""
+def test_replace_recomputes_derived_settings():
+    cfg = SimConfig(NUM_AGENTS=40).replace(NUM_AGENTS=90, WORLD_SIZE=60, AGENT_SENSING_RADIUS=25)
+    assert cfg.overrides == {"NUM_AGENTS": 90, "WORLD_SIZE": 60, "AGENT_SENSING_RADIUS": 25}
+    assert cfg.MAX_NETWORK_SIZE == 90 // cfg.NUM_GROUPS + 1
+    assert cfg.AGENT_NEIGHBOR_THRESHOLD == 9
+    assert cfg.SITE_MAX_RADIUS == 15
+    assert cfg.AGENT_ORIENT_RADIUS == 2
+
+    pinned = SimConfig(MAX_NETWORK_SIZE=7, SITE_MAX_RADIUS=3).replace(NUM_AGENTS=90, WORLD_SIZE=60)
+    assert pinned.MAX_NETWORK_SIZE == 7 and pinned.SITE_MAX_RADIUS == 3
+    assert pinned.AGENT_NEIGHBOR_THRESHOLD == 9
+    # the config replace() is called on doesn't change
+    assert SimConfig(NUM_AGENTS=40).replace(NUM_AGENTS=90).overrides == {"NUM_AGENTS": 90}
+
+def test_unknown_settings_raise():
+    with pytest.raises(ValueError, match="NUM_AGENT"):
+        SimConfig(NUM_AGENT=10)
+    with pytest.raises(ValueError, match="num_agents"):
+        SimConfig().replace(num_agents=10)
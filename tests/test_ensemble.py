@@ -0,0 +1,66 @@
+import math
+import numpy as np
+import pytest
+
+from Controllers.network_fsm import NETWORK_STATES
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+from World.site_query import SiteQuery
+
+CFG = SimConfig(NUM_AGENTS=30)
+
+def run(ensemble, ticks):
+    for _ in range(ticks):
+        ensemble.update()
+    return ensemble
+
+"""
+Each replica draws from its own stream, so a replica runs the same alone as next to others
+"""
+def test_replica_runs_the_same_in_any_ensemble():
+    alone = run(FSM_Simulation.ensemble([22], CFG), 40)
+    together = run(FSM_Simulation.ensemble([11, 22, 33], CFG), 40)
+    for name in ("positions", "theta", "speed", "hunger", "state", "state_timer"):
+        np.testing.assert_array_equal(together.view(getattr(together.store, name))[1], alone.view(getattr(alone.store, name))[0])
+    # site ids are SiteField rows and leaders are agent rows, so they're offset by the replicas before
+    for name, offset in (("site_id", CFG.NUM_SITES), ("memory", CFG.NUM_SITES), ("following", CFG.NUM_AGENTS)):
+        ids = together.view(getattr(together.store, name))[1]
+        np.testing.assert_array_equal(np.where(ids >= 0, ids - offset, ids), alone.view(getattr(alone.store, name))[0])
+    np.testing.assert_array_equal(together.view(together.site_field.resources)[1], alone.view(alone.site_field.resources)[0])
+    np.testing.assert_array_equal(together.avg_hunger[1], alone.avg_hunger[0])
+    # the other replicas are different runs
+    assert not np.array_equal(together.view(together.store.positions)[0], together.view(together.store.positions)[1])
+
+def test_metrics():
+    ensemble = run(FSM_Simulation.ensemble([1, 2, 3], CFG), 30)
+    counts = ensemble.state_counts()
+    assert counts.shape == (3, len(NETWORK_STATES))
+    for r, state in enumerate(ensemble.view(ensemble.store.state)):
+        np.testing.assert_array_equal(counts[r], [np.count_nonzero(state == code) for code in NETWORK_STATES])
+    np.testing.assert_array_equal(counts.sum(axis=1), [CFG.NUM_AGENTS] * 3)
+    np.testing.assert_array_equal(ensemble.site_resources(), ensemble.view(ensemble.site_field.resources).sum(axis=1))
+
+def test_no_sites():
+    ensemble = run(FSM_Simulation.ensemble([1, 2], CFG.replace(NUM_SITES=0)), 20)
+    assert (ensemble.store.site_id == -1).all()
+    np.testing.assert_array_equal(ensemble.site_resources(), [0, 0])
+
+"""
+The ensemble's per-replica site masks settle distances at the radius like SiteQuery does for one world
+"""
+def test_per_replica_site_masks_match_site_query():
+    rng = np.random.default_rng(0)
+    num_replicas, num_agents, num_sites = 3, 40, 4
+    site_pos = rng.uniform(5, 25, (num_replicas, num_sites, 2))
+    radii = rng.uniform(1, 4, (num_replicas, num_sites))
+    positions = rng.uniform(0, 30, (num_replicas, num_agents, 2))
+    angles = rng.uniform(-np.pi, np.pi, (num_replicas, num_sites))
+    positions[:, :num_sites] = site_pos + radii[:, :, None] * np.stack([np.cos(angles), np.sin(angles)], axis=2) # on the edge
+    replica = np.repeat(np.arange(num_replicas), num_agents)
+    in_range, at = SiteQuery.within_masks(positions.reshape(-1, 2), site_pos[replica], [5.0 + radii[replica], radii[replica]])
+    for r in range(num_replicas):
+        rows = slice(r * num_agents, (r + 1) * num_agents)
+        dist = np.array([[math.dist(p, s) for s in site_pos[r]] for p in positions[r]])
+        np.testing.assert_array_equal(at[rows], dist <= radii[r])
+        np.testing.assert_array_equal(in_range[rows], dist <= 5.0 + radii[r])
+        np.testing.assert_array_equal(at[rows], SiteQuery.at_mask(positions[r], site_pos[r], radii[r]))
@@ -0,0 +1,100 @@
+import numpy as np
+
+from World.fission_fusion import FissionFusionTracker, connected_components
+
+GROUPS = np.array([0, 0, 1, 1, 0, 1, 0, 1])
+
+"""
+Returns the CSR neighbor lists (indptr, indices) of num_agents agents linked by the undirected edges
+"""
+def csr(num_agents, edges):
+    lists = [[] for _ in range(num_agents)]
+    for u, v in edges:
+        lists[u].append(v)
+        lists[v].append(u)
+    indptr = np.zeros(num_agents + 1, dtype=np.int64)
+    np.cumsum([len(neighbors) for neighbors in lists], out=indptr[1:])
+    indices = np.array([v for neighbors in lists for v in sorted(neighbors)], dtype=np.int64)
+    return indptr, indices
+
+def summary(events):
+    return [(e["event"], e["before"], e["before_sizes"], e["before_groups"], e["after"], e["after_sizes"], e["after_groups"])
+            for e in events]
+
+def test_connected_components():
+    u = np.array([5, 3, 6, 1])
+    v = np.array([1, 0, 6, 5])
+    np.testing.assert_array_equal(connected_components(7, u, v), [0, 1, 2, 0, 3, 1, 4])
+    np.testing.assert_array_equal(connected_components(3, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)), [0, 1, 2])
+
+def test_split_merge_appear_vanish():
+    tracker = FissionFusionTracker()
+    step = lambda edges: summary(tracker.step(*csr(8, edges), GROUPS, 2))
+
+    # two subgroups, 6 and 7 alone
+    assert step([(0, 1), (1, 2), (2, 3), (4, 5)]) == [
+        ("birth", [], [], [], [0], [4], [[2, 2]]),
+        ("birth", [], [], [], [1], [2], [[1, 1]])]
+    assert tracker.labels.tolist() == [0, 0, 0, 0, 1, 1, -1, -1]
+    # nothing changes
+    assert step([(0, 1), (1, 2), (2, 3), (4, 5)]) == []
+    assert tracker.labels.tolist() == [0, 0, 0, 0, 1, 1, -1, -1]
+
+    # 0 splits in two; on a tie, the half with the lowest agent keeps the id
+    assert step([(0, 1), (2, 3), (4, 5)]) == [("fission", [0], [4], [[2, 2]], [0, 2], [2, 2], [[2, 0], [0, 2]])]
+    assert tracker.labels.tolist() == [0, 0, 2, 2, 1, 1, -1, -1]
+
+    # 2 and 1 merge and the merged subgroup keeps 2's id
+    assert step([(0, 1), (2, 3), (3, 4), (4, 5)]) == [("fusion", [2, 1], [2, 2], [[0, 2], [1, 1]], [2], [4], [[1, 3]])]
+    assert tracker.labels.tolist() == [0, 0, 2, 2, 2, 2, -1, -1]
+
+    # 0 breaks up into lone agents and 6 and 7 meet
+    assert step([(2, 3), (3, 4), (4, 5), (6, 7)]) == [
+        ("birth", [], [], [], [3], [2], [[1, 1]]),
+        ("death", [0], [2], [[2, 0]], [], [], [])]
+    assert tracker.labels.tolist() == [-1, -1, 2, 2, 2, 2, 3, 3]
+    assert tracker.counts == {"fission": 1, "fusion": 1, "birth": 3, "death": 1}
+    assert [event["tick"] for event in tracker.events] == [0, 0, 2, 3, 4, 4]
+
+"""
+An id stays only with the component that is the largest overlap of the old one and whose own largest
+overlap is the old one
+"""
+def test_ids_follow_mutual_largest_overlap():
+    tracker = FissionFusionTracker()
+    tracker.step(*csr(8, [(0, 1), (1, 2), (2, 3), (3, 4), (5, 6), (6, 7)]), GROUPS, 2)
+    assert tracker.labels.tolist() == [0, 0, 0, 0, 0, 1, 1, 1]
+
+    # 0 splits into {0, 1} and {2, 3, 4}; {2, 3, 4} is the larger part, so it keeps id 0 even though agent 0 left it.
+    # 1 loses 6 to it, and what is left of 1 keeps id 1
+    events = tracker.step(*csr(8, [(0, 1), (2, 3), (3, 4), (4, 6), (5, 7)]), GROUPS, 2)
+    assert tracker.labels.tolist() == [2, 2, 0, 0, 0, 1, 0, 1]
+    assert summary(events) == [
+        ("fission", [0], [5], [[3, 2]], [2, 0], [2, 4], [[2, 0], [2, 2]]),
+        ("fission", [1], [3], [[1, 2]], [0, 1], [4, 2], [[2, 2], [0, 2]]),
+        ("fusion", [0, 1], [5, 3], [[3, 2], [1, 2]], [0], [4], [[2, 2]])]
+
+    # 5 joins 2 and 7 is left alone: 1's largest overlap is the new {0, 1, 5}, but that component's largest overlap is 2, so id 1 is gone
+    events = tracker.step(*csr(8, [(0, 1), (1, 5), (2, 3), (3, 4), (4, 6)]), GROUPS, 2)
+    assert tracker.labels.tolist() == [2, 2, 0, 0, 0, 2, 0, -1]
+    assert summary(events) == [("fusion", [2, 1], [2, 2], [[2, 0], [0, 2]], [2], [3], [[2, 1]])]
+
+def test_min_size():
+    tracker = FissionFusionTracker(min_size=3)
+    # a pair isn't a subgroup
+    assert summary(tracker.step(*csr(8, [(0, 1)]), GROUPS, 2)) == []
+    assert tracker.labels.tolist() == [-1] * 8
+    assert summary(tracker.step(*csr(8, [(0, 1), (1, 2)]), GROUPS, 2)) == [("birth", [], [], [], [0], [3], [[2, 1]])]
+    # shrinking below min_size is the end of the subgroup, and a pair splitting off isn't a fission
+    assert summary(tracker.step(*csr(8, [(0, 1), (1, 2), (2, 3), (4, 5)]), GROUPS, 2)) == []
+    assert summary(tracker.step(*csr(8, [(0, 1), (2, 3)]), GROUPS, 2)) == [("death", [0], [4], [[2, 2]], [], [], [])]
+
+def test_same_group_only_links_group_members():
+    edges = [(0, 1), (1, 2), (2, 3), (4, 6)]
+    everyone = FissionFusionTracker()
+    everyone.step(*csr(8, edges), GROUPS, 2)
+    assert everyone.labels.tolist() == [0, 0, 0, 0, 1, -1, 1, -1]
+    by_group = FissionFusionTracker(same_group=True)
+    events = by_group.step(*csr(8, edges), GROUPS, 2)
+    assert by_group.labels.tolist() == [0, 0, 1, 1, 2, -1, 2, -1]
+    assert [event["after_groups"] for event in events] == [[[2, 0]], [[0, 2]], [[2, 0]]]
@@ -0,0 +1,65 @@
+import itertools
+import numpy as np
+
+from World.generation import _cap_degree, _pairs, assign_groups, random_network_csr
+
+"""
+The network build_neighbor_matrix() used to make one pair at a time: a pair is linked if its coin came
+up and both of its agents still have fewer than max_degree links. Returns every agent's sorted neighbors.
+"""
+def greedy_network(num_nodes, coins, max_degree):
+    network = [[] for _ in range(num_nodes)]
+    for (i, j), coin in zip(itertools.combinations(range(num_nodes), 2), coins):
+        if coin and len(network[i]) < max_degree and len(network[j]) < max_degree:
+            network[i].append(j)
+            network[j].append(i)
+    return [sorted(neighbors) for neighbors in network]
+
+def rows(indptr, indices):
+    return [indices[indptr[i]:indptr[i + 1]].tolist() for i in range(len(indptr) - 1)]
+
+def test_pairs():
+    for num_nodes in (0, 1, 2, 3, 7, 50, 301):
+        expected = list(itertools.combinations(range(num_nodes), 2))
+        i, j = _pairs(num_nodes, np.arange(len(expected)))
+        assert list(zip(i.tolist(), j.tolist())) == expected
+
+def test_cap_degree_matches_the_greedy_loop():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        num_nodes = int(rng.integers(2, 40))
+        max_degree = int(rng.integers(0, 8))
+        num_pairs = num_nodes * (num_nodes - 1) // 2
+        coins = rng.random(num_pairs) < rng.uniform(0.05, 1.0)
+        u, v = _pairs(num_nodes, np.flatnonzero(coins))
+        u, v = _cap_degree(num_nodes, u, v, max_degree)
+        network = [[] for _ in range(num_nodes)]
+        for i, j in zip(u.tolist(), v.tolist()):
+            network[i].append(j)
+            network[j].append(i)
+        assert [sorted(neighbors) for neighbors in network] == greedy_network(num_nodes, coins, max_degree)
+
+"""
+random_network_csr() keeps the links of the uncapped network that the greedy loop would keep, and every
+row is sorted and mirrored by the rows of its neighbors
+"""
+def test_random_network_csr_matches_the_greedy_loop():
+    rng = np.random.default_rng(1)
+    for case in range(200):
+        num_nodes = int(rng.integers(0, 60))
+        p = float(rng.uniform(0.01, 1.0))
+        max_degree = int(rng.integers(1, 10))
+        indptr, indices = random_network_csr(np.random.default_rng(case), num_nodes, p, max_degree)
+        uncapped = rows(*random_network_csr(np.random.default_rng(case), num_nodes, p))
+        coins = [j in uncapped[i] for i, j in itertools.combinations(range(num_nodes), 2)]
+        network = rows(indptr, indices)
+        assert network == greedy_network(num_nodes, coins, max_degree)
+        for i, neighbors in enumerate(network):
+            assert neighbors == sorted(set(neighbors)) and i not in neighbors
+            assert len(neighbors) <= max_degree
+            assert all(i in network[j] for j in neighbors)
+
+def test_assign_groups_caps_group_sizes():
+    for seed in range(20):
+        groups = assign_groups(np.random.default_rng(seed), 50, 3, 17)
+        assert np.bincount(groups, minlength=3).max() <= 17
@@ -0,0 +1,88 @@
+import math
+import numpy as np
+
+from World.config import SimConfig
+from World.metrics import (hunger_percentiles, site_occupancy, group_cohesion, polarization,
+                           nearest_neighbor_distance, HUNGER_PERCENTILES, RunningStats)
+from World.simulation import FSM_Simulation
+from World.site_query import SiteQuery
+
+"""
+Returns a small simulation with every agent and site placed by hand: agent 2 is exactly on the border of
+site 0, agent 3 is just outside it, agent 4 is at site 1, and agent 5 is alone in a corner
+"""
+def fixed_simulation():
+    np.random.seed(0)
+    simulation = FSM_Simulation(SimConfig(NUM_AGENTS=6, NUM_SITES=2, NUM_GROUPS=2))
+    store = simulation.store
+    store.positions[:] = [[10.0, 10.0], [11.0, 10.5], [13.0, 10.0], [13.0 + 1e-9, 10.0], [14.0, 11.0], [28.0, 2.0]]
+    store.group[:] = [0, 0, 1, 1, 0, 1]
+    store.hunger[:] = [5, 90, 12, 40, 40, 71]
+    store.theta[:] = [0.0, 0.1, np.pi, 0.5, -0.3, 2.0]
+    field = simulation.site_field
+    field.positions[:] = [[10.0, 10.0], [15.0, 11.0]]
+    field.radii[:] = [3.0, 2.0]
+    return simulation
+
+def test_site_occupancy_matches_numpy():
+    simulation = fixed_simulation()
+    positions = simulation.store.positions
+    field = simulation.site_field
+    dist = np.array([[math.dist(p, s) for s in field.positions] for p in positions])
+    np.testing.assert_array_equal(site_occupancy(simulation), (dist <= field.radii).sum(axis=0))
+    np.testing.assert_array_equal(site_occupancy(simulation), [3, 1])
+    query = SiteQuery(positions, simulation.sites, simulation.cfg.AGENT_SENSING_RADIUS, field=field)
+    np.testing.assert_array_equal(SiteQuery.at_mask(positions, field.positions, field.radii), query.at)
+
+def test_agent_metrics_match_numpy():
+    simulation = fixed_simulation()
+    store = simulation.store
+    np.testing.assert_allclose(hunger_percentiles(simulation), np.percentile(store.hunger, HUNGER_PERCENTILES))
+
+    expected = [np.linalg.norm(store.positions[store.group == g] - store.positions[store.group == g].mean(axis=0), axis=1).mean()
+                for g in range(2)]
+    np.testing.assert_allclose(group_cohesion(simulation), expected)
+
+    heading = np.stack([np.cos(store.theta), np.sin(store.theta)], axis=1).mean(axis=0)
+    np.testing.assert_allclose(polarization(simulation), np.linalg.norm(heading))
+
+    diff = store.positions[:, None, :] - store.positions[None, :, :]
+    dist = np.linalg.norm(diff, axis=2) + np.diag(np.full(store.num_agents, np.inf))
+    nearest = dist.min(axis=1)
+    expected = nearest[nearest < simulation.cfg.AGENT_SENSING_RADIUS].mean()
+    np.testing.assert_allclose(nearest_neighbor_distance(simulation), expected)
+    simulation.neighbor_csr = simulation.spatial_hash.neighbor_csr(store.positions, simulation.cfg.AGENT_SENSING_RADIUS)
+    np.testing.assert_allclose(nearest_neighbor_distance(simulation), expected)
+
+"""
+Merging the stats of the parts of a stream gives the stats of the whole stream; nan entries are skipped,
+including in a part where an entry is never seen
+"""
+def test_running_stats_merge_matches_one_stream():
+    rng = np.random.default_rng(0)
+    values = rng.normal(5.0, 3.0, (120, 3))
+    values[rng.random((120, 3)) < 0.2] = np.nan
+    values[40:70, 1] = np.nan
+    values[:, 2] = np.nan
+    whole = RunningStats()
+    for value in values:
+        whole.update(value)
+    merged = RunningStats()
+    merged.merge(RunningStats()) # an empty part
+    for part in np.split(values, [1, 40, 70, 71]):
+        stats = RunningStats()
+        for value in part:
+            stats.update(value)
+        merged.merge(stats)
+    np.testing.assert_array_equal(merged.count, whole.count)
+    np.testing.assert_array_equal(merged.count, np.count_nonzero(~np.isnan(values), axis=0))
+    np.testing.assert_allclose(merged.mean, whole.mean)
+    np.testing.assert_allclose(merged.std(), whole.std())
+    np.testing.assert_array_equal(merged.min, whole.min)
+    np.testing.assert_array_equal(merged.max, whole.max)
+    summary = merged.summary()
+    np.testing.assert_allclose(summary["mean"][:2], np.nanmean(values[:, :2], axis=0))
+    np.testing.assert_allclose(summary["std"][:2], np.nanstd(values[:, :2], axis=0))
+    np.testing.assert_array_equal(summary["min"][:2], np.nanmin(values[:, :2], axis=0))
+    np.testing.assert_array_equal(summary["max"][:2], np.nanmax(values[:, :2], axis=0))
+    assert all(math.isnan(summary[name][2]) for name in ("mean", "std", "min", "max"))
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+from Model.movement import boid_step, laplacian_terms
+
+"""
+Returns a simulation in the middle of a synchronous tick (sense_all() has run and the moves are batched),
+with the agents packed close together so most have several neighbors from both their own and other
+groups. Agent 1 sits exactly on agent 0 and the last agent has no neighbors.
+"""
+def crowded_tick(seed, use_boid_move):
+    np.random.seed(seed)
+    sim = FSM_Simulation(SimConfig(NUM_AGENTS=60, SYNC_UPDATE=True, USE_BATCHED_MOVE=True, USE_BOID_MOVE=use_boid_move))
+    for _ in range(3):
+        sim.update()
+    rng = np.random.default_rng(seed)
+    store = sim.store
+    store.positions[:] = rng.uniform(2, 10, store.positions.shape)
+    store.positions[1] = store.positions[0]
+    store.positions[-1] = [28.0, 28.0]
+    store.theta[:] = rng.uniform(-np.pi, np.pi, store.num_agents)
+    store.speed[:] = rng.uniform(1.0, sim.cfg.MAX_SPEED, store.num_agents)
+    sim.sense_all()
+    return sim
+
+@pytest.mark.parametrize("seed", range(3))
+def test_boid_rows_match_agent_move(seed):
+    sim = crowded_tick(seed, use_boid_move=True)
+    batch = sim.boid_moves
+    assert batch is not None and batch.has_neighbors.sum() > 50 and not batch.has_neighbors[-1]
+    for agent in sim.agents:
+        pos, theta = agent.pos.copy(), float(agent.theta)
+        sim.boid_moves = None # the per-agent loop over the neighbors
+        agent.move(sim.get_neighbor_ids(agent), [])
+        assert np.allclose(agent.pos, batch.new_positions[agent.id], rtol=0, atol=1e-12)
+        assert np.isclose(agent.theta, batch.new_theta[agent.id], rtol=0, atol=1e-12)
+        agent.pos, agent.theta = pos, theta
+        sim.boid_moves = batch # the batched row
+        agent.move(sim.get_neighbor_ids(agent), [])
+        assert np.allclose(agent.pos, batch.new_positions[agent.id], rtol=0, atol=0)
+        agent.pos, agent.theta = pos, theta
+
+@pytest.mark.parametrize("seed", range(3))
+def test_laplacian_rows_match_agent_repulse_move(seed):
+    sim = crowded_tick(seed, use_boid_move=False)
+    batch = sim.laplacian_moves
+    assert batch is not None
+    for agent in sim.agents:
+        neighbors = sim.get_neighbor_ids(agent)
+        pos = agent.pos.copy()
+        sim.laplacian_moves = None
+        agent.repulse_move(neighbors, [], attr_factor=0.5, diff_factor=0.7)
+        expected = agent.pos.copy()
+        agent.pos = pos
+        sim.laplacian_moves = batch
+        agent.repulse_move(neighbors, [], attr_factor=0.5, diff_factor=0.7)
+        assert np.allclose(agent.pos, expected, rtol=0, atol=1e-10)
+        if not neighbors:
+            assert np.array_equal(agent.pos, pos)
+        agent.pos = pos
+
+"""
+A batched move is only used while the agent is still where the kernel assumed; an agent that has moved
+since sense_all() falls back to the loop
+"""
+def test_stale_rows_are_not_used():
+    sim = crowded_tick(0, use_boid_move=True)
+    agent = sim.agents[5]
+    agent.pos = agent.pos + 0.25
+    assert not sim.boid_moves.matches(agent.id, agent.pos, agent.theta, agent.speed)
+
+"""
+With ids, the kernels only compute the rows of those agents, and the rows are the ones the full kernels compute
+"""
+@pytest.mark.parametrize("seed", range(3))
+def test_selected_rows_match_full_kernels(seed):
+    sim = crowded_tick(seed, use_boid_move=True)
+    store = sim.store
+    ids = np.sort(np.random.default_rng(seed).choice(store.num_agents, 20, replace=False))
+    ids[-1] = store.num_agents - 1 # no neighbors
+    full = boid_step(store, *sim.neighbor_csr, sim.cfg)
+    selected = boid_step(store, *sim.neighbor_csr, sim.cfg, ids=ids)
+    for a, b in zip(selected, full):
+        np.testing.assert_array_equal(a, b[ids])
+    full = laplacian_terms(store, *sim.neighbor_csr)
+    selected = laplacian_terms(store, *sim.neighbor_csr, ids=ids)
+    for a, b in zip(selected, full):
+        np.testing.assert_array_equal(a, b[ids])
+    assert all(len(a) == 0 for a in boid_step(store, *sim.neighbor_csr, sim.cfg, ids=ids[:0]))
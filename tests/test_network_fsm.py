@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+
+"""
+network_step() against the object-based synchronous tick. np.random is pinned to fixed values, so every
+draw the object-based states make one at a time is the same value network_step() draws as an array, and
+the two have to agree agent for agent, tick after tick.
+"""
+
+"""
+Returns two copies of a seeded run that has been going long enough for every network state to show up
+"""
+def twin_simulations(seed, use_boid_move, **overrides):
+    np.random.seed(seed)
+    simulation = FSM_Simulation(SimConfig(NUM_AGENTS=60, SYNC_UPDATE=True, USE_BOID_MOVE=use_boid_move, **overrides))
+    for _ in range(40):
+        simulation.update()
+    checkpoint = simulation.checkpoint()
+    return FSM_Simulation.from_checkpoint(checkpoint), FSM_Simulation.from_checkpoint(checkpoint)
+
+@pytest.mark.parametrize("fraction", [0.1, 0.3, 0.9]) # neither seek nor listen, listen only, both
+@pytest.mark.parametrize("use_boid_move", [True, False])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_network_step_matches_object_sync_tick(pin_draws, seed, use_boid_move, fraction):
+    objects, vectorized = twin_simulations(seed, use_boid_move)
+    assert len(np.unique(objects.store.state)) == 5
+    pin_draws(fraction)
+    vectorized.use_vectorized_fsm = True
+    assert run_twins(objects, vectorized, 10) > 0
+
+"""
+Runs both simulations for ticks ticks, checks that they agree after every tick, and returns how many
+state transitions there were
+"""
+def run_twins(objects, vectorized, ticks):
+    transitions = 0
+    for _ in range(ticks):
+        before = objects.store.state.copy()
+        objects.update()
+        vectorized.update()
+
+        expected = objects.store
+        actual = vectorized.store
+        transitions += (expected.state != before).sum()
+        np.testing.assert_array_equal(actual.state, expected.state)
+        np.testing.assert_array_equal(actual.site_id, expected.site_id)
+        np.testing.assert_array_equal(actual.following, expected.following)
+        np.testing.assert_array_equal(actual.memory, expected.memory)
+        np.testing.assert_array_equal(actual.state_timer, expected.state_timer)
+        np.testing.assert_array_equal(actual.hunger, expected.hunger)
+        np.testing.assert_allclose(actual.positions, expected.positions, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(actual.theta, expected.theta, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(actual.speed, expected.speed, rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(vectorized.site_field.resources, objects.site_field.resources)
+    return transitions
+
+"""
+Without sites, no agent can seek or rest at one; the agents just flock and explore
+"""
+@pytest.mark.parametrize("fraction", [0.1, 0.9])
+def test_network_step_without_sites(pin_draws, fraction):
+    objects, vectorized = twin_simulations(0, True, NUM_SITES=0)
+    pin_draws(fraction)
+    vectorized.use_vectorized_fsm = True
+    run_twins(objects, vectorized, 10)
+    assert (vectorized.store.site_id == -1).all()
@@ -0,0 +1,56 @@
+import math
+import numpy as np
+import pytest
+
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+
+CFG = SimConfig(NUM_PREDS=8)
+
+def twin_simulations(seed):
+    np.random.seed(seed)
+    simulation = FSM_Simulation(CFG)
+    return simulation, FSM_Simulation.from_checkpoint(simulation.checkpoint())
+
+"""
+PredatorStore.step() moves the predators like Predator.update() does when every predator sees the agents
+within PREDATOR_SENSING_RADIUS, in ascending id order
+"""
+@pytest.mark.parametrize("fraction", [0.1, 0.9])
+def test_step_matches_predator_update(pin_draws, fraction):
+    vectorized, objects = twin_simulations(5)
+    pin_draws(fraction)
+    rng = np.random.default_rng(0)
+    hunts = 0
+    for _ in range(40):
+        vectorized.update_predators()
+        for predator in objects.predators:
+            predator.neighbors = [agent for agent in objects.agents
+                                  if math.dist(agent.pos, predator.pos) <= CFG.PREDATOR_SENSING_RADIUS]
+            predator.update()
+        np.testing.assert_array_equal(vectorized.predator_store.target, objects.predator_store.target)
+        for name in ("positions", "theta", "speed"):
+            np.testing.assert_allclose(getattr(vectorized.predator_store, name), getattr(objects.predator_store, name), atol=1e-9)
+        hunts += int((vectorized.predator_store.target >= 0).sum())
+        # the agents wander the same way in both worlds, so targets get away now and then
+        moved = np.clip(vectorized.store.positions + rng.uniform(-1, 1, (CFG.NUM_AGENTS, 2)), CFG.PADDING, CFG.WORLD_SIZE - CFG.PADDING)
+        vectorized.store.positions[:] = moved
+        objects.store.positions[:] = moved
+    assert hunts > 0
+
+"""
+The predators sensed through the spatial hash are the ones the scan over every predator finds
+"""
+def test_get_predators_matches_the_scan():
+    simulation, _ = twin_simulations(6)
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        simulation.predator_store.positions[:] = rng.uniform(0, CFG.WORLD_SIZE, (CFG.NUM_PREDS, 2))
+        # one predator exactly at the sensing radius of agent 0
+        simulation.store.positions[0] = [10.0, 10.0]
+        simulation.predator_store.positions[0] = [10.0 + min(CFG.AGENT_SENSING_RADIUS, CFG.PREDATOR_SENSING_RADIUS), 10.0]
+        simulation.sense_predators()
+        sensed = [[predator.id for predator in simulation.get_predators(agent)] for agent in simulation.agents]
+        simulation.predator_sensing = None
+        assert sensed == [[predator.id for predator in simulation.get_predators(agent)] for agent in simulation.agents]
+        assert 0 in sensed[0]
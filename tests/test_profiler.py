@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from Controllers.states import STATES
+from World.config import SimConfig
+from World.profiler import BehaviorProfiler, TickProfiler
+from World.simulation import FSM_Simulation, BT_Simulation
+
+def seeded(cls, seed, **overrides):
+    np.random.seed(seed)
+    return cls(SimConfig(NUM_AGENTS=30, **overrides))
+
+def run(simulation, ticks=20):
+    for _ in range(ticks):
+        simulation.update()
+    return np.array(simulation.store.positions, copy=True)
+
+@pytest.mark.parametrize("cls, overrides", [(FSM_Simulation, {}), (BT_Simulation, {"USE_BT": True}),
+                                            (BT_Simulation, {"USE_BT": True, "USE_COMPILED_BT": False})])
+def test_profiling_does_not_change_the_run(cls, overrides):
+    expected = run(seeded(cls, 4, **overrides))
+    simulation = seeded(cls, 4, **overrides)
+    with TickProfiler().enable(simulation) as ticks, BehaviorProfiler().enable(simulation) as behavior:
+        np.testing.assert_array_equal(run(simulation), expected)
+    assert ticks.report()["ticks"] == 20 and behavior.report()["ticks"] == 20
+    assert simulation.profiler is None and simulation.behavior_profiler is None and not simulation.recorders
+
+"""
+The FSM states are shared by every simulation, so profiling one simulation mustn't touch them
+"""
+def test_fsm_profiling_is_per_simulation():
+    first = seeded(FSM_Simulation, 1)
+    second = seeded(FSM_Simulation, 2)
+    with BehaviorProfiler().enable(first) as profiler_1, BehaviorProfiler().enable(second) as profiler_2:
+        assert all("update" not in vars(state) and "move" not in vars(state) for state in STATES)
+        run(first, 10)
+        run(second, 5)
+    report_1, report_2 = profiler_1.report(), profiler_2.report()
+    assert sum(node["ticks"] for path, node in report_1["nodes"].items() if ";" not in path) == 10 * 30
+    assert sum(node["ticks"] for path, node in report_2["nodes"].items() if ";" not in path) == 5 * 30
+    assert np.asarray(report_1["transitions"]).sum() == 10 * 30
+
+def test_with_block_disables_after_an_exception():
+    simulation = seeded(FSM_Simulation, 3)
+    with pytest.raises(RuntimeError):
+        with TickProfiler().enable(simulation), BehaviorProfiler().enable(simulation):
+            run(simulation, 2)
+            raise RuntimeError("stopped mid-run")
+    assert simulation.profiler is None and simulation.behavior_profiler is None and not simulation.recorders
+    assert "update_agents" not in vars(simulation)
+    assert all("update" not in vars(agent) for agent in simulation.agents)
+    # a later simulation can be profiled as usual
+    later = seeded(FSM_Simulation, 3)
+    with BehaviorProfiler().enable(later) as profiler:
+        run(later, 2)
+    assert profiler.report()["ticks"] == 2
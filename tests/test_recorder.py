@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from World.config import SimConfig
+from World.recorder import COLUMNS, TrajectoryRecorder, load_trajectory
+from World.simulation import FSM_Simulation
+
+"""
+Every stride-th tick comes back from load_trajectory() as it was during the run, including the last,
+partly filled chunk
+"""
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, compress):
+    np.random.seed(2)
+    simulation = FSM_Simulation(SimConfig(NUM_AGENTS=20))
+    expected = {name: [] for name in ("tick", *COLUMNS)}
+    with TrajectoryRecorder(tmp_path, stride=3, chunk_size=4, compress=compress).attach(simulation) as recorder:
+        for tick in range(35):
+            simulation.update()
+            if tick % 3 == 0:
+                expected["tick"].append(tick)
+                for name, (values, dtype) in COLUMNS.items():
+                    expected[name].append(np.array(values(simulation), dtype=dtype))
+        recorder.detach(simulation)
+    assert recorder.num_samples == 12 and recorder.num_chunks == 3
+
+    trajectory = load_trajectory(tmp_path)
+    assert set(trajectory) == set(expected)
+    for name, values in expected.items():
+        assert trajectory[name].dtype == np.asarray(values).dtype
+        np.testing.assert_array_equal(trajectory[name], values)
+    assert not np.array_equal(trajectory["positions"][0], trajectory["positions"][-1])
+    if not compress:
+        assert isinstance(trajectory["positions"], np.memmap)
+        np.testing.assert_array_equal(load_trajectory(tmp_path, mmap=False)["positions"], expected["positions"])
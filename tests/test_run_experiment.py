@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from run_experiment import run_trials, trial_seeds, burn_in, run_forks
+from World.simulation import FSM_Simulation
+from World.config import SimConfig
+
+CFG = SimConfig(NUM_AGENTS=20, NUM_ITERS=15)
+
+"""
+Returns a trial's statistics with the metrics as plain numbers, so two trials can be compared with ==
+"""
+def plain(result):
+    return {**result, "metrics": result["metrics"].summary()}
+
+def test_trials_do_not_depend_on_the_worker_count():
+    seeds = trial_seeds(0, 4)
+    serial = run_trials(seeds, 1, CFG)
+    parallel = run_trials(seeds, 2, CFG)
+    assert [plain(result) for result in parallel] == [plain(result) for result in serial]
+    assert len({result["end_hunger"] for result in serial}) > 1 # the trials really have their own seeds
+
+def test_forks_do_not_depend_on_the_worker_count():
+    seeds = trial_seeds(1, 5)
+    snapshot = burn_in(seeds[0], 10, CFG)
+    cfgs = [None, None, CFG.replace(AGENT_SENSING_RADIUS=3), None]
+    serial = run_forks(snapshot, seeds[1:], cfgs, num_workers=1)
+    parallel = run_forks(snapshot, seeds[1:], cfgs, num_workers=2)
+    assert [plain(result) for result in parallel] == [plain(result) for result in serial]
+    # every fork starts from the burn-in, but goes on with its own seed
+    assert len({result["start_hunger"] for result in serial}) == 1
+    assert len({result["end_hunger"] for result in serial}) > 1
+    unchanged = run_forks(snapshot, seeds[3:4], num_workers=1)[0]
+    assert plain(unchanged) != plain(serial[2]) # the smaller sensing radius changed the run
+
+    # a setting that fixes the shape of the saved arrays can't change; any other setting can
+    for name in FSM_Simulation.CHECKPOINT_LAYOUT:
+        if name != "USE_COMPILED_BT":
+            with pytest.raises(ValueError):
+                FSM_Simulation.from_checkpoint(snapshot, CFG.replace(**{name: getattr(CFG, name) + 1}))
+    with pytest.raises(ValueError):
+        FSM_Simulation.from_checkpoint(snapshot, CFG.replace(USE_COMPILED_BT=False))
+    forked = FSM_Simulation.from_checkpoint(snapshot, CFG.replace(AGENT_SENSING_RADIUS=3))
+    assert forked.cfg.AGENT_SENSING_RADIUS == 3
+    np.testing.assert_array_equal(forked.store.positions, FSM_Simulation.from_checkpoint(snapshot).store.positions)
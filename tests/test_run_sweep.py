@@ -0,0 +1,19 @@
+from run_experiment import run_trial
+from run_sweep import run_sweep, sweep_grid, sweep_seeds
+from World.config import SimConfig
+
+"""
+A config's seeds depend only on the master seed and its index, so adding configs or trials keeps them
+"""
+def test_sweep_seeds_are_stable():
+    seeds = sweep_seeds(7, 3, 4)
+    assert sweep_seeds(7, 5, 4)[:3] == seeds
+    assert [config_seeds[:4] for config_seeds in sweep_seeds(7, 3, 6)] == seeds
+    assert len({seed for config_seeds in seeds for seed in config_seeds}) == 12
+    assert sweep_seeds(8, 3, 4) != seeds
+
+def test_run_sweep_runs_each_config_with_its_seeds():
+    configs = sweep_grid({"AGENT_SENSING_RADIUS": [3, 6]}, SimConfig(NUM_AGENTS=15, NUM_ITERS=10))
+    results = run_sweep(configs, trials_per_config=2, num_workers=1, master_seed=3)
+    for cfg, seeds, trials in zip(configs, sweep_seeds(3, 2, 2), results):
+        assert [trial["end_hunger"] for trial in trials] == [run_trial(seed, cfg)["end_hunger"] for seed in seeds]
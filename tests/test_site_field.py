@@ -0,0 +1,33 @@
+import numpy as np
+
+from Model.feeding_site import Site
+from Model.site_field import SiteField
+
+def field_with_sites(resources):
+    field = SiteField(len(resources))
+    sites = [Site(np.array([5.0 * i, 0.0]), 1, 3, amount, id=i, field=field) for i, amount in enumerate(resources)]
+    return field, sites
+
+"""
+Sites grazed past what they hold keep their resources for the rest of the tick and end the tick at 0
+"""
+def test_over_grazing_clamps_at_zero():
+    field, sites = field_with_sites([2, 5, 1])
+    field.consume_many([0, 0, 0, 1, 1])
+    for _ in range(3):
+        sites[0].consume()
+        np.testing.assert_array_equal(field.resources, [2, 5, 1])
+        assert all(site.is_available() for site in sites)
+    sites[1].consume(2)
+    field.consume_many(np.zeros(0, dtype=np.int64))
+    np.testing.assert_array_equal(field.pending, [6, 4, 0])
+    field.apply_consumption()
+    np.testing.assert_array_equal(field.resources, [0, 1, 1])
+    np.testing.assert_array_equal(field.pending, [0, 0, 0])
+    assert [site.is_available() for site in sites] == [False, True, True]
+
+    # the next tick starts from the clamped counts
+    field.consume_many([1, 1, 1, 2])
+    field.apply_consumption()
+    np.testing.assert_array_equal(field.resources, [0, 0, 0])
+    assert (field.resources >= 0).all()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from World.config import SimConfig
+from World.simulation import FSM_Simulation, BT_Simulation
+
+def seeded_run(cls, cfg, ticks=60):
+    np.random.seed(9)
+    simulation = cls(cfg)
+    for _ in range(ticks):
+        simulation.update()
+    store = simulation.store
+    return [np.array(value, copy=True) for value in (store.positions, store.theta, store.hunger, store.state, store.site_id,
+                                                     store.memory, simulation.site_field.resources)]
+
+"""
+SiteQuery gives the same sites as the per-agent math.dist checks, so the run is the same with it off
+"""
+@pytest.mark.parametrize("cls, cfg", [
+    (FSM_Simulation, SimConfig(NUM_SITES=6)),
+    (FSM_Simulation, SimConfig(NUM_SITES=6, SYNC_UPDATE=True)),
+    (BT_Simulation, SimConfig(NUM_SITES=6, USE_BT=True)),
+])
+def test_site_query_does_not_change_the_run(cls, cfg):
+    for expected, actual in zip(seeded_run(cls, cfg.replace(USE_SITE_QUERY=False)), seeded_run(cls, cfg)):
+        np.testing.assert_array_equal(actual, expected)
+
+"""
+Agents exactly at a site's radius, or at the sensing radius past it, are at the site or see it, and agents
+one step further out aren't, with or without the query
+"""
+def test_exact_radius():
+    np.random.seed(0)
+    simulation = FSM_Simulation(SimConfig(NUM_AGENTS=8, NUM_SITES=1))
+    site = simulation.sites[0]
+    site.pos = np.array([10.0, 10.0])
+    radius = float(site.radius)
+    reach = simulation.cfg.AGENT_SENSING_RADIUS + radius
+    # on the radius along the axes, a ulp past it, and on it diagonally (where rounding decides)
+    positions = [(10.0 + radius, 10.0), (10.0, 10.0 - radius), (np.nextafter(10.0 + radius, np.inf), 10.0), (10.0 + 0.6 * radius, 10.0 + 0.8 * radius),
+                 (10.0 + reach, 10.0), (10.0, 10.0 + reach), (np.nextafter(10.0 + reach, np.inf), 10.0), (10.0 - 0.6 * reach, 10.0 + 0.8 * reach)]
+    simulation.store.positions[:] = positions
+    simulation.site_query = simulation.query_sites()
+    with_query = [([s.id for s in simulation.get_sites(agent)], agent.at_site(site)) for agent in simulation.agents]
+    simulation.site_query = None
+    without_query = [([s.id for s in simulation.get_sites(agent)], agent.at_site(site)) for agent in simulation.agents]
+    assert with_query == without_query
+    assert [at for _, at in with_query[:3]] == [True, True, False]
+    assert [sites for sites, _ in with_query[4:7]] == [[0], [0], []]
@@ -0,0 +1,94 @@
+import math
+import numpy as np
+import pytest
+from World.config import SimConfig
+from World.simulation import FSM_Simulation, BT_Simulation
+from World.spatial_hash import SpatialHash
+
+RADIUS = 5.0
+
+"""
+Returns random positions with extra points placed where the grid or the distance check could go wrong:
+pairs exactly at, just inside, and just outside the radius, and points on and next to cell borders
+"""
+def tricky_layout(rng, num_points, size):
+    points = [rng.uniform(-2, size, (num_points, 2))]
+    for offset in ([3.0, 4.0], [RADIUS, 0.0], [0.0, -RADIUS], [RADIUS * (1 - 1e-12), 0.0], [RADIUS * (1 + 1e-12), 0.0]):
+        base = rng.uniform(0, size, 2)
+        points.append(np.array([base, base + offset]))
+    borders = RADIUS * rng.integers(-1, int(size / RADIUS) + 1, (24, 2)).astype(float)
+    borders += rng.choice([0.0, 1e-12, -1e-12, RADIUS - 1e-12], borders.shape)
+    points.append(borders)
+    return np.concatenate(points)
+
+"""
+Returns every point's neighbor list by checking every pair, the way the simulation did before the grid
+"""
+def brute_force(query_positions, positions, radius, inclusive=False, exclude_self=False):
+    lists = []
+    for i, query in enumerate(query_positions):
+        lists.append([j for j, pos in enumerate(positions) if not (exclude_self and i == j)
+                      and (math.dist(pos, query) <= radius if inclusive else math.dist(pos, query) < radius)])
+    return lists
+
+def csr_lists(indptr, indices):
+    return [indices[indptr[i]:indptr[i + 1]].tolist() for i in range(len(indptr) - 1)]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_neighbor_csr_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    positions = tricky_layout(rng, 150, 40.0)
+    grid = SpatialHash(RADIUS)
+    assert csr_lists(*grid.neighbor_csr(positions, RADIUS)) == brute_force(positions, positions, RADIUS, exclude_self=True)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cross_csr_matches_brute_force(seed):
+    rng = np.random.default_rng(100 + seed)
+    queries = tricky_layout(rng, 40, 30.0)
+    positions = tricky_layout(rng, 60, 30.0)
+    grid = SpatialHash(RADIUS)
+    for inclusive in (False, True):
+        assert csr_lists(*grid.cross_csr(queries, positions, RADIUS, inclusive=inclusive)) == brute_force(queries, positions, RADIUS, inclusive=inclusive)
+
+def test_labels_keep_worlds_apart():
+    rng = np.random.default_rng(7)
+    positions = tricky_layout(rng, 80, 20.0)
+    labels = rng.integers(0, 3, len(positions))
+    expected = [[j for j in row if labels[j] == labels[i]] for i, row in enumerate(brute_force(positions, positions, RADIUS, exclude_self=True))]
+    assert csr_lists(*SpatialHash(RADIUS).neighbor_csr(positions, RADIUS, labels=labels)) == expected
+
+"""
+The incremental grid: after rebuild() and after ids are moved one at a time, query() plus the distance check
+gives the same neighbor ids, in the same order, as scanning every agent
+"""
+def test_get_neighbor_ids_matches_scan():
+    rng = np.random.default_rng(3)
+    sim = FSM_Simulation(SimConfig(NUM_AGENTS=60))
+    layout = tricky_layout(rng, 60, 30.0)
+    sim.store.positions[:] = layout[rng.choice(len(layout), 60, replace=False)]
+    sim.spatial_hash.rebuild([agent.pos for agent in sim.agents])
+
+    def compare():
+        for agent in sim.agents:
+            sim.use_spatial_hash = True
+            hashed = sim.get_neighbor_ids(agent)
+            sim.use_spatial_hash = False
+            assert hashed == sim.get_neighbor_ids(agent)
+
+    compare()
+    for agent_id in rng.choice(60, 20, replace=False).tolist(): # move some agents across cell borders
+        sim.store.positions[agent_id] = RADIUS * rng.integers(0, 6, 2) + rng.choice([0.0, -1e-12, 1e-12], 2)
+        sim.spatial_hash.move(agent_id, sim.agents[agent_id].pos)
+    compare()
+
+@pytest.mark.parametrize("cls, overrides", [(FSM_Simulation, {}), (FSM_Simulation, {"NUM_PREDS": 2}), (BT_Simulation, {"USE_BT": True})])
+def test_seeded_runs_match_scan(cls, overrides):
+    runs = []
+    for use_spatial_hash in (True, False):
+        np.random.seed(11)
+        sim = cls(SimConfig(NUM_AGENTS=40, USE_SPATIAL_HASH=use_spatial_hash, **overrides))
+        for _ in range(25):
+            sim.update()
+        runs.append((sim.store.positions.copy(), sim.store.hunger.copy()))
+    assert np.array_equal(runs[0][0], runs[1][0])
+    assert np.array_equal(runs[0][1], runs[1][1])
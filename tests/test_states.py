@@ -0,0 +1,59 @@
+import numpy as np
+
+from Controllers.states import NET_EXPLORE, NET_FLOCK, NET_REST, STATES, partition_by_state
+from World.config import SimConfig
+from World.simulation import FSM_Simulation
+
+def simulation(seed):
+    np.random.seed(seed)
+    return FSM_Simulation(SimConfig(NUM_AGENTS=20))
+
+def store_arrays(sim):
+    return {name: np.array(array, copy=True) for name, array in sim.store.state_arrays().items()}
+
+"""
+Every agent of every simulation uses the one shared instance of its state, which holds no agent data
+"""
+def test_agents_share_the_states():
+    first, second = simulation(1), simulation(2)
+    for _ in range(10):
+        first.update()
+        second.update()
+    for sim in (first, second):
+        for agent in sim.agents:
+            assert agent.state is STATES[sim.store.state[agent.id]]
+    assert all(set(vars(state)) == {"name", "color", "code"} for state in STATES)
+    assert [state.code for state in STATES] == list(range(len(STATES)))
+
+"""
+transition() runs the new state's enter() and only writes the agent's state code and timer
+"""
+def test_transition_writes_only_the_code_and_timer():
+    sim = simulation(3)
+    agent = sim.agents[4]
+    agent.site = None
+    agent.state_timer = 0
+    for code in (NET_REST, NET_EXPLORE, NET_FLOCK):
+        before = store_arrays(sim)
+        agent.transition(code)
+        after = store_arrays(sim)
+        assert agent.state is STATES[code]
+        assert agent.state_timer == sim.cfg.AGENT_BORED_THRESHOLD
+        changed = {name for name in before if not np.array_equal(before[name], after[name])}
+        assert changed <= {"state", "state_timer"}
+        for name in changed:
+            rows = np.flatnonzero((before[name] != after[name]).reshape(len(sim.agents), -1).any(axis=1))
+            assert rows.tolist() == [agent.id]
+        agent.state_timer = 0
+
+def test_partition_by_state():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(-1, len(STATES), 200)
+    codes[:3] = NET_FLOCK # at least one state with several agents
+    codes[codes == NET_REST] = NET_EXPLORE # and one with none
+    groups = partition_by_state(codes)
+    assert list(groups) == list(range(len(STATES)))
+    for code, ids in groups.items():
+        np.testing.assert_array_equal(ids, np.flatnonzero(codes == code))
+    assert len(groups[NET_REST]) == 0
+    assert sum(map(len, groups.values())) == np.count_nonzero(codes >= 0)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from World.config import SimConfig
+from World.simulation import FSM_Simulation, BT_Simulation
+
+def run_state(simulation):
+    store = simulation.store
+    state = [store.positions, store.theta, store.speed, store.hunger, store.state, store.site_id, store.following,
+             store.memory, store.timer, simulation.site_field.resources, np.array(simulation.avg_hunger)]
+    if simulation.bt_store is not None:
+        state += [simulation.bt_store.status, simulation.bt_store.current_child, simulation.bt_store.count]
+    return [np.array(value, copy=True) for value in state]
+
+"""
+In a synchronous tick every agent reads the snapshot from the start of the tick, so with the random
+draws pinned, updating the agents in reverse order gives the same run
+"""
+@pytest.mark.parametrize("cls, cfg", [
+    (FSM_Simulation, SimConfig(SYNC_UPDATE=True)),
+    (FSM_Simulation, SimConfig(SYNC_UPDATE=True, USE_BOID_MOVE=False)),
+    (BT_Simulation, SimConfig(SYNC_UPDATE=True, USE_BT=True)),
+    (BT_Simulation, SimConfig(SYNC_UPDATE=True, USE_BT=True, USE_COMPILED_BT=False)),
+])
+@pytest.mark.parametrize("fraction", [0.2, 0.7])
+def test_sync_tick_does_not_depend_on_update_order(pin_draws, cls, cfg, fraction):
+    np.random.seed(8)
+    simulation = cls(cfg)
+    for _ in range(20):
+        simulation.update()
+    data = simulation.checkpoint()
+    forward = cls.from_checkpoint(data)
+    backward = cls.from_checkpoint(data)
+    backward.agents.reverse()
+    pin_draws(fraction)
+    for _ in range(30):
+        forward.update()
+        backward.update()
+        for expected, actual in zip(run_state(forward), run_state(backward)):
+            np.testing.assert_array_equal(actual, expected)
+    assert not np.array_equal(forward.store.positions, data["agent_positions"])